@@ -0,0 +1,275 @@
+# admission.py
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Optional
+
+from fastapi import HTTPException, Request
+
+from .instrumentation import mark_admission
+from .metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_LIMIT,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_QUEUE_WAIT,
+    ADMISSION_REJECTED,
+    RATE_LIMIT_BUCKETS,
+    RATE_LIMITED,
+)
+from .security import ANONYMOUS
+
+# --- Configuration (variables d'environnement) ---
+# Requêtes de prédiction traitées simultanément (0 : pas de limite)
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64"))
+# Requêtes en attente d'une place au-delà desquelles on refuse immédiatement
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "256"))
+# Attente maximale d'une place ; une requête qui la dépasserait probablement est refusée d'emblée
+ADMISSION_LATENCY_BUDGET_MS = float(os.getenv("ADMISSION_LATENCY_BUDGET_MS", "1000"))
+
+# Débit autorisé par utilisateur, en jetons par seconde (0 : pas de limite) et réserve maximale
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "0"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "100"))
+# Un jeton par requête, plus un jeton par tranche de ce nombre de biens dans un lot
+RATE_LIMIT_BATCH_ROWS_PER_TOKEN = int(os.getenv("RATE_LIMIT_BATCH_ROWS_PER_TOKEN", "100"))
+
+# Poids de la dernière durée de traitement dans sa moyenne mobile
+_SERVICE_TIME_SMOOTHING = 0.1
+
+
+class Overloaded(Exception):
+    """Levée quand une requête ne peut pas être admise ; `reason` alimente les métriques."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    Limite le nombre de prédictions traitées simultanément, avec une file d'attente bornée.
+
+    Une requête entre directement s'il reste une place. Sinon elle attend dans la file, dans
+    l'ordre d'arrivée, au plus `latency_budget_ms` millisecondes. Elle est refusée sans attendre
+    si la file est pleine, ou si l'attente estimée (position dans la file × durée moyenne de
+    traitement / nombre de places) dépasse déjà le budget.
+
+    Toutes les méthodes s'exécutent dans la boucle d'événements : aucun verrou n'est nécessaire.
+
+    Args:
+        max_concurrency (int): Nombre de requêtes traitées simultanément.
+        max_queue (int): Nombre maximal de requêtes en attente.
+        latency_budget_ms (float): Attente maximale d'une place, en millisecondes.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        latency_budget_ms: float = ADMISSION_LATENCY_BUDGET_MS,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.latency_budget = max(0.0, latency_budget_ms) / 1000
+
+        self.in_flight = 0
+        self.service_time: Optional[float] = None
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        ADMISSION_LIMIT.labels(limit="concurrency").set(self.max_concurrency)
+        ADMISSION_LIMIT.labels(limit="queue").set(self.max_queue)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def expected_wait(self) -> float:
+        """
+        Estime l'attente d'une requête qui rejoindrait maintenant la file, en secondes.
+        """
+        if self.service_time is None:
+            return 0.0
+        return (len(self._waiters) + 1) * self.service_time / self.max_concurrency
+
+    async def acquire(self):
+        """
+        Attend une place.
+
+        Raises:
+            Overloaded: Si la file est pleine, si l'attente estimée dépasse le budget
+                ou si aucune place ne s'est libérée à temps.
+        """
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self._enter()
+            ADMISSION_QUEUE_WAIT.observe(0)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise Overloaded("queue_full")
+        if self.expected_wait() > self.latency_budget:
+            raise Overloaded("latency_budget")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.latency_budget)
+        except asyncio.TimeoutError:
+            self._abandon(future)
+            raise Overloaded("timeout")
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+        ADMISSION_QUEUE_WAIT.observe(time.perf_counter() - start)
+
+    def release(self, service_time: Optional[float] = None):
+        """
+        Libère une place, en la passant directement à la première requête en attente.
+
+        Args:
+            service_time (float): Durée de traitement de la requête sortante, en secondes.
+        """
+        if service_time is not None:
+            self.service_time = service_time if self.service_time is None else (
+                self.service_time + _SERVICE_TIME_SMOOTHING * (service_time - self.service_time)
+            )
+
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)  # la place change de main, `in_flight` est inchangé
+                ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+                return
+        ADMISSION_QUEUE_DEPTH.set(0)
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+
+    def _enter(self):
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+
+    def _abandon(self, future: asyncio.Future):
+        if future.done() and not future.cancelled():
+            # La place a été attribuée juste avant l'abandon : elle est rendue
+            self.release()
+            return
+        future.cancel()
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+
+
+class TokenBuckets:
+    """
+    Limite le débit de chaque utilisateur avec un seau à jetons.
+
+    Le seau d'un utilisateur se remplit de `rate` jetons par seconde, jusqu'à `burst` jetons.
+    Chaque requête en consomme au moins un ; elle est refusée si le seau n'en contient pas assez.
+    Seuls les `max_users` derniers utilisateurs actifs sont gardés en mémoire : un utilisateur
+    oublié repart d'un seau plein. Les seaux sont propres à chaque processus : avec N workers,
+    un utilisateur dispose au plus de N fois son débit.
+
+    Args:
+        rate (float): Jetons ajoutés par seconde.
+        burst (float): Capacité du seau.
+        max_users (int): Nombre maximal de seaux en mémoire.
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT_PER_SECOND, burst: float = RATE_LIMIT_BURST,
+                 max_users: int = 10000):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_users = max_users
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def take(self, user: str, cost: float = 1.0, now: Optional[float] = None) -> float:
+        """
+        Consomme `cost` jetons du seau de `user`.
+
+        Returns:
+            float: 0 si la requête est acceptée, sinon le délai en secondes avant d'avoir assez de jetons.
+        """
+        now = time.monotonic() if now is None else now
+        cost = min(cost, self.burst)
+
+        bucket = self._buckets.get(user)
+        if bucket is None:
+            bucket = self._buckets[user] = [self.burst, now]
+            if len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+            RATE_LIMIT_BUCKETS.set(len(self._buckets))
+        else:
+            self._buckets.move_to_end(user)
+
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= cost:
+            bucket[0] = tokens - cost
+            return 0.0
+        bucket[0] = tokens
+        return (cost - tokens) / self.rate
+
+
+def batch_cost(rows: int) -> float:
+    """
+    Retourne le nombre de jetons consommés par un lot de `rows` biens.
+    """
+    return 1 + rows // max(1, RATE_LIMIT_BATCH_ROWS_PER_TOKEN)
+
+
+@asynccontextmanager
+async def admitted(request: Request, user: str, cost: float = 1.0):
+    """
+    Admet une requête de prédiction, ou la refuse rapidement :
+    429 si l'utilisateur dépasse son débit, 503 si le service est saturé.
+
+    Les limiteurs sont ceux de l'application (`app.state.rate_limiter`, `app.state.admission`) ;
+    sans limiteur, la requête passe directement.
+
+    Args:
+        request (Request): La requête, pour accéder aux limiteurs de l'application.
+        user (str): L'identité de l'appelant (`authenticate` ou `identify` de api/security.py).
+        cost (float): Le nombre de jetons consommés (voir `batch_cost`).
+
+    Raises:
+        HTTPException: 429 ou 503, avec un en-tête `Retry-After`.
+    """
+    mark_admission(request)
+    rate_limiter = getattr(request.app.state, "rate_limiter", None)
+    if rate_limiter is not None:
+        retry_after = rate_limiter.take(user, cost)
+        if retry_after > 0:
+            RATE_LIMITED.labels(user=ANONYMOUS if user.startswith(f"{ANONYMOUS}:") else user).inc()
+            raise HTTPException(
+                status_code=429,
+                detail="Trop de requêtes, réessayez plus tard",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    admission = getattr(request.app.state, "admission", None)
+    if admission is None:
+        mark_admission(request, admitted=True)
+        yield
+        return
+
+    try:
+        await admission.acquire()
+    except Overloaded as e:
+        ADMISSION_REJECTED.labels(reason=e.reason).inc()
+        raise HTTPException(
+            status_code=503,
+            detail="Service saturé, réessayez plus tard",
+            headers={"Retry-After": str(max(1, math.ceil(admission.latency_budget)))},
+        )
+
+    mark_admission(request, admitted=True)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        admission.release(time.perf_counter() - start)
@@ -0,0 +1,117 @@
+# batching.py
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+from .instrumentation import to_thread
+from .metrics import MICRO_BATCH_SIZE, MICRO_BATCH_QUEUE_WAIT
+
+# --- Configuration (variables d'environnement) ---
+MICRO_BATCHING = os.getenv("MICRO_BATCHING", "1") == "1"
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "64"))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "2"))
+
+
+class MicroBatcher:
+    """
+    Regroupe les prédictions unitaires concurrentes en micro-lots, par clé de modèle.
+
+    Chaque appel à `submit` met une ligne en file d'attente pour sa clé (ville, type de logement).
+    La file est vidée dès qu'elle atteint `max_batch_size` lignes, ou au plus tard `max_wait_ms`
+    millisecondes après l'arrivée de sa première ligne. Le lot est alors prédit en un seul appel
+    vectorisé dans un thread, et chaque requête reçoit le résultat de sa ligne.
+
+    Args:
+        predict_fn (Callable): Fonction synchrone `predict_fn(key, matrix)` qui retourne
+            un résultat par ligne de `matrix`.
+        max_batch_size (int): Taille maximale d'un lot.
+        max_wait_ms (float): Attente maximale d'une ligne avant le vidage de sa file.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[Hashable, np.ndarray], Sequence[Any]],
+        max_batch_size: int = MICRO_BATCH_MAX_SIZE,
+        max_wait_ms: float = MICRO_BATCH_MAX_WAIT_MS,
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+
+        self._pending: Dict[Hashable, List[Tuple[List[float], asyncio.Future, float]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: set = set()
+
+    async def submit(self, key: Hashable, row: List[float]) -> Any:
+        """
+        Ajoute une ligne à la file de sa clé et attend son résultat.
+
+        Args:
+            key (Hashable): La clé du modèle, ex. ("lille", "maison").
+            row (List[float]): Les caractéristiques du logement.
+
+        Returns:
+            Any: Le résultat retourné par `predict_fn` pour cette ligne.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        pending = self._pending.setdefault(key, [])
+        pending.append((row, future, time.perf_counter()))
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+
+        return await future
+
+    async def close(self):
+        """
+        Vide toutes les files en attente et attend la fin des lots en cours.
+        """
+        for key in list(self._pending):
+            self._flush(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _flush(self, key: Hashable):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending.pop(key, None)
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(self._run(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable, batch: List[Tuple[List[float], asyncio.Future, float]]):
+        # Les requêtes annulées (client déconnecté) ne sont pas prédites
+        batch = [item for item in batch if not item[1].done()]
+        if not batch:
+            return
+
+        city, type_local = key if isinstance(key, tuple) and len(key) == 2 else (str(key), "")
+        now = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            MICRO_BATCH_QUEUE_WAIT.labels(city=city, type_local=type_local).observe(now - enqueued_at)
+        MICRO_BATCH_SIZE.labels(city=city, type_local=type_local).observe(len(batch))
+
+        matrix = np.array([row for row, _, _ in batch], dtype=np.float64)
+        try:
+            results = await to_thread(self.predict_fn, key, matrix)
+        except Exception as exc:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,240 @@
+# bulk_score.py
+"""
+Estimation hors ligne d'un fichier entier de biens, sans passer par l'API HTTP.
+
+    python -m api.bulk_score csv_data/lille_2024.csv predictions_lille.csv --ville lille
+
+Le fichier d'entrée (CSV ou Parquet) est lu par morceaux. Chaque morceau est estimé dans un
+pool de processus, groupe par groupe (ville, type de logement), avec les modèles et scalers
+du registre de l'API (`api/models.py`) et la même chaîne de prédiction que `/predict`.
+Les résultats sont écrits au fil de l'eau, dans l'ordre des lignes d'entrée.
+
+Deux formats d'entrée sont reconnus :
+    - les colonnes de l'API : `ville` (ou `--ville`), `surface_bati`, `nombre_pieces`,
+      `type_local`, `surface_terrain`, `nombre_lots` ;
+    - un export DVF (colonne `Type local`), lu avec `api/ingestion.py` : seules les ventes
+      résidentielles sont estimées, la ville est déduite de la commune (ou de `--ville`).
+
+Les lignes que `/predict` refuserait (ville ou type de logement non supporté, valeur manquante,
+nombre de pièces ou de lots non entier) sont écrites sans estimation, avec la raison
+dans la colonne `erreur`.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .ingestion import detect_separator, read_dvf_chunks
+from .models import registry
+from .services import _predict_array
+
+CHUNK_ROWS = int(os.getenv("BULK_SCORE_CHUNK_ROWS", "50000"))
+
+FEATURES = ["surface_bati", "nombre_pieces", "surface_terrain", "nombre_lots"]
+TYPES_LOCAL = ("appartement", "maison")
+
+
+# -------------------------------
+#  LECTURE
+# -------------------------------
+def _is_dvf(columns: Sequence[str]) -> bool:
+    return "Type local" in columns
+
+
+def read_chunks(path: Path, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Lit le fichier d'entrée par morceaux de `chunk_rows` lignes.
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("La lecture de fichiers Parquet nécessite pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+        return
+
+    header = pd.read_csv(path, sep=detect_separator(path), nrows=0).columns
+    if _is_dvf(header):
+        for chunk in read_dvf_chunks(path, chunk_rows):
+            chunk = chunk.copy()
+            chunk["ville"] = chunk["commune"].str.lower()
+            yield chunk
+        return
+
+    yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+# -------------------------------
+#  ESTIMATION (processus du pool)
+# -------------------------------
+def _init_worker():
+    # Sans effet quand le registre a été chargé avant le fork du pool
+    registry.load()
+
+
+def score_chunk(frame: pd.DataFrame, ville: Optional[str] = None) -> pd.DataFrame:
+    """
+    Estime un morceau du fichier d'entrée, groupe par groupe (ville, type de logement).
+
+    Args:
+        frame (pd.DataFrame): Les biens, colonnes de l'API.
+        ville (str): La ville de tous les biens, si le fichier n'a pas de colonne `ville`.
+
+    Returns:
+        pd.DataFrame: Le morceau, complété des colonnes `prix_m2_estime`, `ville_modele`,
+        `model`, `version_modele` et `erreur`.
+    """
+    n = len(frame)
+    villes = pd.Series(ville, index=frame.index) if ville else frame["ville"].astype(str)
+    villes = villes.str.strip().str.lower().to_numpy(dtype=object)
+    types_local = frame["type_local"].astype(str).str.lower().to_numpy(dtype=object)
+    matrix = frame[FEATURES].to_numpy(dtype=np.float64)
+
+    # Tout le morceau est estimé avec la même version des modèles
+    model_set = registry.current()
+
+    # Les mêmes refus que la validation de `/predict`
+    erreur = np.full(n, "", dtype=object)
+    integers = matrix[:, [1, 3]]
+    erreur[(integers != np.round(integers)).any(axis=1)] = "nombre non entier"
+    erreur[np.isnan(matrix).any(axis=1)] = "valeur manquante"
+    erreur[~np.isin(types_local, TYPES_LOCAL)] = "type de logement non supporté"
+    erreur[~np.isin(villes, list(model_set.cities))] = "ville non prise en charge"
+    erreur[(erreur == "") & ~np.array([(v, t) in model_set.bundles for v, t in zip(villes, types_local)], bool)] = (
+        "type de logement non supporté"
+    )
+
+    prix = np.full(n, np.nan)
+    model_names = np.full(n, "", dtype=object)
+
+    valid = erreur == ""
+    for city, type_local in sorted(set(zip(villes[valid], types_local[valid]))):
+        rows = np.flatnonzero(valid & (villes == city) & (types_local == type_local))
+        bundle = model_set.get(city, type_local)
+        prix[rows] = _predict_array(bundle, matrix[rows])
+        model_names[rows] = type(bundle.model).__name__
+
+    result = frame.copy()
+    if ville:
+        result["ville"] = ville
+    result["prix_m2_estime"] = prix
+    result["ville_modele"] = np.where(valid, pd.Series(villes).str.capitalize().to_numpy(dtype=object), "")
+    result["model"] = model_names
+    result["version_modele"] = np.where(valid, model_set.version, "")
+    result["erreur"] = erreur
+    return result
+
+
+# -------------------------------
+#  ÉCRITURE
+# -------------------------------
+class _Writer:
+    """
+    Écrit les morceaux estimés à la suite, en CSV ou en Parquet selon l'extension.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.parquet = self.path.suffix == ".parquet"
+        self._writer = None
+        self._header = True
+
+    def write(self, frame: pd.DataFrame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="w" if self._header else "a", header=self._header, index=False)
+            self._header = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def bulk_score(
+    input_path: Path,
+    output_path: Path,
+    ville: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> int:
+    """
+    Estime tout le fichier `input_path` et écrit les résultats dans `output_path`.
+
+    Args:
+        input_path (Path): Le fichier d'entrée (CSV ou Parquet).
+        output_path (Path): Le fichier de sortie (CSV, ou Parquet si l'extension est `.parquet`).
+        ville (str): La ville de tous les biens, si le fichier n'a pas de colonne `ville`.
+        workers (int): Le nombre de processus (0 : dans le processus courant ; défaut : nombre de CPU).
+        chunk_rows (int): Le nombre de lignes par morceau.
+
+    Returns:
+        int: Le nombre de lignes écrites.
+    """
+    # Chargé avant le pool : les processus forkés héritent des modèles au lieu de les recharger
+    registry.preload()
+    print(f"✅ Models loaded (version {registry.version})", file=sys.stderr)
+
+    workers = os.cpu_count() if workers is None else workers
+    writer = _Writer(output_path)
+    start = time.perf_counter()
+    rows = 0
+
+    def report(frame: pd.DataFrame):
+        nonlocal rows
+        writer.write(frame)
+        rows += len(frame)
+        elapsed = time.perf_counter() - start
+        print(f"  {rows:,} rows scored ({rows / elapsed:,.0f} rows/s)", file=sys.stderr)
+
+    try:
+        if workers == 0:
+            for chunk in read_chunks(input_path, chunk_rows):
+                report(score_chunk(chunk, ville))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                # Au plus deux morceaux en attente par processus : la mémoire reste bornée
+                pending = deque()
+                for chunk in read_chunks(input_path, chunk_rows):
+                    pending.append(pool.submit(score_chunk, chunk, ville))
+                    if len(pending) >= 2 * workers:
+                        report(pending.popleft().result())
+                while pending:
+                    report(pending.popleft().result())
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {rows:,} rows written to {output_path} in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)",
+          file=sys.stderr)
+    return rows
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Estime hors ligne le prix au m² de tout un fichier de biens.")
+    parser.add_argument("input", type=Path, help="Fichier d'entrée (CSV, export DVF ou Parquet)")
+    parser.add_argument("output", type=Path, help="Fichier de sortie (CSV, ou Parquet si .parquet)")
+    parser.add_argument("--ville", help="Ville de tous les biens (sinon colonne ville ou commune)")
+    parser.add_argument("--workers", type=int, default=None, help="Nombre de processus (0 : sans pool)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Lignes par morceau")
+    args = parser.parse_args(argv)
+    bulk_score(args.input, args.output, args.ville, args.workers, args.chunk_rows)
+
+
+if __name__ == "__main__":
+    main()
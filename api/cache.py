@@ -0,0 +1,111 @@
+# cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from .metrics import PREDICTION_CACHE_HITS, PREDICTION_CACHE_MISSES, PREDICTION_CACHE_SIZE
+from .schemas import House
+
+# --- Configuration (variables d'environnement) ---
+PREDICTION_CACHE_SIZE_MAX = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+
+
+def prediction_key(ville: str, house: House, version: Optional[str]) -> Tuple:
+    """
+    Construit la clé canonique d'une prédiction.
+
+    Les caractéristiques sont converties dans les types du modèle, de sorte que
+    `80`, `80.0` et `"80"` (une fois validés) donnent la même clé.
+
+    Args:
+        ville (str): Le nom de la ville en minuscules.
+        house (House): Les caractéristiques du logement.
+        version (str): La version des modèles qui produit la prédiction.
+
+    Returns:
+        Tuple: La clé (ville, type de logement, caractéristiques, version).
+    """
+    return (
+        ville,
+        house.type_local.lower(),
+        float(house.surface_bati),
+        int(house.nombre_pieces),
+        float(house.surface_terrain),
+        int(house.nombre_lots),
+        version,
+    )
+
+
+class PredictionCache:
+    """
+    Cache LRU borné, avec expiration, des prédictions unitaires.
+
+    La version des modèles fait partie de la clé, et le cache est entièrement vidé
+    dès qu'une lecture porte une nouvelle version : un modèle rechargé n'est jamais
+    servi avec les résultats de l'ancien.
+
+    Args:
+        max_entries (int): Nombre maximal d'entrées (0 désactive le cache).
+        ttl (float): Durée de vie d'une entrée, en secondes.
+    """
+
+    def __init__(self, max_entries: int = PREDICTION_CACHE_SIZE_MAX, ttl: float = PREDICTION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple, city: str = "") -> Optional[Any]:
+        """
+        Retourne la valeur en cache pour `key`, ou None (entrée absente ou expirée).
+        """
+        with self._lock:
+            self._check_version(key[-1])
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    PREDICTION_CACHE_HITS.labels(city=city).inc()
+                    return value
+                del self._entries[key]
+                PREDICTION_CACHE_SIZE.set(len(self._entries))
+
+        PREDICTION_CACHE_MISSES.labels(city=city).inc()
+        return None
+
+    def put(self, key: Tuple, value: Any):
+        """
+        Ajoute une valeur au cache, en évinçant les entrées les moins récemment utilisées.
+        """
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            # Résultat d'une requête commencée avant un rechargement : inutile à garder
+            if key[-1] != self._version:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            PREDICTION_CACHE_SIZE.set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            PREDICTION_CACHE_SIZE.set(0)
+
+    def _check_version(self, version: Optional[str]):
+        # Les lectures portent la version servie : une nouvelle version invalide tout le cache
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+            PREDICTION_CACHE_SIZE.set(0)
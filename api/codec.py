@@ -0,0 +1,106 @@
+# codec.py
+"""
+Codec rapide des routes de prédiction.
+
+Décodage : le corps JSON est validé en une passe par le validateur compilé de Pydantic
+(`TypeAdapter.validate_json`, mêmes modèles et mêmes validateurs que `House` et `CityHouse`)
+au lieu de `json.loads` suivi de la validation d'un dictionnaire. FastAPI ne fait ensuite
+que vérifier les instances obtenues. Un corps refusé par le validateur est revalidé par
+FastAPI, qui renvoie exactement la même erreur 422 que sans codec.
+
+Encodage : la réponse est sérialisée directement en octets (msgspec s'il est installé,
+sinon `pydantic_core.to_json`), sans revalider le `response_model`.
+
+Le schéma OpenAPI est inchangé : les routes déclarent toujours leurs modèles.
+Le codec est désactivé avec `FAST_CODEC=0`.
+"""
+import email.message
+import os
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+import pydantic_core
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from .schemas import CityHouse, House
+
+try:
+    import msgspec
+except ImportError:  # dépendance optionnelle : les réponses sont alors encodées par pydantic_core
+    msgspec = None
+
+FAST_CODEC = os.getenv("FAST_CODEC", "1") == "1"
+
+# Corps de requête décodés par le codec
+FAST_BODIES = (House, CityHouse, List[CityHouse])
+
+
+def _encode_hook(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise NotImplementedError(f"Type non sérialisable : {type(obj).__name__}")
+
+
+_ENCODER = msgspec.json.Encoder(enc_hook=_encode_hook) if msgspec is not None else None
+
+
+def encode(content: Any) -> bytes:
+    """
+    Sérialise une prédiction, une liste de prédictions ou un dictionnaire en JSON.
+    """
+    if _ENCODER is not None:
+        return _ENCODER.encode(content)
+    return pydantic_core.to_json(content)
+
+
+def respond(content: Any) -> Any:
+    """
+    Retourne le résultat d'une route déjà sérialisé quand le codec est actif :
+    FastAPI renvoie alors la réponse telle quelle, sans revalider le `response_model`.
+    """
+    if not FAST_CODEC or isinstance(content, Response):
+        return content
+    return Response(content=encode(content), media_type="application/json")
+
+
+def is_json(content_type: Optional[str]) -> bool:
+    """
+    Indique si un type de contenu est du JSON, selon la même règle que FastAPI.
+    """
+    if not content_type:
+        return False
+    message = email.message.Message()
+    message["content-type"] = content_type
+    subtype = message.get_content_subtype()
+    return message.get_content_maintype() == "application" and (subtype == "json" or subtype.endswith("+json"))
+
+
+class CodecRoute(APIRoute):
+    """
+    Route FastAPI dont le corps JSON est validé par le validateur compilé de son modèle.
+
+    Le résultat est placé dans le cache JSON de la requête (`request.json()`), où FastAPI
+    le lit à la place du dictionnaire qu'il aurait décodé.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        annotation = self.body_field.field_info.annotation if self.body_field is not None else None
+        if not FAST_CODEC or annotation not in FAST_BODIES:
+            return handler
+        adapter = TypeAdapter(annotation)
+
+        async def codec_handler(request: Request):
+            body = await request.body()
+            if body and is_json(request.headers.get("content-type")):
+                try:
+                    request._json = adapter.validate_json(body)
+                except ValidationError:
+                    pass  # FastAPI revalide le corps et renvoie son erreur habituelle
+            return await handler(request)
+
+        return codec_handler
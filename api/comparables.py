@@ -0,0 +1,344 @@
+# comparables.py
+"""
+Ventes comparables : les k transactions réelles les plus proches d'un bien, par ville.
+
+    python -m api.comparables lille bordeaux
+
+Les ventes de chaque ville (`COMPARABLES_SOURCE`, par défaut `csv_data/<ville>_2024.csv`) sont
+lues via le cache d'ingestion (api/ingestion.py), nettoyées (doublons, prix au m² aberrants
+comme dans les notebooks d'entraînement), puis indexées par type de logement dans un arbre
+k-d (`sklearn.neighbors.KDTree`). L'index est enregistré à côté du cache d'ingestion : il n'est
+construit qu'une fois par version du fichier source, puis relu tel quel.
+
+La similarité porte sur la surface bâtie, le nombre de pièces, la surface du terrain et le
+nombre de lots, centrés-réduits par type de logement (surfaces en échelle logarithmique,
+terrain absent = 0) et pondérés par `FEATURE_WEIGHTS` ; les ventes comparables sont toujours
+du même type de logement. La recherche peut être restreinte au même code postal et/ou à la
+même section cadastrale : l'arbre du sous-ensemble est construit à la première requête puis gardé
+(les `COMPARABLES_SUBSETS` derniers utilisés par type de logement). Un code postal ou une section
+absents des ventes donnent une liste vide, sans rien construire ni garder.
+
+Une requête coûte de l'ordre de 0,3 ms, mise en forme comprise ; un lot de biens est interrogé
+en un seul appel par groupe (quelques dizaines de µs par bien).
+"""
+import argparse
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# --- Configuration (variables d'environnement) ---
+# Export DVF des ventes d'une ville ({city} : nom de la ville en minuscules)
+COMPARABLES_SOURCE = os.getenv("COMPARABLES_SOURCE", str(ROOT_DIR / "csv_data" / "{city}_2024.csv"))
+# Sous-arbres des recherches restreintes gardés par type de logement (les plus récemment utilisés)
+COMPARABLES_SUBSETS = int(os.getenv("COMPARABLES_SUBSETS", "256"))
+
+# À incrémenter quand le contenu de l'index change : les index enregistrés sont alors reconstruits
+INDEX_VERSION = 1
+# Variables de similarité (dans l'ordre des modèles, voir services._house_row) et leurs poids
+FEATURES = ["surface_bati", "nombre_pieces", "surface_terrain", "nombre_lots"]
+FEATURE_WEIGHTS = np.array([2.0, 1.0, 1.0, 0.5])
+# Colonnes des ventes renvoyées
+SALE_COLUMNS = [
+    "date_mutation", "valeur_fonciere", "prix_m2", "surface_bati", "nombre_pieces",
+    "surface_terrain", "nombre_lots", "type_local", "code_postal", "section",
+]
+LEAF_SIZE = 16
+
+
+def scale_features(features: np.ndarray) -> np.ndarray:
+    """
+    Transforme une matrice (n, 4) de caractéristiques avant centrage-réduction :
+    surfaces en échelle logarithmique, terrain absent (NaN) à 0.
+    """
+    features = np.asarray(features, dtype=np.float64)
+    return np.column_stack([
+        np.log1p(np.maximum(features[:, 0], 0)),
+        features[:, 1],
+        np.log1p(np.maximum(np.nan_to_num(features[:, 2]), 0)),
+        features[:, 3],
+    ])
+
+
+class _Partition:
+    """
+    Ventes d'un type de logement : arbre k-d sur les caractéristiques transformées et pondérées.
+    """
+
+    def __init__(self, sales: Dict[str, np.ndarray]):
+        from sklearn.neighbors import KDTree
+
+        self.sales = sales
+        points = scale_features(np.column_stack([sales[name] for name in FEATURES]))
+        self.center = points.mean(axis=0)
+        scale = points.std(axis=0)
+        self.scale = np.where(scale > 0, scale, 1.0) / FEATURE_WEIGHTS
+        self.points = (points - self.center) / self.scale
+        self.tree = KDTree(self.points, leaf_size=LEAF_SIZE)
+        self.__setstate__({})
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __getstate__(self):
+        # Les sous-arbres, les valeurs des restrictions et le verrou ne sont pas enregistrés avec l'index
+        state = dict(self.__dict__)
+        del state["_subsets"], state["_values"], state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Sous-arbres des recherches restreintes, construits à la demande
+        self._subsets: "OrderedDict[Tuple, Tuple[np.ndarray, object]]" = OrderedDict()
+        self._values = {
+            column: frozenset(np.unique(self.sales[column]).tolist()) for column in ("code_postal", "section")
+        }
+        self._lock = threading.Lock()
+
+    def _subset(self, filters: Tuple[Tuple[str, object], ...]):
+        if any(value not in self._values[column] for column, value in filters):
+            return np.empty(0, dtype=np.intp), None  # valeur absente des ventes : rien à construire ni à garder
+
+        with self._lock:
+            subset = self._subsets.get(filters)
+            if subset is not None:
+                self._subsets.move_to_end(filters)
+                return subset
+
+            from sklearn.neighbors import KDTree
+
+            rows = np.ones(len(self.points), dtype=bool)
+            for column, value in filters:
+                rows &= self.sales[column] == value
+            rows = np.flatnonzero(rows)
+            tree = KDTree(self.points[rows], leaf_size=LEAF_SIZE) if len(rows) else None
+            subset = self._subsets[filters] = (rows, tree)
+            if len(self._subsets) > COMPARABLES_SUBSETS:
+                self._subsets.popitem(last=False)
+        return subset
+
+    def query(self, features: np.ndarray, k: int, filters: Tuple[Tuple[str, object], ...] = ()):
+        """
+        Retourne, pour chaque ligne de `features`, les distances et les positions des k ventes les plus proches.
+        """
+        points = (scale_features(features) - self.center) / self.scale
+        if not filters:
+            rows, tree = None, self.tree
+        else:
+            rows, tree = self._subset(filters)
+        size = len(self.points) if rows is None else len(rows)
+        k = min(k, size)
+        if k == 0:
+            return np.empty((len(points), 0)), np.empty((len(points), 0), dtype=np.intp)
+        distances, positions = tree.query(points, k=k)
+        return distances, (positions if rows is None else rows[positions])
+
+
+class ComparablesIndex:
+    """
+    Index des ventes comparables d'une ville.
+
+    Attributes:
+        city (str): La ville.
+        partitions (Dict[str, _Partition]): Les ventes indexées, par type de logement.
+        sections (List[str]): Les sections cadastrales, indexées par code.
+        source (str): L'export DVF d'origine.
+    """
+
+    def __init__(self, city: str, partitions: Dict[str, _Partition], sections: List[str], source: str):
+        self.city = city
+        self.partitions = partitions
+        self.sections = sections
+        self._section_codes = {section: code for code, section in enumerate(sections)}
+        self.source = source
+
+    def __len__(self) -> int:
+        return sum(len(partition) for partition in self.partitions.values())
+
+    @classmethod
+    def from_table(cls, city: str, table) -> "ComparablesIndex":
+        """
+        Construit l'index à partir des ventes ingérées d'une ville (`DVFTable`).
+        """
+        frame = table.to_frame(SALE_COLUMNS)
+        frame["section"] = frame["section"].cat.codes.astype(np.int32)
+        frame = frame[frame["surface_bati"] > 0].drop_duplicates()
+
+        partitions = {}
+        for type_local, sales in frame.groupby("type_local", observed=True):
+            # Prix au m² aberrants (ventes de plusieurs lots, dépendances) : même règle que les notebooks
+            q1, q3 = np.quantile(sales["prix_m2"], [0.25, 0.75])
+            iqr = q3 - q1
+            sales = sales[(sales["prix_m2"] > q1 - 1.5 * iqr) & (sales["prix_m2"] < q3 + 1.5 * iqr)]
+            if len(sales):
+                columns = {name: sales[name].to_numpy() for name in SALE_COLUMNS if name != "type_local"}
+                columns["date_mutation"] = columns["date_mutation"].astype("datetime64[D]")
+                partitions[str(type_local)] = _Partition(columns)
+        return cls(city, partitions, list(table.categories["section"]), table.source)
+
+    def query(
+        self,
+        type_local: str,
+        features: np.ndarray,
+        k: int,
+        code_postal: Optional[int] = None,
+        section: Optional[str] = None,
+    ) -> List[List[dict]]:
+        """
+        Cherche les k ventes les plus proches de chaque bien d'un même type de logement.
+
+        Args:
+            type_local (str): Le type de logement ("appartement" ou "maison").
+            features (np.ndarray): Matrice (n, 4) des caractéristiques, dans l'ordre de `FEATURES`.
+            k (int): Le nombre de ventes par bien.
+            code_postal (int): Restreint la recherche à ce code postal.
+            section (str): Restreint la recherche à cette section cadastrale.
+
+        Returns:
+            List[List[dict]]: Pour chaque bien, ses ventes comparables, de la plus proche à la plus lointaine
+            (moins de k si la recherche restreinte en compte moins).
+        """
+        partition = self.partitions.get(type_local)
+        if partition is None:
+            return [[] for _ in range(len(features))]
+
+        filters = []
+        if code_postal is not None:
+            filters.append(("code_postal", code_postal))
+        if section is not None:
+            code = self._section_codes.get(section.strip().upper())
+            if code is None:
+                return [[] for _ in range(len(features))]
+            filters.append(("section", code))
+
+        distances, positions = partition.query(features, k, tuple(filters))
+        sales = partition.sales
+        columns = {name: sales[name][positions].tolist() for name in SALE_COLUMNS if name != "type_local"}
+        columns["date_mutation"] = np.datetime_as_string(sales["date_mutation"][positions], unit="D").tolist()
+        results = []
+        for row in range(len(features)):
+            results.append([
+                {
+                    "date_mutation": columns["date_mutation"][row][rank],
+                    "valeur_fonciere": columns["valeur_fonciere"][row][rank],
+                    "prix_m2": columns["prix_m2"][row][rank],
+                    "surface_bati": columns["surface_bati"][row][rank],
+                    "nombre_pieces": int(columns["nombre_pieces"][row][rank]),
+                    "surface_terrain": _finite(columns["surface_terrain"][row][rank]),
+                    "nombre_lots": int(columns["nombre_lots"][row][rank]),
+                    "type_local": type_local,
+                    "code_postal": columns["code_postal"][row][rank],
+                    "section": self.sections[columns["section"][row][rank]],
+                    "distance": float(distances[row][rank]),
+                }
+                for rank in range(positions.shape[1])
+            ])
+        return results
+
+
+def _finite(value: float) -> Optional[float]:
+    return value if value == value else None
+
+
+# -------------------------------
+#  CONSTRUCTION ET CHARGEMENT
+# -------------------------------
+def source_path(city: str) -> Path:
+    return Path(COMPARABLES_SOURCE.format(city=city.lower()))
+
+
+def build(city: str, source: Optional[Path] = None, cache_dir: Optional[Path] = None) -> ComparablesIndex:
+    """
+    Retourne l'index d'une ville : relu depuis le cache d'ingestion s'il y est, construit et enregistré sinon.
+
+    Args:
+        city (str): La ville.
+        source (Path): L'export DVF des ventes (par défaut, d'après `COMPARABLES_SOURCE`).
+        cache_dir (Path): Le dossier du cache d'ingestion (par défaut, `DVF_CACHE_DIR`).
+
+    Raises:
+        FileNotFoundError: Si la ville n'a pas de fichier de ventes.
+    """
+    from .ingestion import DVF_CACHE_DIR, ingest
+
+    table = ingest(source or source_path(city), cache_dir or DVF_CACHE_DIR)
+    path = Path(table.directory) / f"comparables-v{INDEX_VERSION}.pkl" if table.directory is not None else None
+    if path is not None and path.is_file():
+        with open(path, "rb") as f:
+            index = pickle.load(f)
+        index.city = city
+        return index
+
+    index = ComparablesIndex.from_table(city, table)
+    if path is not None:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    return index
+
+
+class ComparablesRegistry:
+    """
+    Index des villes, chargés à la première demande (ou au démarrage, voir `preload`).
+    """
+
+    def __init__(self):
+        self._indexes: Dict[str, ComparablesIndex] = {}
+        self._lock = threading.Lock()
+
+    def loaded(self, city: str) -> Optional[ComparablesIndex]:
+        """
+        Retourne l'index d'une ville s'il est déjà chargé (sans bloquer).
+        """
+        return self._indexes.get(city)
+
+    def get(self, city: str) -> ComparablesIndex:
+        """
+        Retourne l'index d'une ville, en le chargeant au besoin (appel bloquant).
+
+        Raises:
+            FileNotFoundError: Si la ville n'a pas de fichier de ventes.
+        """
+        index = self._indexes.get(city)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(city)
+                if index is None:
+                    index = self._indexes[city] = build(city)
+        return index
+
+    def preload(self, cities: Iterable[str]) -> "ComparablesRegistry":
+        """
+        Charge l'index des villes qui ont un fichier de ventes.
+        """
+        for city in cities:
+            if source_path(city).is_file():
+                self.get(city)
+        return self
+
+
+comparables_registry = ComparablesRegistry()
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Construit l'index des ventes comparables de villes.")
+    parser.add_argument("cities", nargs="+", help="Villes (ex. lille bordeaux)")
+    args = parser.parse_args(argv)
+
+    for city in args.cities:
+        start = time.perf_counter()
+        index = build(city)
+        counts = ", ".join(f"{type_local}: {len(partition)}" for type_local, partition in index.partitions.items())
+        print(f"✅ {city}: {counts} sales indexed ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+# compiled.py
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+# Mode d'inférence : "standard" (scalers sklearn + modèle) ou "compiled" (tableaux numpy)
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "standard")
+
+# Nombre de lignes parcourues à la fois (borne la mémoire de la matrice arbres × lignes)
+CHUNK_ROWS = 4096
+
+
+def _affine(scaler, n_features: int):
+    """
+    Retourne (moyenne, écart-type) d'un StandardScaler, avec les valeurs neutres
+    quand le centrage ou la réduction sont désactivés.
+    """
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64).ravel()
+    scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64).ravel()
+    return mean, scale
+
+
+class CompiledTrees:
+    """
+    Ensemble d'arbres XGBoost aplati en tableaux numpy contigus, scalers intégrés.
+
+    Les nœuds de tous les arbres sont numérotés globalement (tableaux `feature`, `threshold`,
+    `children`, `value`) ; les feuilles bouclent sur elles-mêmes, ce qui permet de descendre
+    tous les arbres pour toutes les lignes en `depth` étapes vectorisées.
+
+    Les scalers sont repliés dans l'ensemble :
+        - test `(x - m) / s < t` ⇔ `x < T` : seuils exprimés en unités brutes (voir `_fold_thresholds`) ;
+        - `prix = (base + Σ feuilles) * sy + my` : feuilles multipliées par `sy`,
+          `base * sy + my` ajouté une seule fois.
+
+    Avec peu de variables, l'ensemble est constant sur chaque case de la grille formée par
+    ses seuils. Si cette grille est petite (≤ `TABLE_MAX_CELLS` cases), sa valeur est
+    précalculée : une prédiction ne coûte plus qu'un `searchsorted` par variable et une lecture.
+
+    Attributes:
+        feature, threshold, default_left, value: Un élément par nœud.
+        children (np.ndarray): Enfants (droit, gauche) de chaque nœud, à plat.
+        roots (np.ndarray): Le nœud racine de chaque arbre.
+        depth (int): La profondeur maximale des arbres.
+        base (float): La constante de sortie (base_score et scaler de sortie repliés).
+        edges (List[np.ndarray]): Les seuils distincts de chaque variable.
+        table (np.ndarray): Les prédictions par case de la grille, ou None.
+    """
+
+    TABLE_MAX_CELLS = 1 << 20
+
+    def __init__(self, feature, threshold, children, default_left, value, roots, depth, base, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.base = base
+        self.n_features = n_features
+        self.edges, self.strides, self.table = self._build_table()
+
+    @classmethod
+    def from_xgboost(cls, model, scaler_X, scaler_y) -> "CompiledTrees":
+        """
+        Compile un XGBRegressor (objectif reg:squarederror, booster gbtree) et ses scalers.
+
+        Raises:
+            ValueError: Si le modèle n'est pas supporté.
+        """
+        booster = model.get_booster()
+        config = json.loads(booster.save_config())
+        learner = config["learner"]
+        if learner["objective"]["name"] != "reg:squarederror":
+            raise ValueError(f"Objectif non supporté: {learner['objective']['name']}")
+        if int(learner["learner_model_param"].get("num_target", "1")) > 1:
+            raise ValueError("Les modèles multi-cibles ne sont pas supportés")
+
+        dump = json.loads(booster.save_raw(raw_format="json"))
+        gradient_booster = dump["learner"]["gradient_booster"]
+        if gradient_booster["name"] != "gbtree":
+            raise ValueError(f"Booster non supporté: {gradient_booster['name']}")
+
+        trees = gradient_booster["model"]["trees"]
+        # Comme XGBRegressor.predict : seulement les itérations jusqu'à best_iteration
+        best_iteration = getattr(model, "best_iteration", None)
+        if best_iteration is not None:
+            indptr = gradient_booster["model"]["iteration_indptr"]
+            trees = trees[: indptr[best_iteration + 1]]
+
+        n_features = int(learner["learner_model_param"]["num_feature"])
+        mean_X, scale_X = _affine(scaler_X, n_features)
+        mean_y, scale_y = _affine(scaler_y, 1)
+
+        features, thresholds, children, defaults, values, roots = [], [], [], [], [], []
+        depth = 0
+        offset = 0
+        for tree in trees:
+            if any(tree["split_type"]):
+                raise ValueError("Les splits catégoriels ne sont pas supportés")
+
+            left = np.asarray(tree["left_children"], dtype=np.intp)
+            right = np.asarray(tree["right_children"], dtype=np.intp)
+            feature = np.asarray(tree["split_indices"], dtype=np.intp)
+            condition = np.asarray(tree["split_conditions"], dtype=np.float64)
+            is_leaf = left == -1
+            ids = np.arange(len(left))
+
+            features.append(np.where(is_leaf, 0, feature))
+            thresholds.append(np.where(is_leaf, np.inf, _fold_thresholds(condition, mean_X[feature], scale_X[feature])))
+            # children[2 * nœud + aller_à_gauche]
+            children.append(np.column_stack([np.where(is_leaf, ids, right), np.where(is_leaf, ids, left)]) + offset)
+            defaults.append(np.asarray(tree["default_left"], dtype=bool))
+            values.append(np.where(is_leaf, condition * scale_y[0], 0.0))
+            roots.append(offset)
+
+            depth = max(depth, _tree_depth(left, right))
+            offset += len(left)
+
+        base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.concatenate(children).ravel(),
+            default_left=np.concatenate(defaults),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            depth=depth,
+            base=base_score * scale_y[0] + mean_y[0],
+            n_features=n_features,
+        )
+
+    def predict(self, house_matrix: np.ndarray) -> np.ndarray:
+        """
+        Prédit les prix (en unités brutes) d'une matrice de logements non normalisée.
+        """
+        X = np.asarray(house_matrix, dtype=np.float64)
+        has_missing = np.isnan(X).any()
+
+        if self.table is not None and not has_missing:
+            cell = np.zeros(len(X), dtype=np.intp)
+            for f, (edges, stride) in enumerate(zip(self.edges, self.strides)):
+                if len(edges):
+                    cell += np.searchsorted(edges, X[:, f], side="right") * stride
+            return np.take(self.table, cell)
+
+        if len(X) <= CHUNK_ROWS:
+            return self._traverse(X, has_missing)
+        return np.concatenate([
+            self._traverse(X[i:i + CHUNK_ROWS], has_missing) for i in range(0, len(X), CHUNK_ROWS)
+        ])
+
+    def _traverse(self, X: np.ndarray, has_missing: bool) -> np.ndarray:
+        n_rows, n_features = X.shape
+        flat_X = np.ascontiguousarray(X).ravel()
+        row_offsets = np.arange(n_rows, dtype=np.intp) * n_features
+
+        # nodes[t, i] : nœud courant de l'arbre t pour la ligne i
+        nodes = np.repeat(self.roots[:, None], n_rows, axis=1)
+        for _ in range(self.depth):
+            x = np.take(flat_X, row_offsets + np.take(self.feature, nodes))
+            go_left = x < np.take(self.threshold, nodes)
+            if has_missing:
+                go_left = np.where(np.isnan(x), np.take(self.default_left, nodes), go_left)
+            nodes = np.take(self.children, 2 * nodes + go_left)
+
+        return np.take(self.value, nodes).sum(axis=0) + self.base
+
+    def _build_table(self):
+        is_split = self.children[1::2] != np.arange(len(self.feature))
+        edges = [np.unique(self.threshold[is_split & (self.feature == f)]) for f in range(self.n_features)]
+
+        sizes = [len(e) + 1 for e in edges]
+        if np.prod(sizes, dtype=np.float64) > self.TABLE_MAX_CELLS:
+            return edges, None, None
+
+        strides = [int(np.prod(sizes[f + 1:], dtype=np.intp)) for f in range(self.n_features)]
+        # Un représentant par case : -inf pour la première, sinon le seuil qui l'ouvre (x >= seuil)
+        representatives = [np.concatenate([[-np.inf], e]) for e in edges]
+        grid = np.stack(np.meshgrid(*representatives, indexing="ij"), axis=-1).reshape(-1, self.n_features)
+
+        table = np.concatenate([
+            self._traverse(grid[i:i + CHUNK_ROWS], False) for i in range(0, len(grid), CHUNK_ROWS)
+        ])
+        return edges, strides, table
+
+
+class CompiledLinear:
+    """
+    Régression linéaire dont les scalers d'entrée et de sortie sont repliés dans les coefficients :
+    `prix = x · w' + b'`.
+    """
+
+    def __init__(self, weights: np.ndarray, intercept: float):
+        self.weights = weights
+        self.intercept = intercept
+
+    @classmethod
+    def from_linear(cls, model, scaler_X, scaler_y) -> "CompiledLinear":
+        coef = np.asarray(model.coef_, dtype=np.float64).ravel()
+        intercept = float(np.asarray(model.intercept_, dtype=np.float64).ravel()[0])
+        mean_X, scale_X = _affine(scaler_X, len(coef))
+        mean_y, scale_y = _affine(scaler_y, 1)
+
+        weights = coef / scale_X * scale_y[0]
+        return cls(weights, (intercept - np.dot(coef / scale_X, mean_X)) * scale_y[0] + mean_y[0])
+
+    def predict(self, house_matrix: np.ndarray) -> np.ndarray:
+        return np.asarray(house_matrix, dtype=np.float64) @ self.weights + self.intercept
+
+
+def _fold_thresholds(condition: np.ndarray, mean: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """
+    Exprime des seuils de split en unités brutes, à l'identique du test d'XGBoost.
+
+    XGBoost compare `float32((x - m) / s) < t` : le seuil naïf `t * s + m` se trompe de branche
+    quand `x` tombe exactement sur un split, cas fréquent pour des variables entières.
+    Le test étant monotone en `x`, on cherche par dichotomie le plus petit `T` (float64) tel que
+    `float32((T - m) / s) >= t` ; alors `x < T` ⇔ `float32((x - m) / s) < t` pour tout x.
+    """
+    t = condition.astype(np.float32)
+
+    def passes(x):
+        return ((x - mean) / scale).astype(np.float32) >= t
+
+    naive = condition * scale + mean
+    margin = (np.abs(condition) * 2.0 ** -20 + 2.0 ** -120) * scale
+    lo, hi = naive - margin, naive + margin
+    # Élargit l'intervalle jusqu'à encadrer la frontière
+    for _ in range(64):
+        widen_lo, widen_hi = passes(lo), ~passes(hi)
+        if not (widen_lo.any() or widen_hi.any()):
+            break
+        margin = margin * 2
+        lo = np.where(widen_lo, naive - margin, lo)
+        hi = np.where(widen_hi, naive + margin, hi)
+
+    for _ in range(128):
+        mid = lo + (hi - lo) / 2
+        converged = (mid <= lo) | (mid >= hi)
+        if converged.all():
+            break
+        ok = passes(mid)
+        hi = np.where(ok & ~converged, mid, hi)
+        lo = np.where(~ok & ~converged, mid, lo)
+    return hi
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+    depth = np.zeros(len(left), dtype=np.int64)
+    # Les enfants ont toujours un identifiant supérieur à celui de leur parent
+    for node in range(len(left)):
+        if left[node] != -1:
+            depth[left[node]] = depth[right[node]] = depth[node] + 1
+    return int(depth.max())
+
+
+def compile_model(model, scaler_X, scaler_y):
+    """
+    Compile un modèle et ses scalers en moteur d'inférence numpy.
+
+    Returns:
+        Le moteur compilé, ou None si le type de modèle n'est pas supporté.
+    """
+    model_type = type(model).__name__
+    try:
+        if model_type in {"XGBRegressor"}:
+            return CompiledTrees.from_xgboost(model, scaler_X, scaler_y)
+        if model_type in {"LinearRegression", "Ridge", "Lasso"}:
+            return CompiledLinear.from_linear(model, scaler_X, scaler_y)
+    except ValueError as e:
+        print(f"[WARNING] Could not compile {model_type}: {e}")
+    return None
+
+
+def _reference_predict(model, scaler_X, scaler_y, house_matrix: np.ndarray) -> np.ndarray:
+    output_scaled = np.asarray(model.predict(scaler_X.transform(house_matrix)))
+    return scaler_y.inverse_transform(output_scaled.reshape(-1, 1))[:, 0]
+
+
+def verify_compiled(compiled, model, scaler_X, scaler_y, n_rows: int = 2000, seed: int = 0) -> float:
+    """
+    Compare le moteur compilé à la chaîne d'origine (scaler → modèle → scaler inverse) sur des
+    logements tirés autour de la distribution d'entraînement (moyenne ± 3 écarts-types, positifs),
+    en valeurs entières puis continues.
+
+    Returns:
+        float: L'écart relatif maximal entre les deux prédictions.
+    """
+    mean, scale = _affine(scaler_X, getattr(scaler_X, "n_features_in_", 4))
+    rng = np.random.default_rng(seed)
+    X = np.abs(rng.normal(mean, 3 * scale, size=(n_rows, len(mean))))
+    X = np.vstack([X.round(), X])
+
+    expected = _reference_predict(model, scaler_X, scaler_y, X)
+    got = compiled.predict(X)
+    return float(np.max(np.abs(got - expected) / np.maximum(np.abs(expected), 1e-9)))
+
+
+def maybe_compile(model, scaler_X, scaler_y, mode: Optional[str] = None, tolerance: float = 1e-5):
+    """
+    Compile le modèle si le mode "compiled" est actif et si le moteur reproduit la chaîne d'origine.
+
+    Returns:
+        Le moteur compilé vérifié, ou None (la chaîne d'origine reste alors utilisée).
+    """
+    if (mode or INFERENCE_MODE) != "compiled":
+        return None
+
+    compiled = compile_model(model, scaler_X, scaler_y)
+    if compiled is None:
+        return None
+
+    error = verify_compiled(compiled, model, scaler_X, scaler_y)
+    if error > tolerance:
+        print(f"[WARNING] Compiled {type(model).__name__} rejected (max relative error {error:.2e})")
+        return None
+    return compiled
@@ -0,0 +1,154 @@
+# drift.py
+import os
+import random
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Nombre de classes des histogrammes (quantiles des données de référence)
+DRIFT_BINS = int(os.getenv("DRIFT_BINS", "10"))
+# Taille de l'échantillon de prédictions conservé pour les rapports Evidently
+DRIFT_SAMPLE_SIZE = int(os.getenv("DRIFT_SAMPLE_SIZE", "5000"))
+
+# Lissage des proportions nulles dans le calcul du PSI
+PSI_EPSILON = 1e-4
+
+
+def reference_edges(values: np.ndarray, n_bins: int = DRIFT_BINS) -> np.ndarray:
+    """
+    Calcule les bornes intérieures des classes d'une variable à partir de ses quantiles de référence.
+
+    Deux classes encadrent le domaine de référence (valeurs sous le minimum, au-delà du maximum).
+    Les bornes en double (variables discrètes ou constantes) sont fusionnées : une variable
+    constante donne trois classes, « sous la valeur », « égale » et « au-dessus ».
+    """
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return np.empty(0)
+    quantiles = np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1])
+    return np.unique(np.concatenate([[values.min()], quantiles, [np.nextafter(values.max(), np.inf)]]))
+
+
+def population_stability_index(expected: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """
+    PSI entre deux distributions par classe (une ligne par variable) : Σ (a - e) · ln(a / e).
+    """
+    expected = np.maximum(expected, PSI_EPSILON)
+    actual = np.maximum(actual, PSI_EPSILON)
+    return ((actual - expected) * np.log(actual / expected)).sum(axis=-1)
+
+
+def binned_ks(expected: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """
+    Statistique de Kolmogorov-Smirnov évaluée aux bornes des classes (une ligne par variable).
+
+    C'est un minorant de la statistique exacte, d'autant plus proche que les classes sont fines.
+    """
+    return np.abs(np.cumsum(expected, axis=-1) - np.cumsum(actual, axis=-1)).max(axis=-1)
+
+
+class DriftMonitor:
+    """
+    Suivi incrémental de la dérive des données servies par rapport aux données de référence.
+
+    Chaque variable est résumée par un histogramme à classes fixes, celles du profil des données
+    de référence (voir `reference_profiles`) : une observation ne fait qu'incrémenter un compteur,
+    et la mémoire ne dépend pas du nombre de prédictions. PSI et KS sont recalculés sur ces
+    histogrammes, sans jamais relire les lignes de référence.
+
+    Un échantillon uniforme borné (réservoir) des observations est conservé en parallèle,
+    pour produire un rapport Evidently complet à la demande.
+
+    Args:
+        profile (ReferenceProfile): Le profil des données de référence (variables, classes, histogrammes).
+        sample_size (int): La taille du réservoir d'observations.
+    """
+
+    def __init__(
+        self,
+        profile,
+        sample_size: int = DRIFT_SAMPLE_SIZE,
+        seed: Optional[int] = None,
+    ):
+        self.profile = profile
+        self.features = list(profile.features)
+        self.edges = profile.edges
+        # Histogrammes alignés sur le plus grand nombre de classes ; les classes de bourrage
+        # restent vides des deux côtés et ne contribuent ni au PSI ni au KS.
+        self.reference_counts = np.asarray(profile.counts, dtype=float)
+
+        self.sample_size = sample_size
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Ouvre une nouvelle fenêtre d'observation (histogrammes et réservoir vidés).
+        """
+        with self._lock:
+            self.counts = np.zeros_like(self.reference_counts)
+            self.sample: List[Dict] = []
+            self.seen = 0
+
+    def update(self, rows: List[Dict]):
+        """
+        Ajoute des observations (un dictionnaire par prédiction, valeurs manquantes ignorées).
+        """
+        if not rows:
+            return
+        values = np.array([[row.get(f, np.nan) for f in self.features] for row in rows], dtype=float)
+        width = self.counts.shape[1]
+        with self._lock:
+            for i in range(len(self.features)):
+                self.counts[i] += self._histogram(i, values[:, i], width)
+
+            # Algorithme R : chaque observation a la même probabilité d'être dans le réservoir
+            for row in rows:
+                self.seen += 1
+                if len(self.sample) < self.sample_size:
+                    self.sample.append(row)
+                else:
+                    j = self._random.randrange(self.seen)
+                    if j < self.sample_size:
+                        self.sample[j] = row
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Retourne le PSI, le KS et le nombre d'observations de chaque variable sur la fenêtre courante.
+        """
+        with self._lock:
+            counts = self.counts.copy()
+        observed = counts.sum(axis=1)
+        expected = _proportions(self.reference_counts)
+        actual = _proportions(counts)
+        psi = population_stability_index(expected, actual)
+        ks = binned_ks(expected, actual)
+
+        return {
+            feature: {
+                "psi": float(psi[i]) if observed[i] else 0.0,
+                "ks": float(ks[i]) if observed[i] else 0.0,
+                "observations": int(observed[i]),
+            }
+            for i, feature in enumerate(self.features)
+        }
+
+    def sample_frame(self) -> pd.DataFrame:
+        """
+        Retourne l'échantillon d'observations de la fenêtre courante.
+        """
+        with self._lock:
+            return pd.DataFrame(list(self.sample), columns=self.features)
+
+    def _histogram(self, i: int, values: np.ndarray, width: int) -> np.ndarray:
+        values = values[~np.isnan(values)]
+        bins = np.searchsorted(self.edges[i], values, side="right")
+        return np.bincount(bins, minlength=width)[:width]
+
+
+def _proportions(counts: np.ndarray) -> np.ndarray:
+    totals = counts.sum(axis=1, keepdims=True)
+    return np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
@@ -0,0 +1,265 @@
+# inference_pool.py
+"""
+Backend d'inférence multi-processus (`INFERENCE_BACKEND=process`).
+
+Les moteurs compilés (api/compiled.py) sont évalués dans un pool de processus, hors du GIL
+du processus qui sert les requêtes et fait tourner le monitoring.
+
+Les tableaux d'un moteur sont écrits une seule fois dans un fichier de `INFERENCE_SHM_DIR`
+(`/dev/shm`, mémoire partagée, par défaut) ; chaque processus le projette en lecture seule
+(`np.memmap`) et reconstruit le moteur sur ces vues, sans copie : les pages sont partagées
+par tous les processus. Un calcul ne transmet que le descripteur du moteur (quelques
+centaines d'octets) et la matrice des logements (tampon float64 contigu) ; le résultat
+revient sous forme de tableau float64.
+
+Les modèles qui ne peuvent pas être compilés restent évalués dans le thread appelant.
+
+Si un processus du pool meurt (manque de mémoire, signal), le pool est reconstruit
+(`inference_pool_restarts_total`) et le calcul relancé ; s'il échoue encore, il est évalué
+dans le thread appelant.
+"""
+import multiprocessing
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from . import compiled
+from .metrics import INFERENCE_POOL_RESTARTS
+
+# --- Configuration (variables d'environnement) ---
+# Backend d'inférence : "thread" (dans le processus de l'API) ou "process" (pool de processus)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "thread")
+# Nombre de processus du pool (0 : un par cœur)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+# Répertoire des tableaux partagés (un système de fichiers en mémoire de préférence)
+INFERENCE_SHM_DIR = os.getenv(
+    "INFERENCE_SHM_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+)
+
+# Alignement des tableaux dans le fichier partagé, en octets
+_ALIGNMENT = 64
+# Moteurs gardés projetés par chaque processus du pool
+_WORKER_ENGINES = 32
+
+
+class SharedEngine(NamedTuple):
+    """
+    Descripteur d'un moteur compilé dont les tableaux sont dans un fichier partagé.
+
+    Attributes:
+        path (str): Le fichier des tableaux.
+        cls (str): La classe du moteur dans api/compiled.py.
+        arrays (Tuple): Pour chaque tableau : (attribut, indice dans une liste ou -1, dtype, forme, position).
+        attributes (Tuple): Les autres attributs du moteur, (nom, valeur).
+    """
+
+    path: str
+    cls: str
+    arrays: Tuple[Tuple[str, int, str, Tuple[int, ...], int], ...]
+    attributes: Tuple[Tuple[str, Any], ...]
+
+
+def share(engine: Any, directory: str = INFERENCE_SHM_DIR) -> SharedEngine:
+    """
+    Écrit les tableaux d'un moteur compilé dans un fichier partagé.
+
+    Les attributs tableaux et listes de tableaux (seuils de `CompiledTrees`…) sont copiés
+    dans le fichier ; les autres attributs (profondeur, constantes) voyagent dans le descripteur.
+
+    Returns:
+        SharedEngine: Le descripteur, à passer à `attach`.
+    """
+    arrays, attributes = [], []
+    for name, value in vars(engine).items():
+        if isinstance(value, np.ndarray):
+            arrays.append((name, -1, np.ascontiguousarray(value)))
+        elif isinstance(value, list) and value and all(isinstance(item, np.ndarray) for item in value):
+            arrays.extend((name, index, np.ascontiguousarray(item)) for index, item in enumerate(value))
+        else:
+            attributes.append((name, value))
+
+    layout, offset = [], 0
+    for name, index, array in arrays:
+        layout.append((name, index, array.dtype.str, array.shape, offset))
+        offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+
+    fd, path = tempfile.mkstemp(prefix="engine-", suffix=".bin", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        for (_, _, _, _, position), (_, _, array) in zip(layout, arrays):
+            f.seek(position)
+            f.write(array.tobytes())
+        f.truncate(max(offset, 1))
+
+    return SharedEngine(path, type(engine).__name__, tuple(layout), tuple(attributes))
+
+
+def attach(descriptor: SharedEngine) -> Any:
+    """
+    Reconstruit un moteur compilé sur les tableaux de son fichier partagé, projetés en lecture seule.
+    """
+    buffer = np.memmap(descriptor.path, dtype=np.uint8, mode="r")
+    engine = object.__new__(getattr(compiled, descriptor.cls))
+    state: Dict[str, Any] = dict(descriptor.attributes)
+    for name, index, dtype, shape, offset in descriptor.arrays:
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=offset)
+        if index < 0:
+            state[name] = array
+        else:
+            state.setdefault(name, []).append(array)
+    engine.__dict__.update(state)
+    return engine
+
+
+# Moteurs projetés par le processus courant (un processus du pool), par fichier
+_engines: "OrderedDict[str, Any]" = OrderedDict()
+
+
+def _evaluate(descriptor: SharedEngine, house_matrix: np.ndarray) -> np.ndarray:
+    """
+    Évalue un moteur partagé dans un processus du pool.
+    """
+    engine = _engines.get(descriptor.path)
+    if engine is None:
+        engine = _engines[descriptor.path] = attach(descriptor)
+        if len(_engines) > _WORKER_ENGINES:
+            _engines.popitem(last=False)  # la projection est fermée avec le moteur
+    else:
+        _engines.move_to_end(descriptor.path)
+    return np.asarray(engine.predict(house_matrix), dtype=np.float64)
+
+
+def _ready(_: int = 0) -> int:
+    return os.getpid()
+
+
+class InferencePool:
+    """
+    Pool de processus qui évalue les moteurs compilés.
+
+    Chaque moteur est partagé à sa première évaluation ; son fichier est supprimé quand le moteur
+    est libéré (nouvelle version des modèles, éviction) ou à la fermeture du pool. Les processus
+    qui l'ont projeté gardent leur projection jusqu'à ce qu'ils l'évincent.
+
+    Les processus sont lancés avec la méthode "spawn" : ils n'héritent ni des threads ni des
+    verrous du processus de l'API.
+
+    Args:
+        workers (int): Nombre de processus (0 : un par cœur).
+        directory (str): Répertoire des tableaux partagés.
+    """
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, directory: str = INFERENCE_SHM_DIR):
+        self.workers = workers or os.cpu_count() or 1
+        self.directory = directory
+        self.executor = self._executor()
+        self._shared: "weakref.WeakKeyDictionary[Any, SharedEngine]" = weakref.WeakKeyDictionary()
+        self._files: Dict[str, weakref.finalize] = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> "InferencePool":
+        """
+        Lance les processus du pool et attend qu'ils soient prêts.
+        """
+        list(self.executor.map(_ready, range(self.workers)))
+        return self
+
+    def predict(self, engine: Any, house_matrix: np.ndarray) -> np.ndarray:
+        """
+        Évalue un moteur compilé dans un processus du pool (appel bloquant, depuis un thread).
+
+        Args:
+            engine: Le moteur compilé (`ModelBundle.compiled`).
+            house_matrix (np.ndarray): Matrice (n, 4) des caractéristiques.
+
+        Returns:
+            np.ndarray: Les prix au m² estimés, de taille n.
+        """
+        matrix = np.ascontiguousarray(house_matrix, dtype=np.float64)
+        descriptor = self.descriptor(engine)
+        for _ in range(2):
+            executor = self.executor
+            try:
+                return executor.submit(_evaluate, descriptor, matrix).result()
+            except BrokenProcessPool:
+                self._restart(executor)
+        # Le pool reconstruit a de nouveau échoué : le calcul est fait ici, sans le pool
+        return np.asarray(engine.predict(matrix), dtype=np.float64)
+
+    def descriptor(self, engine: Any) -> SharedEngine:
+        """
+        Retourne le descripteur d'un moteur, en le partageant s'il ne l'est pas encore.
+        """
+        descriptor = self._shared.get(engine)
+        if descriptor is not None:
+            return descriptor
+        with self._lock:
+            descriptor = self._shared.get(engine)
+            if descriptor is None:
+                descriptor = self._shared[engine] = share(engine, self.directory)
+                self._files[descriptor.path] = weakref.finalize(engine, self._remove, descriptor.path)
+        return descriptor
+
+    def close(self):
+        """
+        Arrête les processus et supprime les fichiers partagés.
+        """
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        for finalizer in list(self._files.values()):
+            finalizer()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self.executor is not broken:
+                return  # déjà reconstruit par un autre thread
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._executor()
+        INFERENCE_POOL_RESTARTS.inc()
+        print("[WARNING] An inference worker process died, process pool restarted")
+
+    def _remove(self, path: str):
+        self._files.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# Pool du processus de l'API, s'il est actif
+_pool: Optional[InferencePool] = None
+
+
+def start(workers: int = INFERENCE_WORKERS) -> InferencePool:
+    """
+    Démarre le pool de processus de l'API (voir `current`).
+    """
+    global _pool
+    if _pool is None:
+        _pool = InferencePool(workers).start()
+    return _pool
+
+
+def current() -> Optional[InferencePool]:
+    """
+    Retourne le pool de processus actif, ou None avec le backend "thread".
+    """
+    return _pool
+
+
+def stop():
+    """
+    Arrête le pool de processus de l'API.
+    """
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
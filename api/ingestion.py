@@ -0,0 +1,318 @@
+# ingestion.py
+"""
+Lecture des exports DVF (Demandes de Valeurs Foncières) par morceaux, avec cache en colonnes.
+
+    python -m api.ingestion csv_data/lille_2024.csv csv_data/bordeaux_2024.csv
+
+Les fichiers sont lus par blocs de `DVF_CHUNK_ROWS` lignes, avec des types explicites :
+seules les colonnes utiles sont chargées, les biens non résidentiels et les prix non finis
+sont écartés au fil de l'eau. Le résultat est écrit colonne par colonne en binaire brut dans
+`<cache>/<sha256 du fichier>/`, puis projeté en mémoire (`np.memmap`) : la mémoire ne dépend
+pas de la taille du fichier source, et un fichier inchangé n'est jamais relu.
+
+Les exports bruts de data.gouv.fr (séparateur `|`, décimales à virgule) et les extraits
+de `csv_data/` (séparateur `,`) sont acceptés.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .model_store import file_sha256
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DVF_CACHE_DIR = Path(os.getenv("DVF_CACHE_DIR", ROOT_DIR / "csv_data" / ".cache"))
+DVF_CHUNK_ROWS = int(os.getenv("DVF_CHUNK_ROWS", "200000"))
+
+# À incrémenter quand les colonnes produites changent : les caches existants sont alors ignorés
+SCHEMA_VERSION = 1
+
+# Types de biens conservés (libellé DVF → type de logement de l'API)
+RESIDENTIAL_TYPES = {"Appartement": "appartement", "Maison": "maison"}
+
+# Colonnes DVF lues (toutes en texte, converties ensuite)
+SOURCE_COLUMNS = [
+    "Date mutation", "Nature mutation", "Valeur fonciere", "Code postal", "Commune",
+    "Code departement", "Code commune", "Section", "Surface Carrez du 1er lot", "Nombre de lots",
+    "Type local", "Surface reelle bati", "Nombre pieces principales", "Surface terrain",
+]
+
+# Colonnes produites et leur type ; les colonnes texte sont encodées par dictionnaire (codes int32)
+COLUMNS = {
+    "date_mutation": "datetime64[D]",
+    "valeur_fonciere": "float64",
+    "surface_bati": "float64",
+    "nombre_pieces": "float64",
+    "surface_terrain": "float64",
+    "nombre_lots": "float64",
+    "surface_carrez": "float64",
+    "prix_m2": "float64",
+    "code_postal": "int32",
+    "type_local": "category",
+    "commune": "category",
+    "code_commune": "category",
+    "section": "category",
+}
+
+
+# -------------------------------
+#  LECTURE PAR MORCEAUX
+# -------------------------------
+def _to_float(values: pd.Series) -> np.ndarray:
+    """
+    Convertit une colonne texte DVF en flottants (décimales à virgule, valeurs vides → NaN).
+
+    La conversion passe par `float` (arrondi correct) : les valeurs relues sont identiques
+    au bit près à celles écrites par les notebooks.
+    """
+    values = values.str.strip().str.replace(",", ".", regex=False)
+    return values.mask(values == "", "nan").astype(np.float64).to_numpy()
+
+
+def _insee_code(departement: pd.Series, commune: pd.Series) -> pd.Series:
+    """
+    Code INSEE de la commune : département sur 2 caractères + commune sur 3
+    (outre-mer : département sur 3 caractères + commune sur 2).
+    """
+    departement = departement.str.strip()
+    commune = commune.str.strip().str.split(".").str[0].str.zfill(3)
+    overseas = departement.str.len() == 3
+    return (departement.str.zfill(2) + commune).where(~overseas, departement + commune.str[-2:])
+
+
+def detect_separator(path: Path) -> str:
+    """
+    Séparateur d'un export DVF : `|` (fichiers data.gouv.fr) ou `,` (extraits de `csv_data/`).
+    """
+    with open(path, encoding="utf-8") as f:
+        header = f.readline()
+    return "|" if header.count("|") > header.count(",") else ","
+
+
+def read_dvf_chunks(
+    path: Path,
+    chunk_rows: int = DVF_CHUNK_ROWS,
+    nature_mutation: Optional[str] = "Vente",
+) -> Iterator[pd.DataFrame]:
+    """
+    Lit un export DVF par morceaux et retourne, pour chacun, les ventes résidentielles typées.
+
+    Args:
+        path (Path): L'export DVF.
+        chunk_rows (int): Le nombre de lignes lues à la fois.
+        nature_mutation (str): La nature de mutation conservée (None : toutes).
+
+    Yields:
+        pd.DataFrame: Les colonnes de `COLUMNS` (texte pour les colonnes catégorielles).
+    """
+    reader = pd.read_csv(
+        path,
+        sep=detect_separator(path),
+        usecols=lambda column: column in SOURCE_COLUMNS,
+        dtype=str,
+        keep_default_na=False,
+        chunksize=chunk_rows,
+        encoding="utf-8",
+    )
+    for chunk in reader:
+        keep = chunk["Type local"].isin(RESIDENTIAL_TYPES)
+        if nature_mutation is not None:
+            keep &= chunk["Nature mutation"] == nature_mutation
+        chunk = chunk[keep]
+
+        valeur = _to_float(chunk["Valeur fonciere"])
+        surface = _to_float(chunk["Surface reelle bati"])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            prix_m2 = valeur / surface
+        finite = np.isfinite(prix_m2)
+        chunk = chunk[finite]
+        if chunk.empty:
+            continue
+
+        code_postal = _to_float(chunk["Code postal"])
+        yield pd.DataFrame({
+            "date_mutation": pd.to_datetime(chunk["Date mutation"], format="%d/%m/%Y").to_numpy("datetime64[D]"),
+            "valeur_fonciere": valeur[finite],
+            "surface_bati": surface[finite],
+            "nombre_pieces": _to_float(chunk["Nombre pieces principales"]),
+            "surface_terrain": _to_float(chunk["Surface terrain"]),
+            "nombre_lots": _to_float(chunk["Nombre de lots"]),
+            "surface_carrez": _to_float(chunk["Surface Carrez du 1er lot"]),
+            "prix_m2": prix_m2[finite],
+            "code_postal": np.where(np.isnan(code_postal), -1, code_postal).astype(np.int32),
+            "type_local": chunk["Type local"].map(RESIDENTIAL_TYPES).to_numpy(),
+            "commune": chunk["Commune"].str.strip().str.upper().to_numpy(),
+            "code_commune": _insee_code(chunk["Code departement"], chunk["Code commune"]).to_numpy(),
+            "section": chunk["Section"].str.strip().to_numpy(),
+        })
+
+
+# -------------------------------
+#  CACHE EN COLONNES
+# -------------------------------
+class DVFTable:
+    """
+    Ventes résidentielles d'un export DVF, colonne par colonne, projetées en mémoire.
+
+    Attributes:
+        columns (Dict[str, np.ndarray]): Les colonnes (codes int32 pour les colonnes catégorielles).
+        categories (Dict[str, List[str]]): Les valeurs des colonnes catégorielles, indexées par code.
+        rows (int): Le nombre de ventes.
+        source (str): Le fichier source.
+        source_sha256 (str): L'empreinte SHA-256 du fichier source, calculée une fois à l'ingestion.
+        directory (Path): Le dossier du cache, où des index dérivés peuvent être enregistrés (voir api/comparables.py).
+    """
+
+    def __init__(
+        self,
+        columns: Dict[str, np.ndarray],
+        categories: Dict[str, List[str]],
+        rows: int,
+        source: str,
+        directory: Optional[Path] = None,
+        source_sha256: Optional[str] = None,
+    ):
+        self.columns = columns
+        self.categories = categories
+        self.rows = rows
+        self.source = source
+        self.directory = directory
+        self.source_sha256 = source_sha256
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def code(self, column: str, value: str) -> int:
+        """
+        Retourne le code d'une valeur d'une colonne catégorielle (-1 si elle est absente).
+        """
+        try:
+            return self.categories[column].index(value)
+        except ValueError:
+            return -1
+
+    def mask(self, **filters: str) -> np.ndarray:
+        """
+        Sélectionne les ventes par valeur de colonnes catégorielles, ex. `mask(commune="LILLE")`.
+        """
+        selected = np.ones(self.rows, dtype=bool)
+        for column, value in filters.items():
+            selected &= self.columns[column] == self.code(column, value)
+        return selected
+
+    def to_frame(self, columns: Optional[Sequence[str]] = None, mask: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """
+        Retourne les ventes (éventuellement filtrées) sous forme de DataFrame.
+        """
+        frame = {}
+        for name in columns or self.columns:
+            values = self.columns[name] if mask is None else self.columns[name][mask]
+            if name in self.categories:
+                values = pd.Categorical.from_codes(values, self.categories[name])
+            frame[name] = values
+        return pd.DataFrame(frame)
+
+
+def _load_table(directory: Path, source_sha256: str) -> DVFTable:
+    meta = json.loads((directory / "meta.json").read_text())
+    rows = meta["rows"]
+    columns = {}
+    for name, dtype in COLUMNS.items():
+        dtype = np.int32 if dtype == "category" else np.dtype(dtype)
+        columns[name] = (
+            np.memmap(directory / f"{name}.bin", dtype=dtype, mode="r", shape=(rows,))
+            if rows else np.empty(0, dtype=dtype)
+        )
+    return DVFTable(columns, meta["categories"], rows, meta["source"], directory, source_sha256)
+
+
+def ingest(
+    path: Path,
+    cache_dir: Path = DVF_CACHE_DIR,
+    chunk_rows: int = DVF_CHUNK_ROWS,
+    nature_mutation: Optional[str] = "Vente",
+) -> DVFTable:
+    """
+    Retourne les ventes résidentielles d'un export DVF, depuis le cache si le fichier n'a pas changé.
+
+    Args:
+        path (Path): L'export DVF.
+        cache_dir (Path): Le dossier du cache en colonnes.
+        chunk_rows (int): Le nombre de lignes lues à la fois.
+        nature_mutation (str): La nature de mutation conservée (None : toutes).
+
+    Returns:
+        DVFTable: Les ventes, colonnes projetées en mémoire.
+    """
+    path = Path(path)
+    source_sha256 = file_sha256(path)
+    digest = hashlib.sha256(f"{source_sha256}:{nature_mutation}:{SCHEMA_VERSION}".encode()).hexdigest()
+    target = Path(cache_dir) / digest
+    if (target / "meta.json").is_file():
+        return _load_table(target, source_sha256)
+
+    tmp = target.with_name(f"{digest}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    rows = 0
+    codes: Dict[str, Dict[str, int]] = {name: {} for name, dtype in COLUMNS.items() if dtype == "category"}
+    files = {name: open(tmp / f"{name}.bin", "wb") for name in COLUMNS}
+    try:
+        for chunk in read_dvf_chunks(path, chunk_rows, nature_mutation):
+            for name, dtype in COLUMNS.items():
+                values = chunk[name].to_numpy()
+                if dtype == "category":
+                    local_codes, uniques = pd.factorize(values)
+                    mapping = codes[name]
+                    values = np.array([mapping.setdefault(u, len(mapping)) for u in uniques], dtype=np.int32)
+                    values = values[local_codes] if len(values) else local_codes.astype(np.int32)
+                else:
+                    values = values.astype(dtype)
+                files[name].write(np.ascontiguousarray(values).tobytes())
+            rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+
+    meta = {
+        "source": str(path),
+        "source_sha256": source_sha256,
+        "rows": rows,
+        "schema": SCHEMA_VERSION,
+        "categories": {name: list(mapping) for name, mapping in codes.items()},
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, ensure_ascii=False))
+    try:
+        os.replace(tmp, target)
+    except OSError:
+        # Un autre processus a écrit le même cache entre-temps
+        shutil.rmtree(tmp, ignore_errors=True)
+    return _load_table(target, source_sha256)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Prépare le cache en colonnes d'exports DVF.")
+    parser.add_argument("files", nargs="+", type=Path, help="Exports DVF (csv_data/*.csv ou ValeursFoncieres-*.txt)")
+    parser.add_argument("--cache-dir", type=Path, default=DVF_CACHE_DIR, help="Dossier du cache")
+    parser.add_argument("--chunk-rows", type=int, default=DVF_CHUNK_ROWS, help="Lignes lues à la fois")
+    args = parser.parse_args(argv)
+
+    for path in args.files:
+        start = time.perf_counter()
+        table = ingest(path, args.cache_dir, args.chunk_rows)
+        print(f"✅ {path}: {table.rows} residential sales ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
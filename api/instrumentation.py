@@ -0,0 +1,102 @@
+# instrumentation.py
+"""
+Mesure des étapes du chemin de prédiction (histogramme `prediction_stage_latency_seconds`).
+
+Étapes mesurées, chacune étiquetée par ville, type de logement et version des modèles :
+    - `validation` : lecture du corps, validation Pydantic et dépendances (authentification) ;
+    - `admission_queue` : débit par utilisateur et attente d'une place de traitement (api/admission.py) ;
+    - `thread_queue` : attente d'un thread libre du pool de `asyncio.to_thread` ;
+    - `transform`, `predict`, `inverse_transform` : la chaîne scaler → modèle → scaler inverse
+      (ou `compiled` pour le moteur compilé, `process_pool` s'il est évalué dans le pool de processus) ;
+    - `monitoring_enqueue` : dépôt des prédictions dans la file de monitoring.
+
+Un lot mêlant plusieurs villes ou types de logement est étiqueté `*`.
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+from fastapi import Request
+from fastapi.routing import APIRoute
+
+from .metrics import PREDICTION_STAGE_LATENCY
+
+# Étiquette des observations qui couvrent plusieurs villes ou types de logement
+ANY_LABEL = "*"
+
+# Instant de soumission au pool de threads (copié dans le contexte du thread par `asyncio.to_thread`)
+_submitted_at: ContextVar[Optional[float]] = ContextVar("submitted_at", default=None)
+
+
+def observe_stage(stage: str, city: str, type_local: str, version: Optional[str], seconds: float):
+    """
+    Enregistre la durée d'une étape du chemin de prédiction.
+    """
+    PREDICTION_STAGE_LATENCY.labels(
+        stage=stage, city=city, type_local=type_local, version=version or "unknown"
+    ).observe(seconds)
+
+
+async def to_thread(fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    `asyncio.to_thread` dont l'attente dans la file du pool peut être mesurée,
+    depuis le thread, avec `observe_thread_wait`.
+    """
+    _submitted_at.set(time.perf_counter())
+    return await asyncio.to_thread(fn, *args)
+
+
+def observe_thread_wait(city: str, type_local: str, version: Optional[str]):
+    """
+    Enregistre l'attente du thread courant dans la file du pool, s'il a été lancé par `to_thread`.
+    """
+    submitted_at = _submitted_at.get()
+    if submitted_at is not None:
+        observe_stage("thread_queue", city, type_local, version, time.perf_counter() - submitted_at)
+
+
+def mark_admission(request: Request, admitted: bool = False):
+    """
+    Note le début de l'admission d'une requête (ou, avec `admitted`, sa fin), pour que
+    `observe_validation` mesure l'attente d'admission à part de la validation.
+    """
+    state = getattr(request, "state", None)
+    if state is not None:
+        setattr(state, "admitted_at" if admitted else "admission_started_at", time.perf_counter())
+
+
+def observe_validation(request: Request, city: str, type_local: str, version: Optional[str]):
+    """
+    Enregistre la durée de validation d'une requête servie par une `TimedRoute`,
+    puis son attente d'admission si elle est passée par `admission.admitted`.
+    """
+    state = getattr(request, "state", None)
+    received_at = getattr(state, "received_at", None)
+    if received_at is None:
+        return
+
+    now = time.perf_counter()
+    admission_started_at = getattr(state, "admission_started_at", None)
+    if admission_started_at is None:
+        observe_stage("validation", city, type_local, version, now - received_at)
+        return
+    observe_stage("validation", city, type_local, version, admission_started_at - received_at)
+    admitted_at = getattr(state, "admitted_at", now)
+    observe_stage("admission_queue", city, type_local, version, admitted_at - admission_started_at)
+
+
+class TimedRoute(APIRoute):
+    """
+    Route FastAPI qui note l'arrivée de la requête avant la lecture et la validation du corps,
+    pour que le service mesure l'étape `validation`.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request):
+            request.state.received_at = time.perf_counter()
+            return await handler(request)
+
+        return timed_handler
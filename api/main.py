@@ -1,20 +1,82 @@
+# Startup timing starts before any other import (see api/startup.py)
+from . import startup
 from fastapi import FastAPI, Request
 from contextlib import asynccontextmanager
-from .metrics import REQUEST_COUNT, REQUEST_LATENCY
+from functools import partial
+import asyncio
+import gc
+import os
+from .metrics import ERROR_COUNT, REQUEST_COUNT, REQUEST_LATENCY
 import time
 
+from .admission import AdmissionController, TokenBuckets, ADMISSION_MAX_CONCURRENCY, RATE_LIMIT_PER_SECOND
+from .batching import MicroBatcher, MICRO_BATCHING
+from .cache import PredictionCache, PREDICTION_CACHE_SIZE_MAX
+from . import inference_pool
+from .inference_pool import INFERENCE_BACKEND
+from .services import predict_group, warm_up
+from .monitoring_queue import MonitoringQueue
+from .service_monitoring import consume_monitoring_batch, drift_report_loop, DRIFT_REPORT_INTERVAL
+
 from .routes import router
 from .routes_monitoring import router_monitoring
-from .models import (
-    load_model_a_lille,
-    load_model_m_lille,
-    load_scaler_Xa_lille,
-    load_scaler_Xm_lille,
-    load_scaler_ya_lille,
-    load_scaler_ym_lille,
-    load_model_a_bordeaux,
-    load_model_m_bordeaux,
-)
+from .routes_comparables import router_comparables
+from .comparables import comparables_registry
+from .routes_market import router_market
+from .market_stats import market_cube, watch_market_stats, MARKET_STATS_WATCH_INTERVAL
+from .models import registry, watch_models, MODEL_WATCH_INTERVAL
+from . import multiprocess_metrics
+
+# Heavy libraries (evidently, pandas, sklearn, xgboost, mlflow) are imported on first use,
+# not here: they are loaded by the background model warm-up or by the monitoring thread.
+startup.record("imports", time.perf_counter() - startup.STARTED_AT)
+
+# Load and warm up every model in the background once the app is up (0: on first request)
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+
+# Pre-fork loading: with `gunicorn --preload`, workers inherit the loaded models
+# and share their memory pages instead of each deserializing a private copy.
+if os.getenv("PRELOAD_MODELS") == "1":
+    with startup.phase("artifacts"):
+        registry.preload()
+    # Move the loaded objects out of the GC generations, so collections in the workers
+    # do not touch (and copy-on-write) the shared pages.
+    gc.freeze()
+
+
+def _warm_all(model_set):
+    for key in model_set.bundles:
+        warm_up(model_set.bundles[key])
+
+
+async def warm_up_in_background():
+    """
+    Start the inference pool, then load and warm up every model of the catalog, its
+    comparable-sales indexes and the market statistics cube, off the event loop:
+    the app serves requests (and /health) meanwhile.
+    """
+    try:
+        if INFERENCE_BACKEND == "process":
+            with startup.phase("inference_pool"):
+                pool = await asyncio.to_thread(inference_pool.start)
+            print(f"✅ Inference pool started ({pool.workers} processes)")
+        if MODEL_WARMUP:
+            with startup.phase("artifacts"):
+                model_set = (await asyncio.to_thread(registry.preload)).current()
+            with startup.phase("warmup"):
+                await asyncio.to_thread(_warm_all, model_set)
+            # Comparable-sales indexes of the catalog cities (built once, then read from the DVF cache)
+            with startup.phase("comparables"):
+                await asyncio.to_thread(comparables_registry.preload, model_set.cities)
+            # Precomputed market statistics cube (built by `python -m api.market_stats`)
+            with startup.phase("market_stats"):
+                await asyncio.to_thread(market_cube.load)
+        print(
+            "⏱ Background startup done: "
+            f"{startup.summary('inference_pool', 'artifacts', 'warmup', 'comparables', 'market_stats')}"
+        )
+    except Exception as e:
+        print(f"[WARNING] Background startup failed: {e}")
 
 
 @asynccontextmanager
@@ -23,25 +85,73 @@ async def lifespan(app: FastAPI):
     Lifespan context: load models and scalers on startup,
     clean up if necessary on shutdown.
     """
-    # Load models & scalers
-    app.state.model_a = load_model_a_lille()
-    app.state.model_m = load_model_m_lille()
-    app.state.scaler_Xa = load_scaler_Xa_lille()
-    app.state.scaler_Xm = load_scaler_Xm_lille()
-    app.state.scaler_ya = load_scaler_ya_lille()
-    app.state.scaler_ym = load_scaler_ym_lille()
-    app.state.model_a_b = load_model_a_bordeaux()
-    app.state.model_m_b = load_model_m_bordeaux()
+    # Read the model catalog: each model is loaded on its first request, or by the background warm-up
+    # (no-op when already preloaded before fork)
+    with startup.phase("registry"):
+        app.state.registry = registry.load()
 
     # You can initialize metrics here if needed
     # e.g., from .metrics import initialize_metrics
     # initialize_metrics(app)
 
-    print("✅ Models and scalers loaded successfully")
+    print(f"✅ Model catalog loaded (version {registry.version})")
+    subsystems_start = time.perf_counter()
+
+    # Admission control: bounded concurrency on predict routes, optional per-user rate limit
+    app.state.admission = AdmissionController() if ADMISSION_MAX_CONCURRENCY > 0 else None
+    app.state.rate_limiter = TokenBuckets() if RATE_LIMIT_PER_SECOND > 0 else None
+
+    # Micro-batching of concurrent single predictions
+    app.state.batcher = MicroBatcher(partial(predict_group, app.state)) if MICRO_BATCHING else None
+
+    # Cache of single predictions, invalidated when the model version changes
+    app.state.prediction_cache = PredictionCache() if PREDICTION_CACHE_SIZE_MAX > 0 else None
+
+    # Hot reload when a new model file is dropped on disk
+    watcher = None
+    if MODEL_WATCH_INTERVAL > 0:
+        watcher = asyncio.create_task(watch_models(registry, MODEL_WATCH_INTERVAL, warm_up))
+
+    # Reload the market statistics cube when it is rebuilt
+    market_watcher = None
+    if MARKET_STATS_WATCH_INTERVAL > 0:
+        market_watcher = asyncio.create_task(watch_market_stats(market_cube, MARKET_STATS_WATCH_INTERVAL))
+
+    # Monitoring runs on its own worker thread, fed by a bounded queue
+    app.state.monitoring_queue = MonitoringQueue(consume_monitoring_batch).start()
+
+    # Periodic full Evidently drift report (drift gauges are updated on every prediction)
+    drift_reporter = None
+    if DRIFT_REPORT_INTERVAL > 0:
+        drift_reporter = asyncio.create_task(drift_report_loop(DRIFT_REPORT_INTERVAL))
+
+    # Model evaluation in a pool of worker processes (compiled engines shared through memory-mapped files)
+    # and model warm-up: in the background, predictions run in-process until the pool is up
+    app.state.warmup = None
+    if INFERENCE_BACKEND == "process" or MODEL_WARMUP:
+        app.state.warmup = asyncio.create_task(warm_up_in_background())
+
+    startup.record("subsystems", time.perf_counter() - subsystems_start)
+    print(f"⏱ Ready: {startup.summary('interpreter', 'imports', 'registry', 'subsystems')}")
 
     yield  # app runs here
 
-    # Shutdown: optional cleanup
+    # Shutdown: optional cleanup (the background startup runs in threads: let it finish)
+    if app.state.warmup is not None:
+        await app.state.warmup
+    if watcher is not None:
+        watcher.cancel()
+    if market_watcher is not None:
+        market_watcher.cancel()
+    if drift_reporter is not None:
+        drift_reporter.cancel()
+    if app.state.batcher is not None:
+        await app.state.batcher.close()
+    await asyncio.to_thread(app.state.monitoring_queue.close)
+    await asyncio.to_thread(inference_pool.stop)
+    # Multiprocess metrics: archive the files of this worker (gunicorn's child_exit hook covers crashes)
+    if multiprocess_metrics.MULTIPROCESS_DIR:
+        multiprocess_metrics.archive(os.getpid())
     print("App is shutting down...")
 
 # Initialize FastAPI with lifespan
@@ -58,6 +168,8 @@ app = FastAPI(
 # Include your routers
 app.include_router(router)
 app.include_router(router_monitoring)
+app.include_router(router_comparables)
+app.include_router(router_market)
 
 # ----------------- Middleware for Prometheus -----------------
 
@@ -66,18 +178,28 @@ app.include_router(router_monitoring)
 async def prometheus_middleware(request: Request, call_next):
     """
     Middleware to track Prometheus metrics automatically for all endpoints.
-    """
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-
-    endpoint = request.url.path
-    method = request.method
 
-    # Increment request count
-    REQUEST_COUNT.labels(method=method, endpoint=endpoint).inc()
-
-    # Observe latency
-    REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(process_time)
-
-    return response
+    Each request is counted once, labelled by its route template rather than its raw path,
+    so that unknown paths (404 scans) all share the "unmatched" label.
+    """
+    start_time = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        process_time = time.perf_counter() - start_time
+
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        method = request.method
+
+        # Increment request count
+        REQUEST_COUNT.labels(method=method, endpoint=endpoint).inc()
+
+        # Observe latency
+        REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(process_time)
+
+        if status_code >= 400:
+            ERROR_COUNT.labels(method=method, endpoint=endpoint, status_code=str(status_code)).inc()
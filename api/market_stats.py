@@ -0,0 +1,374 @@
+# market_stats.py
+"""
+Cube précalculé des statistiques de marché : nombre de ventes et quantiles du prix au m²
+par commune, code postal, section cadastrale, type de logement et mois.
+
+Construction (et reconstruction incrémentale) :
+
+    python -m api.market_stats                                   # csv_data/*.csv
+    python -m api.market_stats ValeursFoncieres-2025-01.txt      # ajoute un fichier au cube existant
+
+Chaque export DVF est lu via le cache d'ingestion (api/ingestion.py) et résumé en une « part » :
+pour chaque cellule (commune, code postal, section, type de logement, mois), un histogramme
+du prix au m² sur des classes logarithmiques fixes (`SKETCH_GAMMA` : chaque classe couvre ±1 %).
+Ces histogrammes s'additionnent : la part d'un fichier est calculée une seule fois (elle est
+enregistrée à côté de son cache d'ingestion), et le cube est la somme des parts de ses fichiers.
+Ajouter un fichier mensuel ne résume donc que ce fichier ; un fichier modifié est relu seul. Les autres
+ne sont lus qu'une fois, par l'ingestion, pour vérifier leur empreinte (enregistrée dans le cube).
+
+Le cube contient toutes les agrégations utiles (toute combinaison de dimensions, la section
+n'ayant de sens qu'avec la commune) : une requête est une recherche dans un dictionnaire,
+en temps constant. Les quantiles sont estimés à ±1 % près à partir des histogrammes.
+
+Les ventes présentes dans plusieurs fichiers (export annuel et mensuel du même mois) sont
+comptées autant de fois : le cube doit être construit sur des fichiers disjoints.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+CSV_DATA_DIR = ROOT_DIR / "csv_data"
+
+# --- Configuration (variables d'environnement) ---
+MARKET_STATS_PATH = Path(os.getenv("MARKET_STATS_PATH", ROOT_DIR / "reference_data" / "market_stats.npz"))
+# Intervalle de vérification du fichier du cube, en secondes (0 : pas de rechargement à chaud)
+MARKET_STATS_WATCH_INTERVAL = float(os.getenv("MARKET_STATS_WATCH_INTERVAL", "30"))
+
+# À incrémenter quand le format des parts ou du cube change : ils sont alors reconstruits
+CUBE_VERSION = 1
+
+# Dimensions du cube, dans l'ordre des clés
+DIMENSIONS = ("commune", "code_postal", "section", "type_local", "mois")
+# Valeur d'une dimension agrégée (toutes les valeurs)
+ALL = "*"
+# Quantiles précalculés du prix au m²
+QUANTILES = {"p10": 0.1, "p25": 0.25, "p50": 0.5, "p75": 0.75, "p90": 0.9}
+
+# Histogrammes mergeables : classes logarithmiques de raison SKETCH_GAMMA entre SKETCH_MIN et SKETCH_MAX €/m²,
+# plus une classe pour les valeurs inférieures et une pour les valeurs supérieures
+SKETCH_MIN = 100.0
+SKETCH_MAX = 100_000.0
+SKETCH_GAMMA = 1.02
+SKETCH_BINS = int(np.ceil(np.log(SKETCH_MAX / SKETCH_MIN) / np.log(SKETCH_GAMMA))) + 2
+
+
+def sketch_bins(prix_m2: np.ndarray) -> np.ndarray:
+    """
+    Retourne la classe de l'histogramme de chaque prix au m².
+    """
+    bins = np.floor(np.log(np.asarray(prix_m2, dtype=np.float64) / SKETCH_MIN) / np.log(SKETCH_GAMMA)) + 1
+    return np.clip(bins, 0, SKETCH_BINS - 1).astype(np.int32)
+
+
+def bin_values(bins: np.ndarray) -> np.ndarray:
+    """
+    Retourne la valeur représentative (centre géométrique) de classes de l'histogramme.
+    """
+    inner = SKETCH_MIN * SKETCH_GAMMA ** (np.asarray(bins, dtype=np.float64) - 0.5)
+    return np.clip(inner, SKETCH_MIN, SKETCH_MAX)
+
+
+# Combinaisons de dimensions précalculées : toutes, sauf la section sans la commune
+GROUPING_SETS = [
+    dimensions
+    for size in range(len(DIMENSIONS) + 1)
+    for dimensions in itertools.combinations(DIMENSIONS, size)
+    if "section" not in dimensions or "commune" in dimensions
+]
+
+
+# -------------------------------
+#  PARTS (UNE PAR FICHIER DVF)
+# -------------------------------
+def build_part(table):
+    """
+    Résume les ventes d'un export ingéré (`DVFTable`) : nombre de ventes par cellule et classe de prix.
+
+    Returns:
+        pd.DataFrame: Colonnes `DIMENSIONS`, `bin` et `count`, une ligne par cellule et classe non vide.
+    """
+    import pandas as pd
+
+    frame = table.to_frame(["date_mutation", "prix_m2", "surface_bati", "commune", "code_postal",
+                            "section", "type_local"])
+    frame = frame[(frame["prix_m2"] > 0) & (frame["surface_bati"] > 0)]
+    cells = pd.DataFrame({
+        "commune": frame["commune"].astype(str).to_numpy(),
+        "code_postal": frame["code_postal"].astype(str).to_numpy(),
+        "section": frame["section"].astype(str).to_numpy(),
+        "type_local": frame["type_local"].astype(str).to_numpy(),
+        "mois": frame["date_mutation"].dt.strftime("%Y-%m").to_numpy(),
+        "bin": sketch_bins(frame["prix_m2"].to_numpy()),
+    })
+    return cells.groupby(list(DIMENSIONS) + ["bin"], sort=False).size().rename("count").reset_index()
+
+
+def load_part(path: Path, cache_dir: Optional[Path] = None):
+    """
+    Retourne la part d'un export DVF, depuis son cache d'ingestion si elle y est déjà.
+
+    Returns:
+        Tuple: La part, puis l'empreinte SHA-256 du fichier, calculée par l'ingestion.
+    """
+    import pandas as pd
+    from .ingestion import DVF_CACHE_DIR, ingest
+
+    table = ingest(path, cache_dir or DVF_CACHE_DIR)
+    cached = Path(table.directory) / f"market-stats-v{CUBE_VERSION}.npz" if table.directory else None
+    if cached is not None and cached.is_file():
+        with np.load(cached, allow_pickle=False) as data:
+            return pd.DataFrame({name: data[name] for name in data.files}), table.source_sha256
+
+    part = build_part(table)
+    if cached is not None:
+        tmp = cached.with_name(f"{cached.stem}.{os.getpid()}.tmp.npz")
+        np.savez(tmp, **{name: part[name].to_numpy(dtype=None if name in ("bin", "count") else str)
+                         for name in part.columns})
+        os.replace(tmp, cached)
+    return part, table.source_sha256
+
+
+# -------------------------------
+#  CUBE
+# -------------------------------
+def aggregate(parts) -> Dict[str, np.ndarray]:
+    """
+    Additionne des parts et calcule, pour chaque combinaison de `GROUPING_SETS`, le nombre de
+    ventes et les quantiles du prix au m² de chaque cellule.
+
+    Returns:
+        Dict[str, np.ndarray]: Les colonnes du cube : une par dimension (`ALL` si agrégée),
+        `count` et une par quantile de `QUANTILES`.
+    """
+    import pandas as pd
+
+    merged = pd.concat(parts, ignore_index=True)
+    merged = merged.groupby(list(DIMENSIONS) + ["bin"], sort=False)["count"].sum().reset_index()
+
+    columns: Dict[str, List[np.ndarray]] = {name: [] for name in list(DIMENSIONS) + ["count"] + list(QUANTILES)}
+    for dimensions in GROUPING_SETS:
+        # Histogramme de chaque cellule de la combinaison, trié par cellule puis par classe
+        keys = list(dimensions)
+        if keys:
+            # Cellules numérotées dans l'ordre de leur première ligne
+            cell = merged.groupby(keys, sort=False).ngroup().to_numpy()
+            cell_keys = merged.loc[~merged.duplicated(keys), keys].to_numpy()
+        else:
+            cell = np.zeros(len(merged), dtype=np.int64)
+            cell_keys = np.empty((1 if len(merged) else 0, 0), dtype=object)
+        n_cells = len(cell_keys)
+        counts = np.bincount(cell * SKETCH_BINS + merged["bin"].to_numpy(),
+                             weights=merged["count"].to_numpy(), minlength=n_cells * SKETCH_BINS)
+        histograms = counts.reshape(n_cells, SKETCH_BINS)
+        cumulative = histograms.cumsum(axis=1)
+        totals = cumulative[:, -1]
+
+        for name in DIMENSIONS:
+            if name in dimensions:
+                columns[name].append(cell_keys[:, keys.index(name)].astype(str))
+            else:
+                columns[name].append(np.full(n_cells, ALL))
+        columns["count"].append(totals.astype(np.int64))
+        for label, q in QUANTILES.items():
+            # Première classe dont l'effectif cumulé atteint la fraction q des ventes
+            rank = (cumulative >= (q * totals)[:, None]).argmax(axis=1)
+            columns[label].append(bin_values(rank))
+
+    return {name: np.concatenate(values) for name, values in columns.items()}
+
+
+class MarketCube:
+    """
+    Cube des statistiques de marché, interrogé en temps constant.
+
+    Attributes:
+        sources (List[dict]): Les fichiers DVF agrégés (chemin et empreinte).
+        cells (int): Le nombre de cellules précalculées.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], sources: List[dict]):
+        self.sources = sources
+        dimensions = [columns[name].tolist() for name in DIMENSIONS]
+        counts = columns["count"].tolist()
+        quantiles = {label: columns[label].tolist() for label in QUANTILES}
+        self._cells: Dict[Tuple[str, ...], dict] = {}
+        for row, key in enumerate(zip(*dimensions)):
+            self._cells[key] = {
+                "nombre_ventes": counts[row],
+                "prix_m2_median": quantiles["p50"][row],
+                "prix_m2_quantiles": {label: values[row] for label, values in quantiles.items()},
+            }
+        self.cells = len(self._cells)
+
+    @staticmethod
+    def key(
+        commune: Optional[str] = None,
+        code_postal: Optional[int] = None,
+        section: Optional[str] = None,
+        type_local: Optional[str] = None,
+        mois: Optional[str] = None,
+    ) -> Tuple[str, ...]:
+        """
+        Retourne la clé d'une cellule (valeurs normalisées, `ALL` pour une dimension agrégée).
+        """
+        return (
+            commune.strip().upper() if commune else ALL,
+            str(code_postal) if code_postal is not None else ALL,
+            section.strip().upper() if section else ALL,
+            type_local.strip().lower() if type_local else ALL,
+            mois.strip() if mois else ALL,
+        )
+
+    def get(self, **filters) -> Optional[dict]:
+        """
+        Retourne les statistiques d'une cellule, ex. `get(commune="LILLE", type_local="maison", mois="2024-03")`,
+        ou None si aucune vente n'y correspond.
+        """
+        return self._cells.get(self.key(**filters))
+
+    def get_key(self, key: Tuple[str, ...]) -> Optional[dict]:
+        """
+        Retourne les statistiques d'une cellule d'après sa clé (voir `key`).
+        """
+        return self._cells.get(key)
+
+    @classmethod
+    def load(cls, path: Path) -> "MarketCube":
+        """
+        Charge un cube enregistré par `build_cube`.
+
+        Raises:
+            ValueError: Si le cube a été construit par une version incompatible.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != CUBE_VERSION:
+                raise ValueError(f"Cube version {int(data['version'])}, expected {CUBE_VERSION}")
+            columns = {name: data[name] for name in list(DIMENSIONS) + ["count"] + list(QUANTILES)}
+            return cls(columns, json.loads(str(data["sources"])))
+
+
+def _source_path(path: Path) -> str:
+    # Chemins relatifs au dépôt quand c'est possible : le cube construit sur csv_data/ est versionné
+    try:
+        return str(Path(path).resolve().relative_to(ROOT_DIR))
+    except ValueError:
+        return str(path)
+
+
+def build_cube(files: Sequence[Path], output: Path = MARKET_STATS_PATH, cache_dir: Optional[Path] = None) -> MarketCube:
+    """
+    Construit le cube des fichiers DVF et l'enregistre ; seules les parts des fichiers nouveaux
+    ou modifiés sont calculées.
+
+    Args:
+        files (Sequence[Path]): Les exports DVF agrégés.
+        output (Path): Le fichier du cube.
+        cache_dir (Path): Le dossier du cache d'ingestion (par défaut, `DVF_CACHE_DIR`).
+
+    Returns:
+        MarketCube: Le cube construit.
+    """
+    parts, sources = [], []
+    for path in files:
+        part, sha256 = load_part(Path(path), cache_dir)
+        parts.append(part)
+        sources.append({"path": _source_path(path), "sha256": sha256})
+    columns = aggregate(parts)
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(f"{output.stem}.{os.getpid()}.tmp.npz")
+    np.savez_compressed(tmp, version=CUBE_VERSION, sources=json.dumps(sources), **columns)
+    os.replace(tmp, output)
+    return MarketCube(columns, sources)
+
+
+# -------------------------------
+#  CUBE SERVI PAR L'API
+# -------------------------------
+class CubeFile:
+    """
+    Cube servi par l'API, rechargé quand son fichier change (voir `watch_market_stats`).
+    """
+
+    def __init__(self, path: Path = MARKET_STATS_PATH):
+        self.path = Path(path)
+        self.cube: Optional[MarketCube] = None
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def signature(self) -> Optional[float]:
+        try:
+            return self.path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def load(self) -> Optional[MarketCube]:
+        """
+        Charge le cube s'il a changé depuis le dernier chargement (appel bloquant).
+
+        Returns:
+            MarketCube: Le cube servi, ou None s'il n'a pas été construit.
+        """
+        with self._lock:
+            mtime = self.signature()
+            if mtime != self._mtime:
+                self.cube = MarketCube.load(self.path) if mtime is not None else None
+                self._mtime = mtime
+        return self.cube
+
+
+async def watch_market_stats(cube_file: CubeFile, interval: float):
+    """
+    Recharge le cube dès que son fichier change (reconstruction incrémentale par `python -m api.market_stats`).
+    """
+    signature = cube_file.signature()
+    while True:
+        await asyncio.sleep(interval)
+        current = await asyncio.to_thread(cube_file.signature)
+        if current == signature:
+            continue
+        signature = current
+        try:
+            cube = await asyncio.to_thread(cube_file.load)
+            print(f"🔄 Market statistics reloaded ({cube.cells if cube else 0} cells)")
+        except Exception as e:
+            print(f"[WARNING] Market statistics reload failed: {e}")
+
+
+market_cube = CubeFile()
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Construit le cube des statistiques de marché.")
+    parser.add_argument("files", nargs="*", type=Path, help="Exports DVF à ajouter (par défaut : csv_data/*.csv)")
+    parser.add_argument("--output", type=Path, default=MARKET_STATS_PATH, help="Fichier du cube")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore les fichiers du cube existant")
+    parser.add_argument("--cache-dir", type=Path, default=None, help="Dossier du cache d'ingestion")
+    args = parser.parse_args(argv)
+
+    files = [Path(path).resolve() for path in args.files] or sorted(CSV_DATA_DIR.glob("*.csv"))
+    if not args.rebuild and args.output.is_file():
+        # Les fichiers déjà agrégés restent dans le cube ; leurs parts sont relues depuis le cache
+        previous = [ROOT_DIR / source["path"] for source in MarketCube.load(args.output).sources]
+        missing = [path for path in previous if not path.is_file()]
+        for path in missing:
+            print(f"[WARNING] {path} no longer exists, removed from the cube")
+        files = [path for path in previous if path.is_file() and path not in files] + files
+
+    start = time.perf_counter()
+    cube = build_cube(files, args.output, args.cache_dir)
+    print(f"✅ {args.output}: {cube.cells} cells from {len(files)} files ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,129 @@
 from prometheus_client import Counter, Histogram, Gauge, generate_latest
 
+from .multiprocess_metrics import MULTIPROCESS_DIR, scrape
+
+# With several workers (PROMETHEUS_MULTIPROC_DIR set, see api/multiprocess_metrics.py), counters and
+# histograms are summed over all processes; each gauge declares how its per-process values are merged,
+# over live processes only: "livesum" for quantities (queue depths, memory), "livemax" for states and
+# statistics (1 if at least one worker has the model loaded).
 
 # Traffic
+# `endpoint` is the route template (e.g. /predict/lille), "unmatched" for unknown paths
 REQUEST_COUNT = Counter("api_requests_total", "Total API requests", ["method", "endpoint"])
 ERROR_COUNT = Counter("api_errors_total", "Total failed requests", ["method", "endpoint", "status_code"])
 
 # Performance
 REQUEST_LATENCY = Histogram("api_request_latency_seconds", "Request latency", ["method", "endpoint"])
+PREDICTION_STAGE_LATENCY = Histogram(
+    "prediction_stage_latency_seconds",
+    "Time spent in each stage of the prediction path (see api/instrumentation.py)",
+    ["stage", "city", "type_local", "version"],
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
 
 # Model state / business metrics
 PREDICTIONS_TOTAL = Counter("predictions_total", "Total predictions made", ["model", "city"])
-MODEL_LOADED = Gauge("model_loaded", "1 if model loaded successfully, 0 otherwise", ["model", "city"])
+MODEL_LOADED = Gauge(
+    "model_loaded", "1 if model loaded successfully, 0 otherwise", ["model", "city"],
+    multiprocess_mode="livemax",
+)
+MODEL_VERSION = Gauge(
+    "model_version_info", "1 for the model version currently served", ["version"],
+    multiprocess_mode="livemax",
+)
+MODEL_RELOADS = Counter("model_reloads_total", "Model hot reloads", ["status"])
+MODEL_LOAD_LATENCY = Histogram(
+    "model_load_latency_seconds",
+    "Time to load the model and scalers of a city and type of property on first use",
+    ["city"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+MODEL_EVICTIONS = Counter("model_evictions_total", "Models evicted to stay within the memory budget", ["city"])
+MODEL_MEMORY_BYTES = Gauge(
+    "model_memory_bytes", "Estimated size of the loaded models and scalers",
+    multiprocess_mode="livesum",
+)
+
+# Micro-batching
+MICRO_BATCH_SIZE = Histogram(
+    "prediction_micro_batch_size",
+    "Number of single predictions merged into one model call",
+    ["city", "type_local"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+MICRO_BATCH_QUEUE_WAIT = Histogram(
+    "prediction_micro_batch_queue_wait_seconds",
+    "Time a single prediction waited in the micro-batch queue",
+    ["city", "type_local"],
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+# Prediction cache
+PREDICTION_CACHE_HITS = Counter("prediction_cache_hits_total", "Predictions served from the cache", ["city"])
+PREDICTION_CACHE_MISSES = Counter("prediction_cache_misses_total", "Predictions not found in the cache", ["city"])
+PREDICTION_CACHE_SIZE = Gauge(
+    "prediction_cache_entries", "Number of predictions held in the cache",
+    multiprocess_mode="livesum",
+)
+
+# Data drift (current observation window vs reference data)
+DRIFT_LABELS = ["city", "type_local", "feature"]
+DRIFT_PSI = Gauge(
+    "feature_drift_psi", "Population stability index vs reference data", DRIFT_LABELS,
+    multiprocess_mode="livemax",
+)
+DRIFT_KS = Gauge(
+    "feature_drift_ks", "Kolmogorov-Smirnov statistic (binned) vs reference data", DRIFT_LABELS,
+    multiprocess_mode="livemax",
+)
+DRIFT_OBSERVATIONS = Gauge(
+    "feature_drift_observations", "Observations in the current drift window", DRIFT_LABELS,
+    multiprocess_mode="livesum",
+)
+DRIFT_REPORTS = Counter("drift_reports_total", "Full Evidently drift reports generated")
+
+# Monitoring queue (predictions waiting for drift monitoring)
+MONITORING_QUEUE_DEPTH = Gauge(
+    "monitoring_queue_depth", "Predictions waiting in the monitoring queue",
+    multiprocess_mode="livesum",
+)
+MONITORING_DROPPED = Counter("monitoring_dropped_total", "Predictions dropped by a full monitoring queue", ["policy"])
+MONITORING_FLUSH_LATENCY = Histogram(
+    "monitoring_flush_latency_seconds",
+    "Time spent processing one batch of the monitoring queue",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+MONITORING_FLUSH_ERRORS = Counter("monitoring_flush_errors_total", "Monitoring batches that failed")
+
+# Admission control (concurrency limiter and per-user token buckets, see api/admission.py)
+ADMISSION_IN_FLIGHT = Gauge("admission_in_flight", "Predict requests currently admitted", multiprocess_mode="livesum")
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth", "Predict requests waiting for a slot",
+    multiprocess_mode="livesum",
+)
+ADMISSION_LIMIT = Gauge("admission_limit", "Admission limits", ["limit"], multiprocess_mode="livesum")
+ADMISSION_QUEUE_WAIT = Histogram(
+    "admission_queue_wait_seconds",
+    "Time an admitted request waited for a slot",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+ADMISSION_REJECTED = Counter("admission_rejected_total", "Predict requests rejected by admission control", ["reason"])
+RATE_LIMITED = Counter("rate_limited_total", "Predict requests rejected by the per-user rate limit", ["user"])
+RATE_LIMIT_BUCKETS = Gauge("rate_limit_buckets", "Users with a token bucket in memory", multiprocess_mode="livesum")
+
+
+# Inference process pool (see api/inference_pool.py)
+INFERENCE_POOL_RESTARTS = Counter(
+    "inference_pool_restarts_total", "Inference process pools rebuilt after a worker process died"
+)
+
+# Startup (see api/startup.py)
+STARTUP_PHASE_SECONDS = Gauge(
+    "startup_phase_seconds", "Duration of each startup phase", ["phase"],
+    multiprocess_mode="livemax",
+)
 
 
 def metrics_response():
-    return generate_latest()
+    """Metrics of this process, or aggregated over all workers in multiprocess mode"""
+    return scrape() if MULTIPROCESS_DIR else generate_latest()
@@ -0,0 +1,277 @@
+# model_store.py
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict
+
+import yaml
+
+# --- Emplacements locaux (aucun accès réseau) ---
+ROOT_DIR = Path(__file__).resolve().parent.parent
+MLRUNS_DIR = Path(os.getenv("MLRUNS_DIR", ROOT_DIR / "mlruns"))
+MLFLOW_DB = Path(os.getenv("MLFLOW_DB", ROOT_DIR / "mlflow.db"))
+MODEL_CACHE_DIR = Path(os.getenv("MODEL_CACHE_DIR", ROOT_DIR / "models" / ".cache"))
+
+
+class ModelResolutionError(LookupError):
+    """Levée quand une URI de modèle ne peut pas être résolue dans le store local."""
+
+
+# -------------------------------
+#  RÉSOLUTION DES URI
+# -------------------------------
+def resolve_model_uri(model_uri: str, mlruns_dir: Path = MLRUNS_DIR, mlflow_db: Path = MLFLOW_DB) -> Path:
+    """
+    Résout une URI MLflow vers le dossier d'artefacts local du modèle.
+
+    URI supportées :
+        - `models:/m-<id>` : modèle journalisé (mlruns/<exp>/models/m-<id>/artifacts) ;
+        - `models:/<nom>/<version>` ou `models:/<nom>/latest` : modèle enregistré, lu dans le
+          registre fichier (mlruns/models/<nom>/version-<v>/meta.yaml) ou, à défaut, dans `mlflow.db` ;
+        - `runs:/<run_id>/<chemin>` : artefact d'un run.
+
+    Args:
+        model_uri (str): L'URI du modèle.
+        mlruns_dir (Path): Le dossier `mlruns/` local.
+        mlflow_db (Path): La base SQLite du registre MLflow.
+
+    Raises:
+        ModelResolutionError: Si l'URI n'est pas supportée ou si le modèle est introuvable.
+
+    Returns:
+        Path: Le dossier contenant le fichier `MLmodel`.
+    """
+    mlruns_dir = Path(mlruns_dir)
+
+    if model_uri.startswith("runs:/"):
+        run_id, _, artifact_path = model_uri[len("runs:/"):].partition("/")
+        for run_dir in mlruns_dir.glob(f"*/{run_id}"):
+            path = run_dir / "artifacts" / artifact_path
+            if (path / "MLmodel").is_file():
+                return path
+        raise ModelResolutionError(f"Run introuvable dans {mlruns_dir}: {model_uri}")
+
+    if not model_uri.startswith("models:/"):
+        raise ModelResolutionError(f"URI de modèle non supportée: {model_uri}")
+
+    name, _, version = model_uri[len("models:/"):].partition("/")
+
+    if not version:
+        for path in mlruns_dir.glob(f"*/models/{name}/artifacts"):
+            if (path / "MLmodel").is_file():
+                return path
+        raise ModelResolutionError(f"Modèle introuvable dans {mlruns_dir}: {model_uri}")
+
+    source = _registered_version_source(name, version, mlruns_dir, Path(mlflow_db))
+    if source.startswith("models:/") or source.startswith("runs:/"):
+        return resolve_model_uri(source, mlruns_dir, mlflow_db)
+    return _localize(source, mlruns_dir)
+
+
+def _registered_version_source(name: str, version: str, mlruns_dir: Path, mlflow_db: Path) -> str:
+    """
+    Retourne la source (URI ou chemin d'artefacts) d'une version de modèle enregistré.
+    """
+    # Registre fichier : mlruns/models/<nom>/version-<v>/meta.yaml
+    model_dir = mlruns_dir / "models" / name
+    if model_dir.is_dir():
+        versions = sorted(
+            (int(p.name.split("-", 1)[1]) for p in model_dir.glob("version-*")),
+            reverse=True,
+        )
+        if versions:
+            number = versions[0] if version == "latest" else int(version)
+            meta_file = model_dir / f"version-{number}" / "meta.yaml"
+            if meta_file.is_file():
+                meta = yaml.safe_load(meta_file.read_text())
+                return meta.get("storage_location") or meta["source"]
+
+    # Registre SQLite, ouvert en lecture seule
+    if mlflow_db.is_file():
+        query = "SELECT source, storage_location FROM model_versions WHERE name = ? "
+        if version == "latest":
+            query += "ORDER BY version DESC LIMIT 1"
+            params = (name,)
+        else:
+            query += "AND version = ?"
+            params = (name, int(version))
+        with sqlite3.connect(f"file:{mlflow_db}?mode=ro", uri=True) as connection:
+            row = connection.execute(query, params).fetchone()
+        if row is not None:
+            source, storage_location = row
+            return storage_location or source
+
+    raise ModelResolutionError(f"Version de modèle introuvable: models:/{name}/{version}")
+
+
+def _localize(location: str, mlruns_dir: Path) -> Path:
+    """
+    Ramène un emplacement d'artefacts enregistré (souvent un chemin absolu d'une autre machine,
+    ex. file:///C:/Users/.../mlruns/2/models/m-xxx/artifacts) dans le dossier `mlruns/` local.
+    """
+    path = location.replace("\\", "/")
+    if path.startswith("file:"):
+        path = path[len("file:"):].lstrip("/")
+
+    if "mlruns/" in path:
+        local = mlruns_dir / path.rsplit("mlruns/", 1)[1]
+    else:
+        local = Path(path)
+
+    if not (local / "MLmodel").is_file():
+        raise ModelResolutionError(f"Artefacts introuvables localement: {location}")
+    return local
+
+
+# -------------------------------
+#  CHARGEMENT DES ARTEFACTS
+# -------------------------------
+def read_mlmodel(artifacts_dir: Path) -> Dict[str, Any]:
+    """
+    Lit les métadonnées `MLmodel` d'un dossier d'artefacts.
+    """
+    return yaml.safe_load((Path(artifacts_dir) / "MLmodel").read_text())
+
+
+def _xgboost_flavor(mlmodel: Dict[str, Any]) -> Dict[str, Any]:
+    flavor = mlmodel.get("flavors", {}).get("xgboost")
+    if flavor is None:
+        raise ModelResolutionError("Seuls les modèles de la saveur MLflow 'xgboost' sont supportés")
+    return flavor
+
+
+def instantiate_model(model_class: str, data_file: Path):
+    """
+    Instancie la classe XGBoost indiquée dans `MLmodel` et charge le fichier du modèle (ex. model.ubj).
+
+    Args:
+        model_class (str): La classe du modèle (ex. "xgboost.sklearn.XGBRegressor").
+        data_file (Path): Le fichier du modèle.
+    """
+    module_name, _, class_name = model_class.rpartition(".")
+    model = getattr(importlib.import_module(module_name), class_name)()
+    model.load_model(str(data_file))
+    return model
+
+
+def file_sha256(path: Path) -> str:
+    """
+    Retourne l'empreinte SHA-256 d'un fichier, lu par blocs.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelStore:
+    """
+    Charge des modèles MLflow depuis le store local, sans serveur de tracking.
+
+    Les artefacts résolus sont copiés dans un cache adressé par contenu
+    (`<cache>/objects/<sha256>.<format>`) et un index associe chaque URI à son objet.
+    Un démarrage à froid avec un cache chaud ne relit ni `mlflow.db` ni `MLmodel` :
+    il charge directement le fichier du modèle.
+
+    Args:
+        mlruns_dir (Path): Le dossier `mlruns/` local.
+        mlflow_db (Path): La base SQLite du registre MLflow.
+        cache_dir (Path): Le dossier du cache d'artefacts.
+    """
+
+    def __init__(
+        self,
+        mlruns_dir: Path = MLRUNS_DIR,
+        mlflow_db: Path = MLFLOW_DB,
+        cache_dir: Path = MODEL_CACHE_DIR,
+    ):
+        self.mlruns_dir = Path(mlruns_dir)
+        self.mlflow_db = Path(mlflow_db)
+        self.cache_dir = Path(cache_dir)
+        self.index_file = self.cache_dir / "index.json"
+
+    def load(self, model_uri: str):
+        """
+        Charge le modèle désigné par `model_uri`, depuis le cache si possible.
+
+        Args:
+            model_uri (str): L'URI du modèle (ex. "models:/XGBRegressorModel/3").
+
+        Returns:
+            Le modèle XGBoost (ex. : xgboost.XGBRegressor).
+        """
+        # "latest" peut changer de version : seule une URI figée est servie depuis l'index
+        entry = None if model_uri.endswith("/latest") else self._read_index().get(model_uri)
+        if entry is not None:
+            cached = self.cache_dir / entry["object"]
+            if cached.is_file():
+                return instantiate_model(entry["model_class"], cached)
+
+        entry = self.fetch(model_uri)
+        return instantiate_model(entry["model_class"], self.cache_dir / entry["object"])
+
+    def fetch(self, model_uri: str) -> Dict[str, Any]:
+        """
+        Résout `model_uri` et copie son artefact dans le cache.
+
+        Returns:
+            Dict[str, Any]: L'entrée d'index de l'URI.
+        """
+        artifacts_dir = resolve_model_uri(model_uri, self.mlruns_dir, self.mlflow_db)
+        mlmodel = read_mlmodel(artifacts_dir)
+        flavor = _xgboost_flavor(mlmodel)
+
+        data_file = artifacts_dir / flavor["data"]
+        sha256 = file_sha256(data_file)
+        object_name = f"objects/{sha256}.{flavor.get('model_format', data_file.suffix.lstrip('.'))}"
+
+        target = self.cache_dir / object_name
+        if not target.is_file():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(f"{target.suffix}.{os.getpid()}.tmp")
+            shutil.copyfile(data_file, tmp)
+            os.replace(tmp, target)
+
+        entry = {
+            "object": object_name,
+            "sha256": sha256,
+            "model_class": flavor["model_class"],
+            "model_id": mlmodel.get("model_id"),
+            "run_id": mlmodel.get("run_id"),
+        }
+        index = self._read_index()
+        index[model_uri] = entry
+        self._write_index(index)
+        return entry
+
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            return json.loads(self.index_file.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_index(self, index: Dict[str, Dict[str, Any]]):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_file.with_suffix(f".json.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(index, indent=2, sort_keys=True))
+        os.replace(tmp, self.index_file)
+
+
+def load_mlflow_model(model_uri: str):
+    """
+    Charge un modèle MLflow depuis le store local.
+
+    Les URI servies sont celles du catalogue des modèles (entrées `"mlflow"` de models/catalog.json).
+
+    Args:
+        model_uri (str): L'URI du modèle (ex. "models:/XGBRegressorModel/3").
+
+    Returns:
+        Le modèle XGBoost (ex. : xgboost.XGBRegressor).
+    """
+    return ModelStore().load(model_uri)
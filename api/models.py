@@ -1,6 +1,20 @@
+import asyncio
+import hashlib
+import itertools
+import json
 import os
+import pickle
+import threading
+import time
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional, Tuple
+
 import joblib
-import mlflow.pyfunc
+
+from .compiled import maybe_compile
+from .inference_pool import INFERENCE_BACKEND
+from .metrics import MODEL_EVICTIONS, MODEL_LOAD_LATENCY, MODEL_LOADED, MODEL_MEMORY_BYTES, MODEL_RELOADS, MODEL_VERSION
+from .model_store import file_sha256, load_mlflow_model
 
 # Définir le chemin absolu vers le fichier contenant les modèles et scalers
 models_file = os.path.abspath(
@@ -11,105 +25,517 @@ models_bordeaux_file = os.path.abspath(
     os.path.join(os.path.dirname(__file__), '../models/', 'best_model_bordeaux.pkl')
 )
 
+# Catalogue des modèles servis : ville → type de logement → artefacts (voir `read_catalog`)
+MODEL_CATALOG = os.getenv(
+    "MODEL_CATALOG", os.path.abspath(os.path.join(os.path.dirname(__file__), '../models/', 'catalog.json'))
+)
+# Taille maximale des modèles gardés en mémoire, en Mo (0 : pas de limite)
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "1024"))
 
-def load_model_a_lille():
-    """
-    Charge le modèle de régression pour les appartements à Lille.
+# Fichier de modèles par ville (registres construits sans catalogue)
+CITY_BUNDLES = {
+    "lille": models_file,
+    "bordeaux": models_bordeaux_file,
+}
 
-    Returns:
-        Un objet modèle (ex. : sklearn.ensemble.RandomForestRegressor).
-    """
-    
-    mlflow.set_tracking_uri("http://localhost:5000")
-    # Load model by registered name and version
-    model_name = "immopredict"
-    model_version = "v1"
+# Clés (modèle, scaler X, scaler y) dans un fichier de modèles, par type de logement
+TYPE_LOCAL_KEYS = {
+    "appartement": ("model_a", "scaler_Xa", "scaler_ya"),
+    "maison": ("model_m", "scaler_Xm", "scaler_ym"),
+}
 
-    model_uri = f"models:/{model_name}/{model_version}"
-    # model = mlflow.pyfunc.load_model(model_uri)
+# Historique : Bordeaux utilise les scalers entraînés sur Lille (fichiers de modèles sans catalogue)
+SCALER_CITY = {
+    "bordeaux": "lille",
+}
 
-    # run_id = "0c329c7cc1ae4bb8b11df8d1d39d9552"
-    #model_uri = f"runs:/{run_id}/model"  # adjust 'model' if artifact path is different
-    model = mlflow.pyfunc.load_model(model_uri)
-    return model
-    #return joblib.load(models_file)['model_a']
+# Intervalle de surveillance des fichiers de modèles, en secondes (0 : désactivée)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
 
 
-def load_model_a_lille1():
+class Artifact(NamedTuple):
     """
-    Charge le modèle de régression pour les appartements à Lille.
+    Emplacement d'un objet servi (modèle ou scaler) : un seul des champs `file`, `mlflow`
+    ou `loader` est renseigné.
 
-    Returns:
-        Un objet modèle (ex. : sklearn.ensemble.RandomForestRegressor).
+    Attributes:
+        file (str): Le fichier joblib (un dictionnaire d'objets) contenant l'objet.
+        key (str): La clé de l'objet dans ce fichier.
+        mlflow (str): L'URI du modèle dans le store MLflow local (ex. "models:/XGBRegressorModel/3").
+        loader (Callable): Un chargeur spécifique, sans argument.
     """
-    return joblib.load(models_file)['model_a']
 
+    file: Optional[str] = None
+    key: Optional[str] = None
+    mlflow: Optional[str] = None
+    loader: Optional[Callable[[], Any]] = None
+
+
+# Artefacts (modèle, scaler X, scaler y) par (ville, type de logement)
+Catalog = Dict[Tuple[str, str], Tuple[Artifact, Artifact, Artifact]]
 
-def load_model_a_bordeaux():
+
+def read_catalog(path: str) -> Catalog:
     """
-    Charge le modèle de régression pour les appartements à bordeaux.
+    Lit le catalogue des modèles.
+
+    Format (les chemins de fichiers sont relatifs au catalogue) :
+
+        {"cities": {"lille": {"maison": {
+            "model": {"file": "best_model_lille.pkl", "key": "model_m"},
+            "scaler_X": {"file": "best_model_lille.pkl", "key": "scaler_Xm"},
+            "scaler_y": {"file": "best_model_lille.pkl", "key": "scaler_ym"}
+        }}}}
+
+    Un modèle MLflow s'écrit `{"mlflow": "models:/<nom>/<version>"}`.
+
+    Args:
+        path (str): Le fichier JSON du catalogue.
+
+    Raises:
+        ValueError: Si un artefact n'indique ni fichier et clé, ni URI MLflow.
 
     Returns:
-        Un objet modèle (ex. : sklearn.ensemble.RandomForestRegressor).
+        Catalog: Les artefacts de chaque couple (ville, type de logement), en minuscules.
     """
-    return joblib.load(models_bordeaux_file)['model_a']
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8") as f:
+        cities = json.load(f)["cities"]
 
+    catalog = {}
+    for city, types_local in cities.items():
+        for type_local, spec in types_local.items():
+            catalog[(city.lower(), type_local.lower())] = tuple(
+                _artifact(spec[name], base, f"{city}/{type_local}/{name}") for name in ("model", "scaler_X", "scaler_y")
+            )
+    return catalog
 
-def load_scaler_Xa_lille():
-    """
-    Charge le scaler des variables d'entrée pour les appartements à Lille.
 
-    Returns:
-        Un objet scaler (ex. : sklearn.preprocessing.StandardScaler).
+def _artifact(spec: Dict[str, str], base: str, where: str) -> Artifact:
+    if "mlflow" in spec:
+        return Artifact(mlflow=spec["mlflow"])
+    if "file" in spec and "key" in spec:
+        return Artifact(file=os.path.join(base, spec["file"]), key=spec["key"])
+    raise ValueError(f"Artefact invalide dans le catalogue ({where}) : {spec}")
+
+
+def bundle_files_catalog(bundle_files: Dict[str, str]) -> Catalog:
+    """
+    Construit le catalogue équivalent à un fichier de modèles par ville (clés `TYPE_LOCAL_KEYS`,
+    scalers de la ville `SCALER_CITY` le cas échéant).
     """
-    return joblib.load(models_file)['scaler_Xa']
+    catalog = {}
+    for city, path in bundle_files.items():
+        scalers_path = bundle_files.get(SCALER_CITY.get(city, city), path)
+        for type_local, (model_key, scaler_X_key, scaler_y_key) in TYPE_LOCAL_KEYS.items():
+            catalog[(city, type_local)] = (
+                Artifact(file=path, key=model_key),
+                Artifact(file=scalers_path, key=scaler_X_key),
+                Artifact(file=scalers_path, key=scaler_y_key),
+            )
+    return catalog
 
 
-def load_scaler_ya_lille():
+class ModelBundle(NamedTuple):
     """
-    Charge le scaler des variables de sortie (prix) pour les appartements à Lille.
+    Modèle et scalers servant une ville et un type de logement.
 
-    Returns:
-        Un objet scaler (ex. : sklearn.preprocessing.StandardScaler).
+    Attributes:
+        model: Le modèle de régression (ex. : xgboost.XGBRegressor).
+        scaler_X: Le scaler des variables d'entrée (ex. : sklearn.preprocessing.StandardScaler).
+        scaler_y: Le scaler de la variable de sortie (prix).
+        compiled: Le moteur compilé équivalent (`INFERENCE_MODE=compiled` ou `INFERENCE_BACKEND=process`), ou None.
     """
-    return joblib.load(models_file)['scaler_ya']
 
+    model: Any
+    scaler_X: Any
+    scaler_y: Any
+    compiled: Any = None
 
-def load_model_m_lille():
+
+class BundleCache(Mapping):
     """
-    Charge le modèle de régression pour les maisons à Lille.
+    Modèles et scalers d'une version du catalogue, chargés à leur première demande.
 
-    Returns:
-        Un objet modèle (ex. : sklearn.ensemble.RandomForestRegressor).
+    Les objets chargés sont gardés dans la limite de `memory_budget` octets : au-delà, les couples
+    (ville, type de logement) les moins récemment utilisés sont évincés, puis rechargés s'ils
+    sont redemandés. Un fichier de modèles n'est lu qu'une fois tant qu'un couple chargé l'utilise.
+
+    Le chemin rapide (couple déjà chargé) est une lecture de dictionnaire, sans verrou ;
+    les chargements et évictions sont sérialisés.
+
+    Args:
+        catalog (Catalog): Les artefacts de chaque couple.
+        memory_budget (int): Taille maximale des objets chargés, en octets (0 : pas de limite).
+            La taille d'un fichier joblib est celle du fichier ; celle d'un autre objet, sa taille sérialisée.
     """
-    return joblib.load(models_file)['model_m']
 
+    def __init__(self, catalog: Catalog, memory_budget: int = 0):
+        self.catalog = catalog
+        self.cities = frozenset(city for city, _ in catalog)
+        self.memory_budget = memory_budget
+
+        self._bundles: Dict[Tuple[str, str], ModelBundle] = {}
+        self._last_used: Dict[Tuple[str, str], int] = {}
+        self._clock = itertools.count()
+        self._files: Dict[str, Tuple[Dict[str, Any], int]] = {}
+        self._object_sizes: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: Tuple[str, str]) -> ModelBundle:
+        bundle = self._bundles.get(key)
+        if bundle is None:
+            bundle = self._load(key)
+        self._last_used[key] = next(self._clock)
+        return bundle
+
+    def __contains__(self, key) -> bool:
+        return key in self.catalog
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        return iter(self.catalog)
+
+    def __len__(self) -> int:
+        return len(self.catalog)
+
+    def loaded(self) -> Dict[Tuple[str, str], ModelBundle]:
+        """
+        Retourne les couples actuellement chargés, sans en charger aucun.
+        """
+        return dict(self._bundles)
+
+    @property
+    def memory_used(self) -> int:
+        return sum(size for _, size in self._files.values()) + sum(self._object_sizes.values())
+
+    def _load(self, key: Tuple[str, str]) -> ModelBundle:
+        artifacts = self.catalog[key]
+        with self._lock:
+            bundle = self._bundles.get(key)
+            if bundle is not None:
+                return bundle
+
+            start = time.perf_counter()
+            model, scaler_X, scaler_y = (self._resolve(artifact, key) for artifact in artifacts)
+            # Le backend "process" n'évalue que des moteurs compilés : la compilation y est toujours tentée
+            compiled = maybe_compile(model, scaler_X, scaler_y, "compiled" if INFERENCE_BACKEND == "process" else None)
+            if compiled is None and INFERENCE_BACKEND == "process":
+                print(f"[WARNING] {key}: {type(model).__name__} is not compiled, evaluated in the API process")
+            bundle = ModelBundle(model, scaler_X, scaler_y, compiled)
 
-def load_model_m_bordeaux():
+            city, type_local = key
+            self._bundles[key] = bundle
+            self._last_used[key] = next(self._clock)
+            MODEL_LOADED.labels(model=type_local, city=city).set(1)
+            MODEL_LOAD_LATENCY.labels(city=city).observe(time.perf_counter() - start)
+
+            self._evict(keep=key)
+            MODEL_MEMORY_BYTES.set(self.memory_used)
+            return bundle
+
+    def _resolve(self, artifact: Artifact, key: Tuple[str, str]) -> Any:
+        if artifact.file is not None:
+            cached = self._files.get(artifact.file)
+            if cached is None:
+                cached = self._files[artifact.file] = (
+                    joblib.load(artifact.file, mmap_mode="r"), os.path.getsize(artifact.file)
+                )
+            return cached[0][artifact.key]
+
+        obj = load_mlflow_model(artifact.mlflow) if artifact.mlflow is not None else artifact.loader()
+        try:
+            size = len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            size = 0
+        self._object_sizes[key] = self._object_sizes.get(key, 0) + size
+        return obj
+
+    def _evict(self, keep: Tuple[str, str]):
+        while self.memory_budget > 0 and self.memory_used > self.memory_budget and len(self._bundles) > 1:
+            victim = min((k for k in self._bundles if k != keep), key=lambda k: self._last_used.get(k, -1))
+            del self._bundles[victim]
+            self._object_sizes.pop(victim, None)
+
+            city, type_local = victim
+            MODEL_LOADED.labels(model=type_local, city=city).set(0)
+            MODEL_EVICTIONS.labels(city=city).inc()
+
+            # Les fichiers qui ne servent plus aucun couple chargé sont libérés
+            in_use = {artifact.file for k in self._bundles for artifact in self.catalog[k]}
+            for path in list(self._files):
+                if path not in in_use:
+                    del self._files[path]
+
+
+class ModelSet(NamedTuple):
     """
-    Charge le modèle de régression pour les maisons à bordeaux.
+    Version immuable de l'ensemble des modèles servis.
 
-    Returns:
-        Un objet modèle (ex. : sklearn.ensemble.RandomForestRegressor).
+    Une requête lit une seule fois le `ModelSet` courant et l'utilise jusqu'au bout :
+    un rechargement concurrent ne change donc jamais de modèle en cours de requête.
+
+    Attributes:
+        version (str): Empreinte du catalogue et du contenu des fichiers de modèles (sha256 tronqué).
+        bundles (Mapping[Tuple[str, str], ModelBundle]): Modèles et scalers par (ville, type de logement),
+            chargés à la demande (`BundleCache`) ou déjà chargés (dictionnaire).
     """
-    return joblib.load(models_bordeaux_file)['model_m']
 
+    version: str
+    bundles: Mapping
+
+    def get(self, city: str, type_local: str) -> ModelBundle:
+        return self.bundles[(city, type_local)]
 
-def load_scaler_Xm_lille():
+    @property
+    def cities(self) -> frozenset:
+        """
+        Les villes servies.
+        """
+        cities = getattr(self.bundles, "cities", None)
+        return cities if cities is not None else frozenset(city for city, _ in self.bundles)
+
+
+class ModelRegistry:
     """
-    Charge le scaler des variables d'entrée pour les maisons à Lille.
+    Registre partagé et versionné des modèles et scalers, indexé par (ville, type de logement).
 
-    Returns:
-        Un objet scaler (ex. : sklearn.preprocessing.StandardScaler).
+    Les couples servis sont décrits par le catalogue `catalog_file` (voir `read_catalog`),
+    ou à défaut par un fichier de modèles par ville (`bundle_files`). `load` ne lit que le
+    catalogue : chaque modèle est chargé à sa première demande, dans la limite d'un budget
+    mémoire (voir `BundleCache`). Un modèle froid est lu tel qu'il est sur le disque à ce moment-là.
+
+    Les fichiers joblib sont désérialisés avec `mmap_mode="r"` : les tableaux numpy stockés
+    sans compression sont projetés en mémoire au lieu d'être copiés.
+
+    Préchargé avant le fork des workers (`PRELOAD_MODELS=1` avec `gunicorn --preload`, voir `preload`),
+    le registre est hérité par tous les workers qui partagent alors ses pages mémoire
+    au lieu d'en garder chacun une copie privée.
+
+    `reload` charge et préchauffe les modèles utilisés de la nouvelle version en dehors du chemin
+    de service, puis la substitue atomiquement à la version courante.
+
+    Args:
+        bundle_files (Dict[str, str]): Chemin du fichier de modèles pour chaque ville (sans catalogue).
+        overrides (Dict[Tuple[str, str], Callable]): Chargeurs spécifiques remplaçant
+            le modèle d'un couple (ville, type de logement).
+        catalog_file (str): Le catalogue des modèles ; prioritaire sur `bundle_files`.
+        memory_budget_mb (float): Taille maximale des modèles chargés, en Mo (0 : pas de limite).
     """
-    return joblib.load(models_file)['scaler_Xm']
 
+    def __init__(
+        self,
+        bundle_files: Optional[Dict[str, str]] = None,
+        overrides: Optional[Dict[Tuple[str, str], Callable[[], Any]]] = None,
+        catalog_file: Optional[str] = None,
+        memory_budget_mb: float = MODEL_MEMORY_BUDGET_MB,
+    ):
+        self.bundle_files = dict(CITY_BUNDLES if bundle_files is None else bundle_files)
+        self.overrides = dict(overrides or {})
+        self.catalog_file = catalog_file
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self._current: Optional[ModelSet] = None
+        self._lock = threading.Lock()
+        self._digests: Dict[str, Tuple[Tuple, str]] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self._current is not None
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._current.version if self._current is not None else None
+
+    def current(self) -> ModelSet:
+        """
+        Retourne la version des modèles actuellement servie.
+        """
+        if self._current is None:
+            raise RuntimeError("Les modèles ne sont pas chargés")
+        return self._current
+
+    def load(self) -> "ModelRegistry":
+        """
+        Lit le catalogue et calcule la version des modèles. Sans effet si le registre est déjà chargé.
+
+        Returns:
+            ModelRegistry: Le registre lui-même.
+        """
+        with self._lock:
+            if self._current is None:
+                self._activate(self._build())
+        return self
+
+    def preload(self) -> "ModelRegistry":
+        """
+        Charge immédiatement tous les modèles du catalogue (dans la limite du budget mémoire).
+
+        Returns:
+            ModelRegistry: Le registre lui-même.
+        """
+        model_set = self.load().current()
+        for key in model_set.bundles:
+            model_set.bundles[key]
+        return self
+
+    def reload(self, warmup: Optional[Callable[[ModelBundle], Any]] = None) -> ModelSet:
+        """
+        Recharge le catalogue et bascule sur la nouvelle version si les modèles ont changé.
+
+        Les modèles déjà chargés dans la version courante sont chargés (et préchauffés) dans
+        la nouvelle avant la bascule : une erreur de chargement laisse la version courante en service.
+        Les requêtes en cours continuent sur l'ancienne version, qu'elles ont déjà en main.
+
+        Args:
+            warmup (Callable): Fonction appelée sur chaque nouveau modèle avant la bascule.
+
+        Returns:
+            ModelSet: La version servie après le rechargement.
+        """
+        with self._lock:
+            candidate = self._build()
+            if self._current is not None and candidate.version == self._current.version:
+                return self._current
+
+            hot = self._current.bundles.loaded() if self._current is not None else {}
+            for key in hot:
+                if key in candidate.bundles:
+                    bundle = candidate.bundles[key]
+                    if warmup is not None:
+                        warmup(bundle)
+
+            self._activate(candidate)
+            return candidate
+
+    def notify_workers(self, watch_interval: Optional[float] = None) -> bool:
+        """
+        Signale un rechargement aux autres workers du serveur, qui ont chacun leur registre.
+
+        La date de modification du catalogue est mise à jour : la surveillance de chaque worker
+        (`watch_models`) le recharge à son prochain passage, au plus `watch_interval` secondes après.
 
-def load_scaler_ym_lille():
+        Args:
+            watch_interval (float): Intervalle de surveillance (`MODEL_WATCH_INTERVAL` par défaut).
+
+        Returns:
+            bool: False sans catalogue ou sans surveillance : seul le worker appelant est rechargé.
+        """
+        watch_interval = MODEL_WATCH_INTERVAL if watch_interval is None else watch_interval
+        if not self.catalog_file or watch_interval <= 0:
+            return False
+        os.utime(self.catalog_file)
+        return True
+
+    def get(self, city: str, type_local: str) -> ModelBundle:
+        """
+        Retourne le modèle et les scalers d'une ville et d'un type de logement.
+
+        Args:
+            city (str): Le nom de la ville en minuscules.
+            type_local (str): Le type de logement en minuscules ("appartement" ou "maison").
+
+        Raises:
+            KeyError: Si le couple n'est pas servi par le registre.
+
+        Returns:
+            ModelBundle: Le modèle et ses scalers.
+        """
+        return self.current().get(city, type_local)
+
+    def signature(self) -> Tuple:
+        """
+        Retourne (chemin, date de modification, taille) du catalogue et de chaque fichier de modèles,
+        pour détecter un nouveau fichier déposé sur le disque.
+        """
+        paths = {self.catalog_file} if self.catalog_file else set()
+        try:
+            paths.update(artifact.file for artifacts in self.catalog().values() for artifact in artifacts)
+        except (OSError, ValueError, KeyError):
+            pass
+        paths.discard(None)
+        return tuple(_stat(path) for path in sorted(paths))
+
+    def catalog(self) -> Catalog:
+        """
+        Retourne le catalogue courant sur le disque, chargeurs spécifiques (`overrides`) compris.
+        """
+        catalog = read_catalog(self.catalog_file) if self.catalog_file else bundle_files_catalog(self.bundle_files)
+        for key, loader in self.overrides.items():
+            if key in catalog:
+                catalog[key] = (Artifact(loader=loader),) + catalog[key][1:]
+        return catalog
+
+    def _build(self) -> ModelSet:
+        catalog = self.catalog()
+
+        digest = hashlib.sha256()
+        for key in sorted(catalog):
+            for artifact in catalog[key]:
+                digest.update(repr((key, artifact.key, artifact.mlflow)).encode())
+                if artifact.file is not None:
+                    digest.update(self._file_digest(artifact.file).encode())
+                if artifact.loader is not None:
+                    digest.update(getattr(artifact.loader, "__qualname__", repr(artifact.loader)).encode())
+
+        return ModelSet(digest.hexdigest()[:12], BundleCache(catalog, self.memory_budget))
+
+    def _file_digest(self, path: str) -> str:
+        # Le contenu n'est relu que si le fichier a changé depuis le dernier calcul
+        stat = _stat(path)
+        cached = self._digests.get(path)
+        if cached is not None and cached[0] == stat:
+            return cached[1]
+
+        self._digests[path] = (stat, file_sha256(path))
+        return self._digests[path][1]
+
+    def _activate(self, model_set: ModelSet):
+        previous = self._current
+        # Une simple affectation : la bascule est atomique pour les lecteurs
+        self._current = model_set
+
+        if previous is not None:
+            MODEL_VERSION.labels(version=previous.version).set(0)
+        MODEL_VERSION.labels(version=model_set.version).set(1)
+
+
+def _stat(path: str) -> Tuple:
+    try:
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        return (path, None, None)
+
+
+async def watch_models(
+    registry: ModelRegistry,
+    interval: float,
+    warmup: Optional[Callable[[ModelBundle], Any]] = None,
+):
     """
-    Charge le scaler des variables de sortie (prix) pour les maisons à Lille.
+    Surveille les fichiers de modèles et recharge le registre dès qu'ils changent.
 
-    Returns:
-        Un objet scaler (ex. : sklearn.preprocessing.StandardScaler).
+    Args:
+        registry (ModelRegistry): Le registre à recharger.
+        interval (float): Intervalle de vérification, en secondes.
+        warmup (Callable): Fonction de préchauffage passée à `ModelRegistry.reload`.
     """
-    return joblib.load(models_file)['scaler_ym']
+    signature = registry.signature()
+    while True:
+        await asyncio.sleep(interval)
+        current = await asyncio.to_thread(registry.signature)
+        if current == signature:
+            continue
+
+        signature = current
+        try:
+            model_set = await asyncio.to_thread(registry.reload, warmup)
+            MODEL_RELOADS.labels(status="success").inc()
+            print(f"🔄 Models reloaded, serving version {model_set.version}")
+        except Exception as e:
+            MODEL_RELOADS.labels(status="error").inc()
+            print(f"[WARNING] Model reload failed, keeping version {registry.version}: {e}")
+
+
+# Registre de l'application, partagé par tous les modules (et hérité par les workers forkés)
+# Les villes servies sont celles du catalogue `MODEL_CATALOG` (models/catalog.json)
+registry = ModelRegistry(catalog_file=MODEL_CATALOG)
@@ -0,0 +1,185 @@
+# monitoring_queue.py
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Iterable, List, Optional
+
+from .metrics import MONITORING_DROPPED, MONITORING_FLUSH_LATENCY, MONITORING_FLUSH_ERRORS, MONITORING_QUEUE_DEPTH
+
+# Capacité de la file de monitoring (prédictions en attente)
+MONITORING_QUEUE_SIZE = int(os.getenv("MONITORING_QUEUE_SIZE", "10000"))
+# Politique quand la file est pleine : "drop_oldest", "sample" ou "block"
+MONITORING_OVERFLOW = os.getenv("MONITORING_OVERFLOW", "drop_oldest")
+# Nombre maximal de prédictions traitées par lot par le worker
+MONITORING_BATCH_SIZE = int(os.getenv("MONITORING_BATCH_SIZE", "500"))
+# Attente maximale avant de traiter un lot incomplet, en secondes
+MONITORING_FLUSH_INTERVAL = float(os.getenv("MONITORING_FLUSH_INTERVAL", "1"))
+# Attente maximale d'une place libre avec la politique "block", en secondes
+MONITORING_BLOCK_TIMEOUT = float(os.getenv("MONITORING_BLOCK_TIMEOUT", "0.01"))
+
+OVERFLOW_POLICIES = ("drop_oldest", "sample", "block")
+
+
+class MonitoringQueue:
+    """
+    File bornée entre les routes de prédiction et le monitoring, vidée par un thread dédié.
+
+    Les producteurs (les requêtes) ne font qu'ajouter un élément à la file ; tout le travail
+    de monitoring (statistiques de dérive, rapports) est fait par lots dans le thread worker.
+
+    Quand la file est pleine :
+        - "drop_oldest" : l'élément le plus ancien est abandonné au profit du nouveau ;
+        - "sample" : échantillonnage par réservoir, la file restant un échantillon uniforme de
+          tous les éléments reçus depuis le dernier lot, et non de leur seul début ou seule fin ;
+        - "block" : le producteur attend une place au plus `block_timeout` secondes, puis
+          le nouvel élément est abandonné. L'attente est bornée : la latence de prédiction
+          ne dépend jamais d'un monitoring lent.
+
+    Args:
+        consumer (Callable[[List], Any]): Fonction appelée par le worker sur chaque lot.
+        maxsize (int): La capacité de la file.
+        policy (str): La politique de débordement.
+        batch_size (int): La taille maximale d'un lot.
+        flush_interval (float): L'attente maximale avant de traiter un lot incomplet.
+        block_timeout (float): L'attente maximale d'un producteur (politique "block").
+    """
+
+    def __init__(
+        self,
+        consumer: Callable[[List[Any]], Any],
+        maxsize: int = MONITORING_QUEUE_SIZE,
+        policy: str = MONITORING_OVERFLOW,
+        batch_size: int = MONITORING_BATCH_SIZE,
+        flush_interval: float = MONITORING_FLUSH_INTERVAL,
+        block_timeout: float = MONITORING_BLOCK_TIMEOUT,
+        seed: Optional[int] = None,
+    ):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Politique de débordement inconnue: {policy} (attendu : {', '.join(OVERFLOW_POLICIES)})")
+
+        self.consumer = consumer
+        self.maxsize = maxsize
+        self.policy = policy
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+
+        self._items = deque()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._offered = 0  # éléments reçus depuis le dernier lot (politique "sample")
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def start(self) -> "MonitoringQueue":
+        """
+        Démarre le thread worker.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="monitoring-worker", daemon=True)
+            self._thread.start()
+        return self
+
+    def put(self, item: Any) -> bool:
+        """
+        Ajoute un élément à la file, selon la politique de débordement.
+
+        Returns:
+            bool: False si l'élément a été abandonné.
+        """
+        return self.put_many([item]) == 1
+
+    def put_many(self, items: Iterable[Any]) -> int:
+        """
+        Ajoute plusieurs éléments à la file, selon la politique de débordement.
+
+        Returns:
+            int: Le nombre d'éléments ajoutés.
+        """
+        accepted = 0
+        with self._lock:
+            if self._closed:
+                return 0
+            for item in items:
+                accepted += self._put(item)
+            MONITORING_QUEUE_DEPTH.set(len(self._items))
+            self._not_empty.notify()
+        return accepted
+
+    def _put(self, item: Any) -> int:
+        self._offered += 1
+        if len(self._items) < self.maxsize:
+            self._items.append(item)
+            return 1
+
+        if self.policy == "block":
+            self._not_empty.notify()
+            if self._not_full.wait_for(lambda: len(self._items) < self.maxsize, timeout=self.block_timeout):
+                self._items.append(item)
+                return 1
+            MONITORING_DROPPED.labels(policy=self.policy).inc()
+            return 0
+
+        MONITORING_DROPPED.labels(policy=self.policy).inc()
+        if self.policy == "drop_oldest":
+            self._items.popleft()
+            self._items.append(item)
+            return 1
+
+        slot = self._random.randrange(self._offered)
+        if slot < self.maxsize:
+            self._items[slot] = item
+            return 1
+        return 0
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """
+        Arrête la file : les éléments restants sont traités, puis le worker s'arrête.
+        """
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _take(self) -> List[Any]:
+        # Un lot part dès qu'il est complet, et au plus tard après `flush_interval`
+        full = min(self.batch_size, self.maxsize)
+        with self._lock:
+            self._not_empty.wait_for(lambda: len(self._items) >= full or self._closed, timeout=self.flush_interval)
+            count = min(len(self._items), self.batch_size)
+            batch = [self._items.popleft() for _ in range(count)]
+            self._offered = len(self._items)
+            MONITORING_QUEUE_DEPTH.set(len(self._items))
+            self._not_full.notify_all()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            if batch:
+                self.flush(batch)
+            elif self._closed:
+                return
+
+    def flush(self, batch: List[Any]):
+        """
+        Transmet un lot au consommateur, en mesurant sa durée. Une erreur ne l'arrête pas.
+        """
+        start = time.perf_counter()
+        try:
+            self.consumer(batch)
+        except Exception as e:
+            MONITORING_FLUSH_ERRORS.inc()
+            print(f"[WARNING] Monitoring flush failed ({len(batch)} items dropped): {e}")
+        finally:
+            MONITORING_FLUSH_LATENCY.observe(time.perf_counter() - start)
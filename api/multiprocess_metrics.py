@@ -0,0 +1,151 @@
+# multiprocess_metrics.py
+"""
+Agrégation des métriques Prometheus entre les workers (gunicorn ou `uvicorn --workers N`).
+
+Le mode multi-processus est actif quand `PROMETHEUS_MULTIPROC_DIR` désigne un répertoire
+(vidé au lancement du serveur) : chaque processus écrit ses valeurs dans ses propres fichiers
+et `/metrics` agrège ceux de tous les processus, quel que soit le worker qui répond :
+    - compteurs et histogrammes : sommés sur tous les processus, y compris ceux qui sont morts ;
+    - jauges : selon leur `multiprocess_mode` (voir api/metrics.py), sur les processus vivants
+      seulement (`livesum`, `livemax`).
+
+Quand un worker meurt, ses jauges sont supprimées et ses compteurs et histogrammes fusionnés
+dans un fichier d'archive par type : une collecte lit un fichier par worker vivant, même après
+de nombreux redémarrages (`max_requests`). La fusion et la collecte s'excluent par un verrou
+de fichier : une collecte ne compte jamais un worker mort deux fois, ni zéro fois.
+
+Le rendu de `/metrics` est gardé `METRICS_CACHE_SECONDS` secondes : des collectes rapprochées
+(plusieurs Prometheus, rafraîchissements) ne relisent pas tous les fichiers.
+
+Ce module ne crée aucune métrique : le processus maître de gunicorn (gunicorn.conf.py) l'importe
+sans écrire de fichiers.
+"""
+import fcntl
+import glob
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from prometheus_client import CollectorRegistry, generate_latest
+from prometheus_client.mmap_dict import MmapedDict, mmap_key
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+
+# --- Configuration (variables d'environnement) ---
+# Répertoire des fichiers de métriques partagés par les workers (mode multi-processus si défini)
+MULTIPROCESS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or None
+# Durée de validité d'un rendu de /metrics, en secondes (0 : pas de cache)
+METRICS_CACHE_SECONDS = float(os.getenv("METRICS_CACHE_SECONDS", "1"))
+
+# Types de métriques cumulées dans l'archive à la mort d'un worker
+_ARCHIVED_TYPES = ("counter", "histogram")
+_ARCHIVE = "archive"
+_LOCK_FILE = ".lock"
+
+
+@contextmanager
+def _locked(directory: str, exclusive: bool) -> Iterator[None]:
+    with open(os.path.join(directory, _LOCK_FILE), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class ArchivingCollector(MultiProcessCollector):
+    """
+    Collecteur multi-processus dont la lecture des fichiers exclut l'archivage d'un worker mort.
+    """
+
+    def collect(self):
+        with _locked(self._path, exclusive=False):
+            return list(super().collect())
+
+
+def archive(pid: int, directory: Optional[str] = MULTIPROCESS_DIR):
+    """
+    Range les fichiers d'un processus mort : supprime ses jauges et fusionne ses compteurs
+    et histogrammes dans l'archive de leur type.
+
+    Args:
+        pid (int): Le processus mort.
+        directory (str): Le répertoire des fichiers de métriques.
+    """
+    with _locked(directory, exclusive=True):
+        mark_process_dead(pid, directory)
+        for typ in _ARCHIVED_TYPES:
+            dead = os.path.join(directory, f"{typ}_{pid}.db")
+            if not os.path.exists(dead):
+                continue
+            target = os.path.join(directory, f"{typ}_{_ARCHIVE}.db")
+            merged = MultiProcessCollector.merge([f for f in (target, dead) if os.path.exists(f)], accumulate=False)
+
+            # Nouvelle archive écrite à côté puis substituée : elle n'est jamais lue à moitié écrite
+            partial = f"{target}.tmp"
+            if os.path.exists(partial):
+                os.remove(partial)
+            values = MmapedDict(partial)
+            try:
+                for metric in merged:
+                    for sample in metric.samples:
+                        labels = sample.labels
+                        key = mmap_key(metric.name, sample.name, list(labels), list(labels.values()),
+                                       metric.documentation)
+                        values.write_value(key, sample.value, 0.0)
+            finally:
+                values.close()
+            os.replace(partial, target)
+            os.remove(dead)
+
+
+def reset(directory: Optional[str] = MULTIPROCESS_DIR):
+    """
+    Vide le répertoire des métriques, au lancement du serveur (valeurs d'une exécution précédente).
+    """
+    os.makedirs(directory, exist_ok=True)
+    with _locked(directory, exclusive=True):
+        for path in glob.glob(os.path.join(directory, "*.db")) + glob.glob(os.path.join(directory, "*.tmp")):
+            os.remove(path)
+
+
+class CachedScrape:
+    """
+    Rendu au format texte de Prometheus d'un registre, gardé `ttl` secondes.
+
+    Les collectes simultanées attendent un seul rendu au lieu de relire chacune tous les fichiers.
+    """
+
+    def __init__(self, registry: CollectorRegistry, ttl: float = METRICS_CACHE_SECONDS):
+        self.registry = registry
+        self.ttl = ttl
+        self._output: Optional[bytes] = None
+        self._rendered_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> bytes:
+        with self._lock:
+            now = time.monotonic()
+            if self._output is None or now - self._rendered_at >= self.ttl:
+                self._output = generate_latest(self.registry)
+                self._rendered_at = now
+            return self._output
+
+
+_scrape: Optional[CachedScrape] = None
+_scrape_lock = threading.Lock()
+
+
+def scrape() -> bytes:
+    """
+    Retourne les métriques agrégées de tous les processus, au format texte de Prometheus.
+    """
+    global _scrape
+    if _scrape is None:
+        with _scrape_lock:
+            if _scrape is None:
+                registry = CollectorRegistry()
+                ArchivingCollector(registry, MULTIPROCESS_DIR)
+                _scrape = CachedScrape(registry)
+    return _scrape.get()
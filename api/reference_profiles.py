@@ -0,0 +1,268 @@
+# reference_profiles.py
+"""
+Profils précalculés des données de référence, pour le suivi de la dérive.
+
+Construction (à relancer quand les données de référence changent) :
+
+    python -m api.reference_profiles
+
+Chaque couple (ville, type de logement) donne un dossier de tableaux `.npy`
+(bornes des classes, histogrammes, quantiles, petit échantillon de lignes) que les
+workers projettent en mémoire (`mmap_mode="r"`) au lieu de relire et garder les CSV.
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .drift import DRIFT_BINS, reference_edges
+from .ingestion import ingest
+from .model_store import file_sha256
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+REFERENCE_DATA_DIR = ROOT_DIR / "reference_data"
+CSV_DATA_DIR = ROOT_DIR / "csv_data"
+REFERENCE_PROFILES_DIR = Path(os.getenv("REFERENCE_PROFILES_DIR", REFERENCE_DATA_DIR / "profiles"))
+
+# Colonnes des données de référence (variables du modèle puis prix au m²)
+REFERENCE_COLUMNS = ["Surface reelle bati", "Nombre pieces principales", "Surface terrain", "Nombre de lots", "prix_m2"]
+# Colonnes correspondantes des exports DVF ingérés
+INGESTED_COLUMNS = ["surface_bati", "nombre_pieces", "surface_terrain", "nombre_lots", "prix_m2"]
+
+# Suffixe des fichiers de référence, par type de logement
+TYPE_LOCAL_SUFFIXES = {
+    "appartement": "appart",
+    "maison": "maison",
+}
+CITIES = ("lille", "bordeaux")
+
+# Centiles conservés pour chaque variable
+QUANTILES = np.linspace(0, 1, 101)
+# Nombre maximal de lignes de référence conservées pour les rapports Evidently complets
+PROFILE_SAMPLE_SIZE = 2000
+
+
+# -------------------------------
+#  DONNÉES DE RÉFÉRENCE
+# -------------------------------
+def drop_outliers(df: pd.DataFrame, column: str) -> pd.DataFrame:
+    """
+    Retire les valeurs hors de [q1 - 1.5 IQR, q3 + 1.5 IQR] (comme dans les notebooks d'entraînement).
+    """
+    q1 = df[column].quantile(0.25)
+    q3 = df[column].quantile(0.75)
+    iqr = q3 - q1
+    return df[(df[column] > q1 - 1.5 * iqr) & (df[column] < q3 + 1.5 * iqr)]
+
+
+def build_reference_frame(csv_file: Path, type_local: str) -> pd.DataFrame:
+    """
+    Reconstruit les données de référence (jeu d'entraînement) d'une ville à partir de son export DVF,
+    avec les étapes des notebooks : logements de 4 pièces, valeurs manquantes et valeurs aberrantes
+    du prix retirées, 80 % des lignes tirées avec `random_state=42`.
+
+    Args:
+        csv_file (Path): L'export DVF de la ville (ex. csv_data/bordeaux_2024.csv), lu via le cache d'ingestion.
+        type_local (str): Le type de logement ("appartement" ou "maison").
+
+    Returns:
+        pd.DataFrame: Les données de référence, colonnes `REFERENCE_COLUMNS`.
+    """
+    # Import local : seule la construction des profils utilise sklearn, pas l'API
+    from sklearn.model_selection import train_test_split
+
+    table = ingest(csv_file)
+    selected = table.mask(type_local=type_local) & (table["nombre_pieces"] == 4)
+    df = pd.DataFrame({
+        column: np.asarray(table[name][selected])
+        for column, name in zip(REFERENCE_COLUMNS, INGESTED_COLUMNS)
+    })
+    df = drop_outliers(df.dropna(), "prix_m2")
+
+    X, y = df.drop(columns=["prix_m2"]), df[["prix_m2"]]
+    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42)
+    return pd.concat([X_train, y_train], axis=1)
+
+
+def reference_source(city: str, type_local: str, reference_dir: Path = REFERENCE_DATA_DIR,
+                     csv_dir: Path = CSV_DATA_DIR) -> Path:
+    """
+    Retourne le fichier source des données de référence : le CSV de référence s'il existe,
+    sinon l'export DVF de la ville.
+
+    Raises:
+        FileNotFoundError: Si aucune source n'est disponible.
+    """
+    suffix = TYPE_LOCAL_SUFFIXES[type_local]
+    for path in (Path(reference_dir) / f"reference_data_{suffix}_{city}.csv", Path(csv_dir) / f"{city}_2024.csv"):
+        if path.is_file():
+            return path
+    raise FileNotFoundError(f"Aucune donnée de référence pour {city}/{type_local}")
+
+
+def reference_frame(city: str, type_local: str, reference_dir: Path = REFERENCE_DATA_DIR,
+                    csv_dir: Path = CSV_DATA_DIR) -> pd.DataFrame:
+    """
+    Charge les données de référence d'une ville et d'un type de logement (voir `reference_source`).
+    """
+    source = reference_source(city, type_local, reference_dir, csv_dir)
+    if source.parent == Path(reference_dir):
+        return pd.read_csv(source)[REFERENCE_COLUMNS]
+    return build_reference_frame(source, type_local)
+
+
+# -------------------------------
+#  PROFILS
+# -------------------------------
+class ReferenceProfile:
+    """
+    Résumé compact des données de référence d'une ville et d'un type de logement.
+
+    Attributes:
+        features (List[str]): Les variables profilées.
+        edges (List[np.ndarray]): Les bornes des classes de chaque variable.
+        counts (np.ndarray): Les histogrammes de référence (une ligne par variable).
+        quantiles (np.ndarray): Les centiles de chaque variable (une ligne par variable).
+        rows (int): Le nombre de lignes de référence.
+        sample (np.ndarray): Un échantillon de lignes de référence, pour les rapports Evidently.
+    """
+
+    FILES = ("edges", "counts", "quantiles", "sample")
+
+    def __init__(self, features: Sequence[str], edges: List[np.ndarray], counts: np.ndarray,
+                 quantiles: np.ndarray, rows: int, sample: np.ndarray):
+        self.features = list(features)
+        self.edges = edges
+        self.counts = counts
+        self.quantiles = quantiles
+        self.rows = rows
+        self.sample = sample
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, features: Sequence[str] = REFERENCE_COLUMNS,
+                   n_bins: int = DRIFT_BINS, sample_size: int = PROFILE_SAMPLE_SIZE) -> "ReferenceProfile":
+        """
+        Calcule le profil de données de référence.
+        """
+        features = list(features)
+        values = frame[features].to_numpy(dtype=float)
+        edges = [reference_edges(values[:, i], n_bins) for i in range(len(features))]
+
+        width = max(len(e) for e in edges) + 1
+        counts = np.zeros((len(features), width))
+        quantiles = np.full((len(features), len(QUANTILES)), np.nan)
+        for i, column in enumerate(values.T):
+            column = column[~np.isnan(column)]
+            counts[i] = np.bincount(np.searchsorted(edges[i], column, side="right"), minlength=width)[:width]
+            if len(column):
+                quantiles[i] = np.quantile(column, QUANTILES)
+
+        if len(values) > sample_size:
+            values = values[np.random.default_rng(0).choice(len(values), sample_size, replace=False)]
+        return cls(features, edges, counts, quantiles, len(frame), values)
+
+    def sample_frame(self) -> pd.DataFrame:
+        """
+        Retourne l'échantillon de lignes de référence.
+        """
+        return pd.DataFrame(np.asarray(self.sample), columns=self.features)
+
+    def save(self, directory: Path) -> Dict:
+        """
+        Écrit le profil dans `directory` (un fichier `.npy` par tableau).
+
+        Returns:
+            Dict: Les métadonnées du profil, pour l'index.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        edges = np.full((len(self.features), self.counts.shape[1] - 1), np.nan)
+        for i, e in enumerate(self.edges):
+            edges[i, :len(e)] = e
+
+        for name, array in zip(self.FILES, (edges, self.counts, self.quantiles, self.sample)):
+            np.save(directory / f"{name}.npy", np.ascontiguousarray(array, dtype=np.float64))
+        return {"features": self.features, "edges": [len(e) for e in self.edges], "rows": self.rows}
+
+    @classmethod
+    def load(cls, directory: Path, meta: Dict) -> "ReferenceProfile":
+        """
+        Charge un profil écrit par `save`, ses tableaux projetés en mémoire.
+        """
+        arrays = {name: np.load(Path(directory) / f"{name}.npy", mmap_mode="r") for name in cls.FILES}
+        edges = [arrays["edges"][i, :n] for i, n in enumerate(meta["edges"])]
+        return cls(meta["features"], edges, arrays["counts"], arrays["quantiles"], meta["rows"], arrays["sample"])
+
+
+def build_profiles(
+    output_dir: Path = REFERENCE_PROFILES_DIR,
+    keys: Optional[Sequence[Tuple[str, str]]] = None,
+    n_bins: int = DRIFT_BINS,
+    reference_dir: Path = REFERENCE_DATA_DIR,
+    csv_dir: Path = CSV_DATA_DIR,
+) -> Dict:
+    """
+    Construit les profils de référence et leur index (`index.json`).
+
+    Args:
+        output_dir (Path): Le dossier des profils.
+        keys (Sequence[Tuple[str, str]]): Les couples (ville, type de logement) à profiler
+            (par défaut toutes les villes et tous les types de logement).
+        n_bins (int): Le nombre de classes par variable.
+
+    Returns:
+        Dict: L'index des profils.
+    """
+    output_dir = Path(output_dir)
+    keys = keys or [(city, type_local) for city in CITIES for type_local in TYPE_LOCAL_SUFFIXES]
+
+    profiles = {}
+    for city, type_local in keys:
+        source = reference_source(city, type_local, reference_dir, csv_dir)
+        frame = reference_frame(city, type_local, reference_dir, csv_dir)
+        profile = ReferenceProfile.from_frame(frame, n_bins=n_bins)
+
+        name = f"{city}_{type_local}"
+        meta = profile.save(output_dir / name)
+        meta.update({"path": name, "source": source.name, "source_sha256": file_sha256(source)})
+        profiles[f"{city}/{type_local}"] = meta
+        print(f"✅ {city}/{type_local}: {profile.rows} reference rows from {source.name}")
+
+    index = {"bins": n_bins, "profiles": profiles}
+    (output_dir / "index.json").write_text(json.dumps(index, indent=2, ensure_ascii=False))
+    return index
+
+
+def load_profile(city: str, type_local: str, profiles_dir: Path = REFERENCE_PROFILES_DIR) -> ReferenceProfile:
+    """
+    Charge le profil de référence d'une ville et d'un type de logement.
+
+    Sans profil construit, il est calculé en mémoire depuis les données de référence.
+
+    Raises:
+        FileNotFoundError: Si ni profil ni données de référence ne sont disponibles.
+    """
+    index_file = Path(profiles_dir) / "index.json"
+    if index_file.is_file():
+        meta = json.loads(index_file.read_text())["profiles"].get(f"{city}/{type_local}")
+        if meta is not None:
+            return ReferenceProfile.load(Path(profiles_dir) / meta["path"], meta)
+
+    print(f"[WARNING] No reference profile for {city}/{type_local}, computing it (python -m api.reference_profiles)")
+    return ReferenceProfile.from_frame(reference_frame(city, type_local))
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Construit les profils de référence pour le suivi de la dérive.")
+    parser.add_argument("--output", type=Path, default=REFERENCE_PROFILES_DIR, help="Dossier des profils")
+    parser.add_argument("--bins", type=int, default=DRIFT_BINS, help="Nombre de classes par variable")
+    args = parser.parse_args(argv)
+    build_profiles(args.output, n_bins=args.bins)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
-from fastapi import APIRouter, Request, BackgroundTasks, Depends
+from fastapi import APIRouter, Request, Depends
 from fastapi.responses import RedirectResponse
+from typing import List
 from .schemas import House, Prediction, CityHouse
-from .services import make_prediction
-from .security import authenticate
-from .metrics import REQUEST_COUNT, REQUEST_LATENCY
-import time
+from .services import make_prediction, make_batch_prediction
+from .security import authenticate, identify
+from .admission import admitted, batch_cost
+from .instrumentation import TimedRoute
+from .codec import CodecRoute, respond
+from .streaming import NDJSONStreamingResponse, stream_predictions
 
-router = APIRouter()
+
+class PredictionRoute(TimedRoute, CodecRoute):
+    """
+    Route de prédiction : la durée de validation (`TimedRoute`) inclut le décodage du corps (`CodecRoute`).
+    """
+
+
+# Chaque requête est comptée une seule fois, par le middleware Prometheus de api/main.py
+router = APIRouter(route_class=PredictionRoute)
 
 
 @router.get("/", include_in_schema=False)
@@ -21,55 +32,73 @@ async def root():
 async def get_prediction_lille(
     house: House,
     request: Request,
-    background_tasks: BackgroundTasks,
-    _: str = Depends(authenticate)
+    user: str = Depends(authenticate)
 ) -> Prediction:
     """
     Prédit le prix au m² pour un bien immobilier situé à Lille.
     """
-    method = request.method
-    endpoint = "/predict/lille"
-    REQUEST_COUNT.labels(method=method, endpoint=endpoint).inc()
-    start = time.time()
-    try:
-        return await make_prediction(house, "lille", request, background_tasks)
-    finally:
-        REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(time.time() - start)
+    async with admitted(request, user):
+        return respond(await make_prediction(house, "lille", request))
 
 
 @router.post("/predict/bordeaux", response_model=Prediction, summary="Prédiction pour Bordeaux")
 async def get_prediction_bordeaux(
     house: House,
     request: Request,
-    background_tasks: BackgroundTasks
+    user: str = Depends(identify),
 ) -> Prediction:
     """
     Prédit le prix au m² pour un bien immobilier situé à Bordeaux.
     """
-    method = request.method
-    endpoint = "/predict/bordeaux"
-    REQUEST_COUNT.labels(method=method, endpoint=endpoint).inc()
-    start = time.time()
-    try:
-        return await make_prediction(house, "bordeaux", request, background_tasks)
-    finally:
-        REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(time.time() - start)
+    async with admitted(request, user):
+        return respond(await make_prediction(house, "bordeaux", request))
 
 
 @router.post("/predict", response_model=Prediction, summary="Prédiction générique par ville")
 async def get_prediction(
     cityhouse: CityHouse,
     request: Request,
-    background_tasks: BackgroundTasks
+    user: str = Depends(identify),
 ) -> Prediction:
     """
     Prédit le prix au m² pour un bien immobilier, en fonction de la ville spécifiée.
     """
-    method = request.method
-    endpoint = "/predict"
-    REQUEST_COUNT.labels(method=method, endpoint=endpoint).inc()
-    start = time.time()
-    try:
-        return await make_prediction(cityhouse.features, cityhouse.ville, request, background_tasks)
-    finally:
-        REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(time.time() - start)
+    async with admitted(request, user):
+        return respond(await make_prediction(cityhouse.features, cityhouse.ville, request))
+
+
+@router.post("/predict/batch", response_model=List[Prediction], summary="Prédiction par lot")
+async def get_prediction_batch(
+    cityhouses: List[CityHouse],
+    request: Request,
+    user: str = Depends(authenticate)
+) -> List[Prediction]:
+    """
+    Prédit le prix au m² pour une liste de biens immobiliers, chacun avec sa ville.
+
+    Les biens sont regroupés par ville et type de logement pour être prédits en un seul
+    appel de modèle par groupe ; les prédictions sont renvoyées dans l'ordre de la requête.
+    """
+    async with admitted(request, user, batch_cost(len(cityhouses))):
+        return respond(await make_batch_prediction(cityhouses, request))
+
+
+@router.post(
+    "/predict/stream",
+    response_class=NDJSONStreamingResponse,
+    summary="Prédiction en flux (NDJSON)",
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/x-ndjson": {"schema": {"$ref": "#/components/schemas/CityHouse"}},
+    }}},
+)
+async def get_prediction_stream(
+    request: Request,
+    user: str = Depends(authenticate)
+) -> NDJSONStreamingResponse:
+    """
+    Prédit le prix au m² pour des biens envoyés en NDJSON (un `CityHouse` par ligne), sans limite de nombre.
+
+    Les prédictions sont renvoyées en NDJSON au fur et à mesure, dans l'ordre des lignes ; une ligne
+    refusée donne `{"ligne": <numéro>, "erreur": "<raison>"}` à sa place (voir api/streaming.py).
+    """
+    return NDJSONStreamingResponse(stream_predictions(request, user))
@@ -0,0 +1,86 @@
+import asyncio
+from typing import Dict, List, Tuple
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from .codec import respond
+from .comparables import ComparablesIndex, comparables_registry
+from .schemas import Comparables, ComparablesQuery
+from .security import identify
+from .services import _house_row
+
+
+router_comparables = APIRouter()
+
+
+async def _city_index(request: Request, ville: str) -> ComparablesIndex:
+    """
+    Retourne l'index des ventes d'une ville du catalogue, chargé dans un thread à la première demande.
+
+    Raises:
+        HTTPException: Si la ville n'est pas prise en charge ou n'a pas de ventes de référence.
+    """
+    if ville not in request.app.state.registry.current().cities:
+        raise HTTPException(status_code=400, detail="Ville non prise en charge")
+    index = comparables_registry.loaded(ville)
+    if index is None:
+        try:
+            index = await asyncio.to_thread(comparables_registry.get, ville)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Pas de ventes de référence pour cette ville")
+    return index
+
+
+def _search(indexes: Dict[str, ComparablesIndex], queries: List[ComparablesQuery]) -> List[dict]:
+    """
+    Cherche les ventes comparables d'un lot de biens : un seul appel à l'index par groupe
+    (ville, type de logement, restrictions), avec le plus grand k du groupe.
+    """
+    groups: Dict[Tuple, List[int]] = {}
+    for position, query in enumerate(queries):
+        key = (query.ville, query.features.type_local, query.code_postal, query.section)
+        groups.setdefault(key, []).append(position)
+
+    results: List[dict] = [None] * len(queries)
+    for (ville, type_local, code_postal, section), positions in groups.items():
+        features = np.array([_house_row(queries[i].features) for i in positions], dtype=np.float64)
+        k = max(queries[i].k for i in positions)
+        found = indexes[ville].query(type_local, features, k, code_postal, section)
+        for i, comparables in zip(positions, found):
+            results[i] = {"ville": ville, "comparables": comparables[:queries[i].k]}
+    return results
+
+
+@router_comparables.post("/comparables", response_model=Comparables, summary="Ventes comparables")
+async def get_comparables(
+    query: ComparablesQuery,
+    request: Request,
+    _: str = Depends(identify),
+) -> Comparables:
+    """
+    Retourne les k ventes réelles de la ville les plus proches du bien (surface, pièces, terrain, lots,
+    même type de logement), éventuellement restreintes au même code postal et/ou à la même section.
+    """
+    index = await _city_index(request, query.ville)
+    if query.code_postal is None and query.section is None:
+        # Une recherche dure moins d'une milliseconde : elle est faite directement, sans passer par un thread
+        return respond(_search({query.ville: index}, [query])[0])
+    # Une recherche restreinte peut construire le sous-arbre de ses ventes : elle est faite dans un thread
+    return respond((await asyncio.to_thread(_search, {query.ville: index}, [query]))[0])
+
+
+@router_comparables.post("/comparables/batch", response_model=List[Comparables], summary="Ventes comparables par lot")
+async def get_comparables_batch(
+    queries: List[ComparablesQuery],
+    request: Request,
+    _: str = Depends(identify),
+) -> List[Comparables]:
+    """
+    Retourne les ventes comparables d'une liste de biens, dans l'ordre de la requête.
+
+    Les biens sont regroupés par ville, type de logement et restrictions, et chaque groupe est
+    recherché en un seul appel à l'index, dans un thread.
+    """
+    indexes = {ville: await _city_index(request, ville) for ville in {query.ville for query in queries}}
+    return respond(await asyncio.to_thread(_search, indexes, queries))
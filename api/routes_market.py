@@ -0,0 +1,42 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from .market_stats import DIMENSIONS, MarketCube, market_cube
+from .schemas import MarketStats
+from .security import identify
+
+
+router_market = APIRouter()
+
+
+@router_market.get("/market-stats", response_model=MarketStats, summary="Statistiques de marché")
+async def get_market_stats(
+    commune: Optional[str] = Query(None, examples=["LILLE"]),
+    code_postal: Optional[int] = Query(None, examples=[59000]),
+    section: Optional[str] = Query(None, description="Section cadastrale (avec la commune)", examples=["AB"]),
+    type_local: Optional[str] = Query(None, examples=["maison"]),
+    mois: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", examples=["2024-03"]),
+    _: str = Depends(identify),
+) -> MarketStats:
+    """
+    Retourne le nombre de ventes et les quantiles du prix au m² pour toute combinaison de commune,
+    code postal, section cadastrale, type de logement et mois (les filtres absents sont agrégés).
+
+    Les statistiques sont précalculées (`python -m api.market_stats`) : la réponse est une simple
+    recherche en mémoire.
+    """
+    if section is not None and commune is None:
+        raise HTTPException(status_code=400, detail="La section cadastrale doit être accompagnée de la commune")
+
+    # Cube chargé en tâche de fond au démarrage ; à défaut, à la première requête
+    cube = market_cube.cube or await asyncio.to_thread(market_cube.load)
+    if cube is None:
+        raise HTTPException(status_code=503, detail="Statistiques de marché non construites")
+
+    key = MarketCube.key(commune, code_postal, section, type_local, mois)
+    stats = cube.get_key(key)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Aucune vente pour ces critères")
+    return {**dict(zip(DIMENSIONS, key)), **stats}
@@ -1,6 +1,12 @@
-from fastapi import APIRouter
+import asyncio
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import PlainTextResponse
-from .metrics import metrics_response
+from .metrics import metrics_response, MODEL_RELOADS
+from .security import authenticate
+from .services import warm_up
+from .service_monitoring import drift_stats as current_drift_stats, generate_drift_report
 from prometheus_client import CONTENT_TYPE_LATEST
 
 
@@ -8,7 +14,8 @@ router_monitoring = APIRouter()
 
 
 @router_monitoring.get("/health")
-def health():
+async def health():
+    # Served on the event loop: no hop through the thread pool, which model evaluation may keep busy
     return {"status": "ok"}
 
 
@@ -16,3 +23,74 @@ def health():
 def prometheus_metrics():
     """Expose Prometheus metrics"""
     return PlainTextResponse(metrics_response(), media_type=CONTENT_TYPE_LATEST)
+
+
+@router_monitoring.get("/admin/models/version", summary="Version des modèles servie")
+def model_version(request: Request, _: str = Depends(authenticate)):
+    """Retourne la version des modèles actuellement servie."""
+    return {"version": request.app.state.registry.version}
+
+
+@router_monitoring.post("/admin/models/reload", summary="Rechargement à chaud des modèles")
+async def reload_models(request: Request, _: str = Depends(authenticate)):
+    """
+    Recharge les fichiers de modèles sans redémarrer l'application.
+
+    La nouvelle version est chargée et préchauffée dans un thread pendant que les prédictions
+    continuent sur l'ancienne, puis substituée atomiquement. Les requêtes en cours terminent
+    sur la version avec laquelle elles ont commencé.
+
+    Seul le worker qui répond est rechargé immédiatement. Avec plusieurs workers (gunicorn.conf.py),
+    les autres sont prévenus par le catalogue (`ModelRegistry.notify_workers`) et se rechargent dans les
+    `MODEL_WATCH_INTERVAL` secondes ; sans surveillance, ils gardent leur version jusqu'à leur redémarrage.
+    Le champ `scope` de la réponse l'indique : "all_workers" ou "worker".
+    """
+    registry = request.app.state.registry
+    previous = registry.version
+    try:
+        model_set = await asyncio.to_thread(registry.reload, warm_up)
+    except Exception as e:
+        MODEL_RELOADS.labels(status="error").inc()
+        raise HTTPException(status_code=500, detail=f"Échec du rechargement des modèles : {e}")
+
+    MODEL_RELOADS.labels(status="success").inc()
+    try:
+        notified = await asyncio.to_thread(registry.notify_workers)
+    except OSError as e:
+        print(f"[WARNING] Could not notify the other workers of the reload: {e}")
+        notified = False
+    return {
+        "previous_version": previous,
+        "version": model_set.version,
+        "swapped": model_set.version != previous,
+        "scope": "all_workers" if notified else "worker",
+        "worker_pid": os.getpid(),
+    }
+
+
+@router_monitoring.get("/admin/drift", summary="Statistiques de dérive des données")
+def drift_stats(_: str = Depends(authenticate)):
+    """
+    Retourne le PSI, le KS et le nombre d'observations de chaque variable sur la fenêtre
+    d'observation courante, pour chaque couple (ville, type de logement) observé.
+    """
+    return current_drift_stats()
+
+
+@router_monitoring.post("/admin/drift/report", summary="Rapport de dérive Evidently à la demande")
+async def drift_report(
+    ville: str = "lille",
+    type_local: str = "appartement",
+    _: str = Depends(authenticate),
+):
+    """
+    Génère immédiatement un rapport Evidently complet sur l'échantillon de prédictions courant
+    d'une ville et d'un type de logement.
+    """
+    try:
+        report = await asyncio.to_thread(generate_drift_report, ville.lower(), type_local.lower(), False, 1)
+    except (FileNotFoundError, KeyError):
+        raise HTTPException(status_code=404, detail="Données de référence introuvables")
+    if report is None:
+        raise HTTPException(status_code=409, detail="Aucune prédiction observée depuis le dernier rapport")
+    return {"report": report}
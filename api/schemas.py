@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Literal
+from typing import Dict, List, Literal, Optional
 
 
 class House(BaseModel):
@@ -46,14 +46,24 @@ class House(BaseModel):
 class CityHouse(BaseModel):
     """
     Contient un bien immobilier et la ville cible pour la prédiction.
+
+    Les villes servies sont celles du catalogue des modèles (voir `api/models.py`) :
+    une ville absente du catalogue est refusée à la prédiction.
     """
 
-    ville: Literal["lille", "bordeaux"] = Field(
+    ville: str = Field(
         ...,
         json_schema_extra={"example": "lille"}
     )
     features: House
 
+    @field_validator("ville", mode="before")
+    @classmethod
+    def normalize_ville(cls, v):
+        if isinstance(v, str):
+            return v.strip().lower()
+        return v
+
 
 class Prediction(BaseModel):
     """
@@ -72,3 +82,94 @@ class Prediction(BaseModel):
         ...,
         json_schema_extra={"example": "RandomForestRegressor"}
     )
+    version_modele: Optional[str] = Field(
+        None,
+        json_schema_extra={"example": "3f2a9c1e7b40"}
+    )
+
+
+class ComparablesQuery(BaseModel):
+    """
+    Contient un bien immobilier, sa ville et les paramètres de la recherche de ventes comparables.
+
+    La recherche peut être restreinte aux ventes du même code postal et/ou de la même section cadastrale.
+    """
+
+    ville: str = Field(
+        ...,
+        json_schema_extra={"example": "lille"}
+    )
+    features: House
+    k: int = Field(
+        5,
+        ge=1,
+        le=50,
+        description="Nombre de ventes comparables renvoyées",
+    )
+    code_postal: Optional[int] = Field(
+        None,
+        json_schema_extra={"example": 59000}
+    )
+    section: Optional[str] = Field(
+        None,
+        json_schema_extra={"example": "AB"}
+    )
+
+    @field_validator("ville", mode="before")
+    @classmethod
+    def normalize_ville(cls, v):
+        if isinstance(v, str):
+            return v.strip().lower()
+        return v
+
+
+class Comparable(BaseModel):
+    """
+    Représente une vente réelle proche du bien recherché.
+    """
+
+    date_mutation: str = Field(..., json_schema_extra={"example": "2024-07-29"})
+    valeur_fonciere: float = Field(..., json_schema_extra={"example": 175000.0})
+    prix_m2: float = Field(..., json_schema_extra={"example": 2187.5})
+    surface_bati: float = Field(..., json_schema_extra={"example": 80.0})
+    nombre_pieces: int = Field(..., json_schema_extra={"example": 4})
+    surface_terrain: Optional[float] = Field(None, json_schema_extra={"example": 144.0})
+    nombre_lots: int = Field(..., json_schema_extra={"example": 0})
+    type_local: str = Field(..., json_schema_extra={"example": "maison"})
+    code_postal: int = Field(..., json_schema_extra={"example": 59000})
+    section: str = Field(..., json_schema_extra={"example": "IV"})
+    distance: float = Field(
+        ...,
+        description="Distance au bien recherché (caractéristiques centrées-réduites et pondérées)",
+    )
+
+
+class Comparables(BaseModel):
+    """
+    Représente les ventes comparables d'un bien, de la plus proche à la plus lointaine.
+    """
+
+    ville: str = Field(
+        ...,
+        json_schema_extra={"example": "lille"}
+    )
+    comparables: List[Comparable]
+
+
+class MarketStats(BaseModel):
+    """
+    Représente les statistiques du prix au m² des ventes d'une cellule du cube de marché
+    (voir `api/market_stats.py`) : les dimensions non précisées sont agrégées ("*").
+    """
+
+    commune: str = Field(..., json_schema_extra={"example": "LILLE"})
+    code_postal: str = Field(..., json_schema_extra={"example": "59000"})
+    section: str = Field(..., json_schema_extra={"example": "*"})
+    type_local: str = Field(..., json_schema_extra={"example": "maison"})
+    mois: str = Field(..., json_schema_extra={"example": "2024-03"})
+    nombre_ventes: int = Field(..., json_schema_extra={"example": 70})
+    prix_m2_median: float = Field(..., json_schema_extra={"example": 2400.6})
+    prix_m2_quantiles: Dict[str, float] = Field(
+        ...,
+        description="Quantiles du prix au m² (p10, p25, p50, p75, p90), estimés à ±1 %",
+    )
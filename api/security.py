@@ -1,5 +1,8 @@
+import base64
+import binascii
 import os
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from dotenv import load_dotenv
 import secrets
@@ -14,15 +17,49 @@ raw_users = os.getenv("API_USERS", "")
 user_db = dict(user.split(":") for user in raw_users.split(",") if ":" in user)
 
 
+# Préfixe des identités des appelants non authentifiés (suivi de l'adresse du client)
+ANONYMOUS = "anonymous"
+
+
+def _is_valid(username: str, password: str) -> bool:
+    stored_password = user_db.get(username)
+    return bool(stored_password) and secrets.compare_digest(password, stored_password)
+
+
 def authenticate(credentials: HTTPBasicCredentials = Depends(security)):
     username = credentials.username
     password = credentials.password
-    stored_password = user_db.get(username)
 
-    if not stored_password or not secrets.compare_digest(password, stored_password):
+    if not _is_valid(username, password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Identifiants invalides",
             headers={"WWW-Authenticate": "Basic"},
         )
     return username
+
+
+def identify(request: Request) -> str:
+    """
+    Identifie l'appelant d'une route publique, sans exiger d'authentification.
+
+    Retourne le nom d'utilisateur si la requête porte des identifiants Basic valides,
+    sinon `anonymous:<adresse du client>`. Les en-têtes sont lus directement pour que
+    le schéma OpenAPI des routes publiques n'annonce pas d'authentification.
+    """
+    credentials = _basic_credentials(request.headers.get("Authorization"))
+    if credentials is not None and _is_valid(*credentials):
+        return credentials[0]
+    host = request.client.host if request.client else "unknown"
+    return f"{ANONYMOUS}:{host}"
+
+
+def _basic_credentials(authorization: Optional[str]) -> Optional[tuple]:
+    scheme, _, param = (authorization or "").partition(" ")
+    if scheme.lower() != "basic":
+        return None
+    try:
+        username, separator, password = base64.b64decode(param).decode("utf-8").partition(":")
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    return (username, password) if separator else None
@@ -1,22 +1,34 @@
 # service_monitoring.py
-import pandas as pd
+import asyncio
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
+
 from datetime import datetime
 
-from evidently import Report
-from evidently.presets import DataDriftPreset
-from evidently.ui.workspace import RemoteWorkspace
+from .metrics import DRIFT_KS, DRIFT_OBSERVATIONS, DRIFT_PSI, DRIFT_REPORTS
+
+if TYPE_CHECKING:
+    from .drift import DriftMonitor
 
 # --- Evidently setup ---
 EVIDENTLY_URL = "http://evidently:8000"   # Docker service name
 PROJECT_ID = "019aeec9-bca8-76bf-8664-db17237a0e87"
 
+# Full Evidently reports: every DRIFT_REPORT_INTERVAL seconds (0: on demand only),
+# once at least DRIFT_REPORT_MIN_ROWS predictions were sampled
+DRIFT_REPORT_INTERVAL = float(os.getenv("DRIFT_REPORT_INTERVAL", "3600"))
+DRIFT_REPORT_MIN_ROWS = int(os.getenv("DRIFT_REPORT_MIN_ROWS", "30"))
+
 # Lazy-loaded globals
 _evidently_report = None
 _workspace = None
-_reference_data = None
-
-prediction_buffer = []
-BATCH_SIZE = 1
+_reference_profiles = {}
+_profiles_lock = threading.Lock()
+_drift_monitors = {}
+_drift_monitors_lock = threading.Lock()
+# Cities / types of property served without reference data: their predictions are not monitored
+_unmonitored = set()
 
 
 # -------------------------------
@@ -31,6 +43,8 @@ def get_workspace():
 
     if _workspace is None:
         try:
+            from evidently.ui.workspace import RemoteWorkspace  # heavy import, deferred to first report
+
             _workspace = RemoteWorkspace(EVIDENTLY_URL)
         except Exception as e:
             print(f"[WARNING] Could not connect to Evidently: {e}")
@@ -39,16 +53,25 @@ def get_workspace():
     return _workspace
 
 
-def get_reference_data():
+def get_reference_profile(city: str = "lille", type_local: str = "appartement"):
     """
-    Lazy-load reference dataset only when needed.
+    Lazy-load the precomputed reference profile of a city and type of property.
     """
-    global _reference_data
+    key = (city, type_local)
+    with _profiles_lock:
+        if key not in _reference_profiles:
+            from .reference_profiles import load_profile  # pulls in pandas: deferred to the first batch
+
+            _reference_profiles[key] = load_profile(city, type_local)
 
-    if _reference_data is None:
-        _reference_data = pd.read_csv("reference_data/reference_data_appart_lille.csv")
+    return _reference_profiles[key]
 
-    return _reference_data
+
+def get_reference_data(city: str = "lille", type_local: str = "appartement"):
+    """
+    Reference rows for full Evidently reports (the sample stored in the reference profile).
+    """
+    return get_reference_profile(city, type_local).sample_frame()
 
 
 def get_report():
@@ -58,34 +81,129 @@ def get_report():
     global _evidently_report
 
     if _evidently_report is None:
+        # Evidently takes seconds to import: only full reports need it
+        from evidently import Report
+        from evidently.presets import DataDriftPreset
+
         _evidently_report = Report(metrics=[DataDriftPreset()])
 
     return _evidently_report
 
 
+def get_drift_monitor(city: str = "lille", type_local: str = "appartement"):
+    """
+    Build the streaming drift monitor of a city and type of property only when needed.
+    """
+    key = (city, type_local)
+    with _drift_monitors_lock:
+        if key not in _drift_monitors:
+            from .drift import DriftMonitor
+
+            _drift_monitors[key] = DriftMonitor(get_reference_profile(city, type_local))
+
+    return _drift_monitors[key]
+
+
 # -------------------------------
-#  MAIN FUNCTION
+#  MAIN FUNCTIONS
 # -------------------------------
-def log_prediction_for_evidently(house_dict: dict, prediction_value: float):
+def log_prediction_for_evidently(
+    house_dict: dict, prediction_value: float, city: str = "lille", type_local: str = "appartement"
+):
+    """
+    Record one prediction in the drift statistics.
+    """
+    log_predictions_for_evidently([house_dict], [prediction_value], city, type_local)
+
+
+def log_predictions_for_evidently(
+    house_dicts: list, prediction_values: list, city: str = "lille", type_local: str = "appartement"
+):
+    """
+    Record a batch of predictions of one city and type of property in the drift statistics
+    and refresh the drift gauges.
+
+    Constant cost per prediction: no report is computed here (see `generate_drift_report`).
+    """
+    monitor = get_drift_monitor(city, type_local)
+    monitor.update([
+        {**house_dict, "prix_m2": value}
+        for house_dict, value in zip(house_dicts, prediction_values)
+    ])
+    publish_drift_metrics(monitor, city, type_local)
+
+
+def consume_monitoring_batch(items: list):
+    """
+    Monitoring queue consumer: `items` are ((city, type_local), house_dict, prediction_value).
+    """
+    groups = {}
+    for key, house_dict, value in items:
+        house_dicts, values = groups.setdefault(key, ([], []))
+        house_dicts.append(house_dict)
+        values.append(value)
+
+    for (city, type_local), (house_dicts, values) in groups.items():
+        if (city, type_local) in _unmonitored:
+            continue
+        try:
+            log_predictions_for_evidently(house_dicts, values, city, type_local)
+        except FileNotFoundError as e:
+            _unmonitored.add((city, type_local))
+            print(f"[WARNING] Drift monitoring disabled for {city}/{type_local}: {e}")
+
+
+def publish_drift_metrics(monitor: "DriftMonitor", city: str, type_local: str):
     """
-    Collect predictions, generate drift report and push to Evidently if available.
+    Export PSI / KS per feature as Prometheus gauges.
+    """
+    for feature, stats in monitor.stats().items():
+        labels = {"city": city, "type_local": type_local, "feature": feature}
+        DRIFT_PSI.labels(**labels).set(stats["psi"])
+        DRIFT_KS.labels(**labels).set(stats["ks"])
+        DRIFT_OBSERVATIONS.labels(**labels).set(stats["observations"])
+
+
+def drift_stats():
+    """
+    Current drift statistics of every monitored city and type of property.
+    """
+    with _drift_monitors_lock:
+        monitors = dict(_drift_monitors)
+    return {f"{city}/{type_local}": monitor.stats() for (city, type_local), monitor in monitors.items()}
+
+
+def generate_drift_report(
+    city: str = "lille",
+    type_local: str = "appartement",
+    reset: bool = False,
+    min_rows: int = DRIFT_REPORT_MIN_ROWS,
+) -> Optional[str]:
     """
-    entry = {**house_dict, "prix_m2": prediction_value}
-    prediction_buffer.append(entry)
+    Run a full Evidently drift report on the sampled predictions, save it and push it to Evidently.
 
-    if len(prediction_buffer) < BATCH_SIZE:
-        return  # Nothing to do yet
+    Args:
+        city (str): The city of the predictions.
+        type_local (str): The type of property of the predictions.
+        reset (bool): Start a new observation window once the report is generated.
+        min_rows (int): Minimum number of sampled predictions needed to generate a report.
 
-    df = pd.DataFrame(prediction_buffer)
+    Returns:
+        Optional[str]: The HTML report path, or None if there was not enough data.
+    """
+    monitor = get_drift_monitor(city, type_local)
+    df = monitor.sample_frame()
+    if len(df) < min_rows:
+        return None
 
     report = get_report()
-    reference_data = get_reference_data()
+    reference_data = get_reference_data(city, type_local)
 
     run = report.run(df, reference_data)
 
     # ◼ Save HTML locally
     today = datetime.today().strftime('%B_%Y')
-    report_name = f"evidently_reports/evidently_report_{today}.html"
+    report_name = f"evidently_reports/evidently_report_{city}_{type_local}_{today}.html"
     run.save_html(report_name)
     print(f"Saved HTML → {report_name}")
 
@@ -98,4 +216,30 @@ def log_prediction_for_evidently(house_dict: dict, prediction_value: float):
         except Exception as e:
             print("Failed pushing to Evidently:", e)
 
-    prediction_buffer.clear()
+    DRIFT_REPORTS.inc()
+    if reset:
+        monitor.reset()
+        publish_drift_metrics(monitor, city, type_local)
+    return report_name
+
+
+def generate_drift_reports(reset: bool = False):
+    """
+    Run a full drift report for every monitored city and type of property.
+    """
+    with _drift_monitors_lock:
+        keys = list(_drift_monitors)
+    for city, type_local in keys:
+        generate_drift_report(city, type_local, reset)
+
+
+async def drift_report_loop(interval: float):
+    """
+    Generate full drift reports every `interval` seconds, each on a fresh observation window.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(generate_drift_reports, True)
+        except Exception as e:
+            print(f"[WARNING] Drift report failed: {e}")
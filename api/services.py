@@ -1,28 +1,29 @@
 # services.py
 from fastapi import Request, HTTPException
-from .schemas import House, Prediction
+from . import inference_pool
+from .cache import prediction_key
+from .instrumentation import ANY_LABEL, observe_stage, observe_thread_wait, observe_validation, to_thread
+from .models import ModelBundle, ModelSet
+from .schemas import House, Prediction, CityHouse
 import numpy as np
-import asyncio
-from typing import Tuple
-from fastapi import BackgroundTasks
-from .service_monitoring import log_prediction_for_evidently  # import your function
+import time
+from typing import Dict, List, Optional, Tuple
 
 
 async def make_prediction(
     data: House,
     city_name: str,
     request: Request,
-    background_tasks: BackgroundTasks,
 ) -> Prediction:
     """
     Effectue une prédiction du prix au m² pour un bien immobilier donné dans une ville supportée.
 
     Cette fonction est asynchrone et délègue la prédiction réelle à la fonction predict
-    en utilisant `asyncio.to_thread` pour ne pas bloquer l'exécution async.
+    dans un thread (`to_thread`) pour ne pas bloquer l'exécution async.
 
     Args:
         data (House): Les caractéristiques du logement pour lequel on souhaite prédire le prix.
-        city_name (str): Le nom de la ville (ex. "lille" ou "bordeaux").
+        city_name (str): Le nom de la ville (ex. "lille"), parmi les villes du catalogue des modèles.
         request (Request): L'objet Request FastAPI, utilisé ici pour accéder aux modèles et scalers chargés.
 
     Raises:
@@ -33,15 +34,157 @@ async def make_prediction(
         la ville et le type de modèle utilisé.
     """
 
-    if city_name.lower() not in {"lille", "bordeaux"}:
+    ville = city_name.lower()
+    if ville not in request.app.state.registry.current().cities:
         raise HTTPException(status_code=400, detail="Ville non prise en charge")
 
-    prediction, house_dict = await asyncio.to_thread(_predict, data, request, city_name.lower())
-    background_tasks.add_task(log_prediction_for_evidently, house_dict, prediction.prix_m2_estime)
+    type_local = data.type_local.lower()
+    version = request.app.state.registry.version
+    observe_validation(request, ville, type_local, version)
+
+    # Les biens déjà estimés sont servis depuis le cache, sans passer par un thread
+    cache = getattr(request.app.state, "prediction_cache", None)
+    cached = None
+    if cache is not None:
+        cached = cache.get(prediction_key(ville, data, version), city=ville)
+
+    if cached is not None:
+        prediction, house_dict = cached, _house_dict(data)
+    else:
+        batcher = getattr(request.app.state, "batcher", None)
+        if batcher is not None:
+            prediction, house_dict = await _predict_batched(batcher, data, ville)
+        else:
+            prediction, house_dict = await to_thread(_predict, data, request, ville)
+
+        if cache is not None:
+            cache.put(prediction_key(ville, data, prediction.version_modele), prediction)
+
+    _monitor(request, [(ville, type_local)], [house_dict], [prediction.prix_m2_estime], prediction.version_modele)
 
     return prediction
 
 
+async def make_batch_prediction(
+    cityhouses: List[CityHouse],
+    request: Request,
+) -> List[Prediction]:
+    """
+    Effectue les prédictions d'un lot de biens immobiliers, éventuellement répartis sur plusieurs villes.
+
+    Le lot entier est traité en un seul passage dans un thread : les biens sont regroupés
+    par couple (ville, type de logement) et chaque groupe est prédit en un seul appel vectorisé.
+
+    Args:
+        cityhouses (List[CityHouse]): Les biens à estimer, chacun avec sa ville.
+        request (Request): L'objet Request FastAPI, utilisé ici pour accéder aux modèles et scalers chargés.
+
+    Raises:
+        HTTPException: Si une ville ou un type de logement n'est pas pris en charge.
+
+    Returns:
+        List[Prediction]: Les prédictions, dans l'ordre des biens reçus.
+    """
+
+    if not cityhouses:
+        return []
+
+    cities = request.app.state.registry.current().cities
+    if any(item.ville.lower() not in cities for item in cityhouses):
+        raise HTTPException(status_code=400, detail="Ville non prise en charge")
+
+    keys = [(item.ville.lower(), item.features.type_local.lower()) for item in cityhouses]
+    observe_validation(request, *_common_labels(keys), request.app.state.registry.version)
+
+    predictions, house_dicts = await to_thread(_predict_batch, cityhouses, request)
+    _monitor(
+        request,
+        keys,
+        house_dicts,
+        [prediction.prix_m2_estime for prediction in predictions],
+        predictions[0].version_modele,
+    )
+
+    return predictions
+
+
+def _monitor(
+    request: Request,
+    keys: List[Tuple[str, str]],
+    house_dicts: List[dict],
+    values: List[float],
+    version: Optional[str] = None,
+):
+    """
+    Transmet des prédictions au monitoring, sans attendre : elles sont déposées dans
+    la file de monitoring de l'application, vidée par son propre thread.
+    """
+    queue = getattr(request.app.state, "monitoring_queue", None)
+    if queue is not None:
+        start = time.perf_counter()
+        queue.put_many(zip(keys, house_dicts, values))
+        observe_stage("monitoring_enqueue", *_common_labels(keys), version, time.perf_counter() - start)
+
+
+def _common_labels(keys: List[Tuple[str, str]]) -> Tuple[str, str]:
+    """
+    Retourne la ville et le type de logement communs à des clés, `*` là où elles diffèrent.
+    """
+    cities = {city for city, _ in keys}
+    types_local = {type_local for _, type_local in keys}
+    return (
+        cities.pop() if len(cities) == 1 else ANY_LABEL,
+        types_local.pop() if len(types_local) == 1 else ANY_LABEL,
+    )
+
+
+async def _predict_batched(batcher, house: House, ville: str) -> Tuple[Prediction, dict]:
+    """
+    Soumet un logement au micro-batcher et construit sa prédiction.
+
+    Args:
+        batcher (MicroBatcher): Le micro-batcher de l'application.
+        house (House): Les caractéristiques du logement.
+        ville (str): Le nom de la ville en minuscules (ex. "lille").
+
+    Returns:
+        Tuple[Prediction, dict]: La prédiction et le dictionnaire de caractéristiques pour Evidently.
+    """
+
+    value, model_name, version = await batcher.submit((ville, house.type_local.lower()), _house_row(house))
+    prediction = Prediction(
+        prix_m2_estime=value, ville_modele=ville.capitalize(), model=model_name, version_modele=version
+    )
+
+    return prediction, _house_dict(house)
+
+
+def predict_group(state, key: Tuple[str, str], house_matrix: np.ndarray) -> List[Tuple[float, str, str]]:
+    """
+    Prédit en un seul appel un groupe de logements partageant la même ville et le même type.
+
+    Utilisée par le micro-batcher (voir `api/batching.py`).
+
+    Args:
+        state: L'état de l'application FastAPI (`app.state`), contenant les modèles et scalers chargés.
+        key (Tuple[str, str]): Le couple (ville, type de logement).
+        house_matrix (np.ndarray): Matrice (n, 4) des caractéristiques.
+
+    Returns:
+        List[Tuple[float, str, str]]: Pour chaque ligne, le prix estimé, le nom du modèle utilisé
+        et la version des modèles.
+    """
+
+    ville, type_local = key
+    model_set = state.registry.current()
+    observe_thread_wait(ville, type_local, model_set.version)
+    bundle = _select_model(model_set, ville, type_local)
+    output = _predict_array(bundle, house_matrix, (ville, type_local, model_set.version))
+
+    model_name = type(bundle.model).__name__
+    return [(value, model_name, model_set.version) for value in output.tolist()]
+
+
 def _predict(
     house: House,
     request: Request,
@@ -53,7 +196,7 @@ def _predict(
     Args:
         house (House): Les caractéristiques du logement.
         request (Request): L'objet Request FastAPI, permettant d'accéder aux modèles et scalers chargés.
-        ville (str): Le nom de la ville en minuscules ("lille" ou "bordeaux").
+        ville (str): Le nom de la ville en minuscules (ex. "lille").
 
     Raises:
         HTTPException: Si le type de logement n'est pas supporté.
@@ -62,32 +205,161 @@ def _predict(
         Prediction: Le résultat de la prédiction avec le prix estimé, la ville et le nom du modèle utilisé.
     """
 
-    house_array = np.array([[house.surface_bati, house.nombre_pieces, house.surface_terrain, house.nombre_lots]])
+    house_array = np.array([_house_row(house)])
 
-    if house.type_local.lower() == "appartement":
-        model = request.app.state.model_a if ville == "lille" else request.app.state.model_a_b
-        scaler_X = request.app.state.scaler_Xa
-        scaler_y = request.app.state.scaler_ya
+    type_local = house.type_local.lower()
+    model_set = request.app.state.registry.current()
+    observe_thread_wait(ville, type_local, model_set.version)
+    bundle = _select_model(model_set, ville, type_local)
+    output = _predict_array(bundle, house_array, (ville, type_local, model_set.version))
 
-    elif house.type_local.lower() == "maison":
-        model = request.app.state.model_m if ville == "lille" else request.app.state.model_m_b
-        scaler_X = request.app.state.scaler_Xm
-        scaler_y = request.app.state.scaler_ym
+    prediction = Prediction(
+        prix_m2_estime=output[0],
+        ville_modele=ville.capitalize(),
+        model=type(bundle.model).__name__,
+        version_modele=model_set.version,
+    )
 
-    else:
+    return prediction, _house_dict(house)
+
+
+def _predict_batch(
+    cityhouses: List[CityHouse],
+    request: Request,
+) -> Tuple[List[Prediction], List[dict]]:
+    """
+    Effectue la prédiction synchrone d'un lot de biens, groupe par groupe.
+
+    Args:
+        cityhouses (List[CityHouse]): Les biens à estimer, chacun avec sa ville.
+        request (Request): L'objet Request FastAPI, permettant d'accéder aux modèles et scalers chargés.
+
+    Raises:
+        HTTPException: Si un type de logement n'est pas supporté.
+
+    Returns:
+        Tuple[List[Prediction], List[dict]]: Les prédictions dans l'ordre d'entrée,
+        et les dictionnaires de caractéristiques destinés à Evidently.
+    """
+
+    # Indices des biens pour chaque couple (ville, type de logement)
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for index, item in enumerate(cityhouses):
+        key = (item.ville.lower(), item.features.type_local.lower())
+        groups.setdefault(key, []).append(index)
+
+    predictions: List[Prediction] = [None] * len(cityhouses)
+
+    # Tout le lot est prédit avec la même version des modèles
+    model_set = request.app.state.registry.current()
+    observe_thread_wait(*_common_labels(groups), model_set.version)
+
+    for (ville, type_local), indices in groups.items():
+        bundle = _select_model(model_set, ville, type_local)
+
+        house_matrix = np.array([_house_row(cityhouses[i].features) for i in indices], dtype=np.float64)
+        output = _predict_array(bundle, house_matrix, (ville, type_local, model_set.version))
+
+        ville_modele = ville.capitalize()
+        model_name = type(bundle.model).__name__
+        for i, value in zip(indices, output.tolist()):
+            predictions[i] = Prediction(
+                prix_m2_estime=value, ville_modele=ville_modele, model=model_name, version_modele=model_set.version
+            )
+
+    house_dicts = [_house_dict(item.features) for item in cityhouses]
+    return predictions, house_dicts
+
+
+def _select_model(model_set: ModelSet, ville: str, type_local: str) -> ModelBundle:
+    """
+    Sélectionne le modèle et les scalers à utiliser pour une ville et un type de logement.
+
+    Args:
+        model_set (ModelSet): La version des modèles servie pour la requête.
+        ville (str): Le nom de la ville en minuscules (ex. "lille").
+        type_local (str): Le type de logement ("appartement" ou "maison").
+
+    Raises:
+        HTTPException: Si le type de logement n'est pas supporté.
+
+    Returns:
+        ModelBundle: Le modèle, le scaler des variables d'entrée et le scaler de la variable de sortie.
+    """
+
+    try:
+        return model_set.get(ville, type_local.lower())
+    except KeyError:
         raise HTTPException(status_code=400, detail="Type de logement non supporté")
 
-    input_scaled = scaler_X.transform(house_array)
-    output_scaled = model.predict(input_scaled)
-    output = scaler_y.inverse_transform(output_scaled.reshape(1, -1))
 
-    prediction = Prediction(prix_m2_estime=output[0][0], ville_modele=ville.capitalize(), model=type(model).__name__)
+def _predict_array(
+    bundle: ModelBundle,
+    house_matrix: np.ndarray,
+    labels: Optional[Tuple[str, str, str]] = None,
+) -> np.ndarray:
+    """
+    Applique la chaîne scaler → modèle → scaler inverse sur une matrice de logements,
+    ou le moteur compilé équivalent s'il est disponible (dans le pool de processus
+    avec `INFERENCE_BACKEND=process`, voir `api/inference_pool.py`).
+
+    Args:
+        bundle (ModelBundle): Le modèle et ses scalers.
+        house_matrix (np.ndarray): Matrice (n, 4) des caractéristiques, dans l'ordre de `_house_row`.
+        labels (Tuple[str, str, str]): (ville, type de logement, version) pour mesurer la durée
+            de chaque étape ; sans étiquettes, rien n'est mesuré.
+
+    Returns:
+        np.ndarray: Les prix au m² estimés, de taille n.
+    """
+
+    start = time.perf_counter()
+    if bundle.compiled is not None:
+        pool = inference_pool.current()
+        if pool is not None:
+            output = pool.predict(bundle.compiled, house_matrix)
+            stage = "process_pool"
+        else:
+            output = bundle.compiled.predict(house_matrix)
+            stage = "compiled"
+        if labels is not None:
+            observe_stage(stage, *labels, time.perf_counter() - start)
+        return output
+
+    input_scaled = bundle.scaler_X.transform(house_matrix)
+    transformed = time.perf_counter()
+    output_scaled = np.asarray(bundle.model.predict(input_scaled))
+    predicted = time.perf_counter()
+    output = bundle.scaler_y.inverse_transform(output_scaled.reshape(-1, 1))
+
+    if labels is not None:
+        observe_stage("transform", *labels, transformed - start)
+        observe_stage("predict", *labels, predicted - transformed)
+        observe_stage("inverse_transform", *labels, time.perf_counter() - predicted)
+    return output[:, 0]
+
+
+def warm_up(bundle: ModelBundle):
+    """
+    Préchauffe un modèle avant sa mise en service, en prédisant une ligne factice.
+    """
+    _predict_array(bundle, np.zeros((1, 4)))
+
 
-    # Create dictionary for Evidently
-    house_dict = {
+def _house_row(house: House) -> List[float]:
+    """
+    Retourne les caractéristiques du logement dans l'ordre attendu par les modèles.
+    """
+    return [house.surface_bati, house.nombre_pieces, house.surface_terrain, house.nombre_lots]
+
+
+def _house_dict(house: House) -> dict:
+    """
+    Crée le dictionnaire des caractéristiques du logement pour Evidently.
+    """
+    return {
         "Surface reelle bati": house.surface_bati,
         "Nombre pieces principales": house.nombre_pieces,
         "Surface terrain": house.surface_terrain,
         "Nombre de lots": house.nombre_lots,
         }
-    return prediction, house_dict
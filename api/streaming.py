@@ -0,0 +1,244 @@
+# streaming.py
+"""
+Prédiction en flux (`POST /predict/stream`) : biens et prédictions au format NDJSON, un objet JSON par ligne.
+
+Le corps de la requête est lu au fil de l'eau et découpé en lignes ; les lignes sont regroupées en
+morceaux de `STREAM_CHUNK_ROWS` biens (`CityHouse`), chacun validé puis estimé dans un thread par
+`services._predict_batch` (un appel vectorisé par couple ville/type de logement, comme `/predict/batch`).
+Les prédictions (`Prediction`) sont renvoyées dès qu'un morceau est estimé, dans l'ordre des lignes.
+
+Contre-pression : un seul morceau est estimé pendant que le suivant est lu, et la lecture ne reprend
+que lorsque le résultat précédent a été envoyé. Un client qui lit lentement ralentit donc la lecture
+de son corps (TCP fait le reste) : la mémoire reste bornée à quelques morceaux, quelle que soit la
+taille du fichier. Le client doit lire la réponse pendant qu'il envoie le corps.
+
+Une ligne refusée (JSON invalide, bien invalide, ville ou type de logement hors du catalogue, ligne
+de plus de `STREAM_MAX_LINE_BYTES` octets) donne à sa place `{"ligne": <numéro>, "erreur": "<raison>"}`,
+sans interrompre le flux : le statut 200 est déjà envoyé. De même, si l'estimation d'un morceau échoue,
+chacune de ses lignes donne une erreur et le flux continue.
+
+Les limites de api/admission.py s'appliquent par morceau plutôt que par requête : le débit de
+l'utilisateur est compté en lignes, et une place de traitement n'est occupée que pendant
+l'estimation d'un morceau (un client lent ne la garde pas). Un flux n'est jamais refusé : quand
+les jetons ou les places manquent, il attend, et la contre-pression le ralentit.
+"""
+import asyncio
+import os
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import Request
+from pydantic import TypeAdapter, ValidationError
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from .admission import RATE_LIMIT_BATCH_ROWS_PER_TOKEN, Overloaded
+from .codec import encode
+from .instrumentation import to_thread
+from .schemas import CityHouse
+from .services import _monitor, _predict_batch
+
+# --- Configuration (variables d'environnement) ---
+# Biens estimés ensemble (un appel de modèle par couple ville/type de logement et par morceau)
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "1000"))
+# Taille maximale d'une ligne ; au-delà, la ligne est refusée sans être gardée en mémoire
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", "65536"))
+
+_CITYHOUSE = TypeAdapter(CityHouse)
+
+# Lignes d'un morceau : (numéro de ligne, contenu ; None si la ligne est trop longue)
+Lines = List[Tuple[int, Optional[bytes]]]
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    Réponse NDJSON envoyée pendant la lecture du corps de la requête.
+
+    `StreamingResponse` guette la déconnexion du client en lisant `receive` pendant l'envoi
+    (ASGI < 2.4, cas d'uvicorn) : elle consommerait les morceaux du corps que la route lit encore.
+    Ici, seule la route lit le corps, et y voit la déconnexion (`ClientDisconnect`).
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self.stream_response(send)
+        except (ClientDisconnect, OSError):
+            pass  # le client est parti : plus rien à envoyer
+        finally:
+            await self.body_iterator.aclose()
+        if self.background is not None:
+            await self.background()
+
+
+async def read_lines(blocks: AsyncIterator[bytes], max_line_bytes: int = STREAM_MAX_LINE_BYTES
+                     ) -> AsyncIterator[Optional[bytes]]:
+    """
+    Découpe un corps reçu par blocs en lignes, sans le garder en mémoire.
+
+    Une ligne de plus de `max_line_bytes` octets est remplacée par None, et son contenu ignoré.
+    """
+    pending = b""
+    oversized = False
+    async for block in blocks:
+        lines = (pending + block).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if oversized:
+                oversized = False  # fin de la ligne trop longue
+                continue
+            yield line if len(line) <= max_line_bytes else None
+        if len(pending) > max_line_bytes:
+            if not oversized:
+                yield None
+                oversized = True
+            pending = b""
+    if pending and not oversized:
+        yield pending
+
+
+async def read_chunks(request: Request, chunk_rows: int) -> AsyncIterator[Lines]:
+    """
+    Regroupe les lignes non vides du corps de la requête par morceaux de `chunk_rows` lignes.
+    """
+    chunk: Lines = []
+    number = 0
+    async for line in read_lines(request.stream()):
+        number += 1
+        if line is not None and not line.strip():
+            continue
+        chunk.append((number, line))
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _error(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc']) or 'ligne'}: {e['msg']}" for e in error.errors())
+
+
+def _score_chunk(chunk: Lines, request: Request):
+    """
+    Valide et estime un morceau de lignes (exécuté dans un thread).
+
+    Returns:
+        Tuple: Les lignes NDJSON de la réponse, puis les clés, caractéristiques, prix et version
+        des biens estimés, destinés au monitoring.
+    """
+    model_set = request.app.state.registry.current()
+    outputs: List[object] = [None] * len(chunk)
+    houses: List[CityHouse] = []
+    positions: List[int] = []
+
+    for position, (number, line) in enumerate(chunk):
+        if line is None:
+            outputs[position] = {"ligne": number, "erreur": "Ligne trop longue"}
+            continue
+        try:
+            house = _CITYHOUSE.validate_json(line)
+        except ValidationError as e:
+            outputs[position] = {"ligne": number, "erreur": _error(e)}
+            continue
+        if house.ville not in model_set.cities:
+            outputs[position] = {"ligne": number, "erreur": "Ville non prise en charge"}
+            continue
+        if (house.ville, house.features.type_local.lower()) not in model_set.bundles:
+            outputs[position] = {"ligne": number, "erreur": "Type de logement non supporté"}
+            continue
+        houses.append(house)
+        positions.append(position)
+
+    try:
+        predictions, house_dicts = _predict_batch(houses, request) if houses else ([], [])
+    except Exception as e:
+        print(f"[WARNING] Streaming chunk of {len(houses)} houses could not be scored: {e}")
+        for position in positions:
+            outputs[position] = {"ligne": chunk[position][0], "erreur": "Échec de la prédiction"}
+        houses, predictions, house_dicts = [], [], []
+    for position, prediction in zip(positions, predictions):
+        outputs[position] = prediction
+
+    body = b"".join(encode(output) + b"\n" for output in outputs)
+    keys = [(house.ville, house.features.type_local.lower()) for house in houses]
+    values = [prediction.prix_m2_estime for prediction in predictions]
+    version = predictions[0].version_modele if predictions else None
+    return body, keys, house_dicts, values, version
+
+
+def _failed_chunk(chunk: Lines):
+    body = b"".join(encode({"ligne": number, "erreur": "Échec de la prédiction"}) + b"\n" for number, _ in chunk)
+    return body, [], [], [], None
+
+
+async def _score(chunk: Lines, request: Request):
+    """
+    Estime un morceau en occupant une place de traitement, attendue aussi longtemps que nécessaire.
+    """
+    try:
+        return await _score_admitted(chunk, request)
+    except Exception as e:
+        print(f"[WARNING] Streaming chunk of {len(chunk)} lines failed: {e}")
+        return _failed_chunk(chunk)
+
+
+async def _score_admitted(chunk: Lines, request: Request):
+    admission = getattr(request.app.state, "admission", None)
+    if admission is None:
+        return await to_thread(_score_chunk, chunk, request)
+
+    while True:
+        try:
+            await admission.acquire()
+            break
+        except Overloaded:
+            await asyncio.sleep(max(admission.latency_budget, 0.01))
+    start = time.perf_counter()
+    try:
+        return await to_thread(_score_chunk, chunk, request)
+    finally:
+        admission.release(time.perf_counter() - start)
+
+
+async def _emit(request: Request, scoring: "asyncio.Future") -> bytes:
+    body, keys, house_dicts, values, version = await scoring
+    if keys:
+        _monitor(request, keys, house_dicts, values, version)
+    return body
+
+
+async def stream_predictions(request: Request, user: str, chunk_rows: Optional[int] = None
+                             ) -> AsyncIterator[bytes]:
+    """
+    Produit les lignes NDJSON de la réponse, un bloc par morceau de biens, dans l'ordre du corps.
+
+    Args:
+        request (Request): La requête, dont le corps est lu au fil de l'eau.
+        user (str): L'identité de l'appelant, pour le débit par utilisateur.
+        chunk_rows (int): Le nombre de biens estimés ensemble (`STREAM_CHUNK_ROWS` par défaut).
+    """
+    chunk_rows = chunk_rows or STREAM_CHUNK_ROWS
+    rate_limiter = getattr(request.app.state, "rate_limiter", None)
+    # Au plus deux morceaux en cours : celui dont le résultat est envoyé, et le suivant, estimé pendant l'envoi
+    scoring: List[asyncio.Future] = []
+    try:
+        async for chunk in read_chunks(request, chunk_rows):
+            if rate_limiter is not None:
+                cost = len(chunk) / max(1, RATE_LIMIT_BATCH_ROWS_PER_TOKEN)
+                while (delay := rate_limiter.take(user, cost)) > 0:
+                    await asyncio.sleep(delay)
+
+            scoring.append(asyncio.ensure_future(_score(chunk, request)))
+            if len(scoring) > 1:
+                yield await _emit(request, scoring[0])
+                scoring.pop(0)
+
+        while scoring:
+            yield await _emit(request, scoring[0])
+            scoring.pop(0)
+    finally:
+        for task in scoring:
+            task.cancel()
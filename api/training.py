@@ -0,0 +1,505 @@
+# training.py
+"""
+Entraînement des modèles servis, de l'export DVF au fichier de modèles chargé par l'API.
+
+    python -m api.training [--villes lille,bordeaux] [--workers N] [--output models/]
+
+Pour chaque ville et type de logement, le jeu de données est préparé comme dans les notebooks
+(notebooks/phase_1_lille.ipynb) : ventes de 4 pièces (`--pieces`), valeurs manquantes et prix
+au m² aberrants retirés, 80 % des lignes pour l'entraînement (`random_state=42`), variables et
+prix centrés-réduits (`StandardScaler`). Le jeu préparé et son découpage en `TRAINING_FOLDS` plis
+sont enregistrés à côté du cache d'ingestion (api/ingestion.py) : ils ne sont recalculés que si
+l'export change.
+
+Les candidats de `SEARCH_SPACE` (régression linéaire, arbre, forêt aléatoire, XGBoost) sont
+évalués par validation croisée dans un pool de processus, toutes villes confondues : chaque
+tâche relit le jeu préparé et ne renvoie que son score. XGBoost arrête d'ajouter des arbres
+dès que l'erreur du pli de validation ne baisse plus depuis `EARLY_STOPPING_ROUNDS` itérations.
+Le meilleur candidat (MSE de validation croisée) est réentraîné sur tout le jeu d'entraînement
+puis évalué sur les 20 % restants.
+
+Les runs sont journalisés dans le store MLflow local (`mlruns/` : un run par ville, un run
+imbriqué par type de logement, puis un par candidat). Chaque ville donne
+`<output>/best_model_<ville>.pkl`, avec les clés de `api.models.TYPE_LOCAL_KEYS` (`model_a`,
+`scaler_Xa`, `scaler_ya`, `model_m`…), et le catalogue des modèles est mis à jour pour servir
+ces fichiers.
+"""
+import argparse
+import functools
+import importlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from .ingestion import DVF_CACHE_DIR, ingest
+from .model_store import MLRUNS_DIR
+from .models import MODEL_CATALOG, TYPE_LOCAL_KEYS
+from .reference_profiles import drop_outliers
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+MODELS_DIR = ROOT_DIR / "models"
+
+# --- Configuration (variables d'environnement) ---
+# Export DVF de chaque ville ; sans `{city}`, un même export (ex. tout un département) filtré par commune
+TRAINING_SOURCE = os.getenv("TRAINING_SOURCE", str(ROOT_DIR / "csv_data" / "{city}_2024.csv"))
+# Store MLflow des runs d'entraînement
+TRAINING_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", MLRUNS_DIR.as_uri())
+TRAINING_EXPERIMENT = os.getenv("TRAINING_EXPERIMENT", "prix_m2_training")
+# Nombre de plis de la validation croisée
+TRAINING_FOLDS = int(os.getenv("TRAINING_FOLDS", "5"))
+
+# À incrémenter quand la préparation change : les jeux préparés existants sont alors ignorés
+DATASET_VERSION = 1
+# Graine et part de test des notebooks
+SEED = 42
+TEST_SIZE = 0.2
+# Itérations XGBoost sans amélioration sur le pli de validation avant l'arrêt
+EARLY_STOPPING_ROUNDS = 20
+
+# Variables d'entrée, dans l'ordre des modèles (voir services._house_row)
+FEATURES = ["surface_bati", "nombre_pieces", "surface_terrain", "nombre_lots"]
+TYPES_LOCAL = tuple(TYPE_LOCAL_KEYS)
+
+# Familles de modèles : module, paramètres fixes (un cœur par modèle, le parallélisme est celui du pool)
+ESTIMATORS = {
+    "LinearRegression": ("sklearn.linear_model", {}),
+    "DecisionTreeRegressor": ("sklearn.tree", {"random_state": SEED}),
+    "RandomForestRegressor": ("sklearn.ensemble", {"random_state": SEED, "n_jobs": 1}),
+    "XGBRegressor": ("xgboost", {
+        "objective": "reg:squarederror", "eval_metric": "rmse", "tree_method": "hist",
+        "n_estimators": 1000, "random_state": SEED, "n_jobs": 1,
+    }),
+}
+# Grilles d'hyperparamètres (celles des notebooks ; pour XGBoost, le nombre d'arbres vient de l'arrêt précoce)
+SEARCH_SPACE = {
+    "LinearRegression": {},
+    "DecisionTreeRegressor": {"max_depth": [5, 10, 20, None], "min_samples_split": [2, 5, 10]},
+    "RandomForestRegressor": {"n_estimators": [50, 100], "max_depth": [10, 20, None], "min_samples_split": [2, 5]},
+    "XGBRegressor": {"max_depth": [3, 6], "learning_rate": [0.05, 0.1, 0.3]},
+}
+
+
+class Dataset(NamedTuple):
+    """
+    Jeu préparé d'une ville et d'un type de logement.
+
+    Attributes:
+        city (str): La ville.
+        type_local (str): Le type de logement.
+        path (str): Le fichier `.npz` du jeu (X/y d'entraînement et de test bruts, pli de chaque ligne d'entraînement).
+    """
+
+    city: str
+    type_local: str
+    path: str
+
+
+class Candidate(NamedTuple):
+    """
+    Un modèle à évaluer : famille de `ESTIMATORS` et hyperparamètres.
+    """
+
+    dataset: Dataset
+    family: str
+    params: Dict[str, Any]
+
+
+class Score(NamedTuple):
+    """
+    Résultat de la validation croisée d'un candidat.
+
+    Attributes:
+        mse (float): La MSE moyenne sur les plis de validation (prix centré-réduit, comme dans les notebooks).
+        n_estimators (int): Le nombre moyen d'arbres retenus par l'arrêt précoce (XGBoost), sinon None.
+        seconds (float): La durée de l'évaluation.
+    """
+
+    mse: float
+    n_estimators: Optional[int]
+    seconds: float
+
+
+class Trained(NamedTuple):
+    """
+    Modèle retenu pour une ville et un type de logement, réentraîné sur tout le jeu d'entraînement.
+    """
+
+    candidate: Candidate
+    score: Score
+    model: Any
+    scaler_X: Any
+    scaler_y: Any
+    test_mse: float
+    train_rows: int
+    test_rows: int
+
+
+# -------------------------------
+#  PRÉPARATION
+# -------------------------------
+def source_path(city: str, source: str = TRAINING_SOURCE) -> Path:
+    """
+    Retourne l'export DVF d'une ville, d'après le modèle de chemin `source`.
+    """
+    return Path(source.format(city=city.lower()))
+
+
+def prepare_dataset(city: str, type_local: str, source: str = TRAINING_SOURCE, cache_dir: Path = DVF_CACHE_DIR,
+                    pieces: int = 4, folds: int = TRAINING_FOLDS) -> Dataset:
+    """
+    Prépare (ou relit depuis le cache d'ingestion) le jeu d'une ville et d'un type de logement.
+
+    Args:
+        city (str): La ville.
+        type_local (str): Le type de logement ("appartement" ou "maison").
+        source (str): Le modèle de chemin de l'export DVF (voir `TRAINING_SOURCE`).
+        cache_dir (Path): Le dossier du cache d'ingestion.
+        pieces (int): Le nombre de pièces des ventes retenues (0 : toutes).
+        folds (int): Le nombre de plis de la validation croisée.
+
+    Raises:
+        FileNotFoundError: Si l'export DVF n'existe pas.
+        ValueError: Si le jeu est trop petit pour la validation croisée.
+
+    Returns:
+        Dataset: Le jeu préparé.
+    """
+    # Import local : seul l'entraînement utilise sklearn.model_selection
+    from sklearn.model_selection import KFold, train_test_split
+
+    table = ingest(source_path(city, source), cache_dir)
+    path = Path(table.directory) / f"training-v{DATASET_VERSION}-{city}-{type_local}-p{pieces}-k{folds}.npz"
+    dataset = Dataset(city, type_local, str(path))
+    if path.is_file():
+        return dataset
+
+    selected = table.mask(type_local=type_local)
+    if "{city}" not in source:
+        selected &= table.mask(commune=city.upper())
+    if pieces:
+        selected &= table["nombre_pieces"] == pieces
+    frame = pd.DataFrame({name: np.asarray(table[name][selected]) for name in FEATURES + ["prix_m2"]})
+    frame = drop_outliers(frame.dropna(), "prix_m2")
+    if len(frame) < 2 * folds:
+        raise ValueError(f"Pas assez de ventes pour entraîner {city}/{type_local} : {len(frame)}")
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        frame[FEATURES].to_numpy(), frame["prix_m2"].to_numpy(), test_size=TEST_SIZE, random_state=SEED
+    )
+    fold = np.empty(len(X_train), dtype=np.int8)
+    for k, (_, validation) in enumerate(KFold(folds, shuffle=True, random_state=SEED).split(X_train)):
+        fold[validation] = k
+
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test, fold=fold)
+    os.replace(tmp, path)
+    return dataset
+
+
+@functools.lru_cache(maxsize=64)
+def load_dataset(path: str) -> Dict[str, np.ndarray]:
+    """
+    Relit un jeu préparé et centre-réduit ses variables et son prix (scalers ajustés sur l'entraînement).
+
+    Les modèles essayés sont insensibles à une transformation affine des variables : standardiser une
+    fois tout le jeu d'entraînement, comme les notebooks, ne biaise pas la validation croisée.
+
+    Returns:
+        Dict[str, np.ndarray]: Les tableaux du jeu, plus `X`, `y` (entraînement centré-réduit),
+        `scaler_X` et `scaler_y`.
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    with np.load(path) as npz:
+        data = dict(npz)
+    data["scaler_X"] = StandardScaler().fit(data["X_train"])
+    data["scaler_y"] = StandardScaler().fit(data["y_train"].reshape(-1, 1))
+    data["X"] = data["scaler_X"].transform(data["X_train"])
+    data["y"] = data["scaler_y"].transform(data["y_train"].reshape(-1, 1))[:, 0]
+    return data
+
+
+# -------------------------------
+#  RECHERCHE
+# -------------------------------
+def make_model(family: str, params: Dict[str, Any]):
+    """
+    Instancie un modèle de la famille `family` avec ses paramètres fixes et `params`.
+    """
+    module_name, fixed = ESTIMATORS[family]
+    return getattr(importlib.import_module(module_name), family)(**{**fixed, **params})
+
+
+def candidates(datasets: Sequence[Dataset], search_space: Dict[str, Dict[str, list]] = SEARCH_SPACE) -> List[Candidate]:
+    """
+    Retourne tous les candidats de la grille, pour chaque jeu.
+    """
+    grid = [
+        (family, dict(zip(space, values)))
+        for family, space in search_space.items()
+        for values in itertools.product(*space.values())
+    ]
+    return [Candidate(dataset, family, params) for dataset in datasets for family, params in grid]
+
+
+def evaluate(candidate: Candidate) -> Score:
+    """
+    Évalue un candidat par validation croisée sur les plis du jeu préparé (exécuté dans le pool).
+    """
+    from sklearn.metrics import mean_squared_error
+
+    start = time.perf_counter()
+    data = load_dataset(candidate.dataset.path)
+    X, y, fold = data["X"], data["y"], data["fold"]
+
+    errors, rounds = [], []
+    for k in range(int(fold.max()) + 1):
+        train, validation = fold != k, fold == k
+        model = make_model(candidate.family, candidate.params)
+        if candidate.family == "XGBRegressor":
+            model.set_params(early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+            model.fit(X[train], y[train], eval_set=[(X[validation], y[validation])], verbose=False)
+            rounds.append(model.best_iteration + 1)
+        else:
+            model.fit(X[train], y[train])
+        errors.append(mean_squared_error(y[validation], model.predict(X[validation])))
+
+    n_estimators = int(round(np.mean(rounds))) if rounds else None
+    return Score(float(np.mean(errors)), n_estimators, time.perf_counter() - start)
+
+
+def refit(candidate: Candidate, score: Score) -> Trained:
+    """
+    Réentraîne un candidat sur tout le jeu d'entraînement et mesure sa MSE sur le jeu de test (exécuté dans le pool).
+    """
+    from sklearn.metrics import mean_squared_error
+
+    data = load_dataset(candidate.dataset.path)
+    params = dict(candidate.params)
+    if score.n_estimators is not None:
+        params["n_estimators"] = score.n_estimators
+    model = make_model(candidate.family, params)
+    model.fit(data["X"], data["y"])
+
+    X_test = data["scaler_X"].transform(data["X_test"])
+    y_test = data["scaler_y"].transform(data["y_test"].reshape(-1, 1))[:, 0]
+    test_mse = float(mean_squared_error(y_test, model.predict(X_test)))
+    return Trained(candidate, score, model, data["scaler_X"], data["scaler_y"], test_mse,
+                   len(data["X_train"]), len(data["X_test"]))
+
+
+def search(datasets: Sequence[Dataset], workers: Optional[int] = None,
+           search_space: Dict[str, Dict[str, list]] = SEARCH_SPACE):
+    """
+    Évalue tous les candidats de tous les jeux, puis réentraîne le meilleur de chaque jeu.
+
+    Args:
+        datasets (Sequence[Dataset]): Les jeux préparés.
+        workers (int): Le nombre de processus (0 : dans le processus courant ; défaut : nombre de CPU).
+        search_space (Dict): Les grilles d'hyperparamètres par famille.
+
+    Returns:
+        Tuple[Dict[Dataset, Trained], List[Tuple[Candidate, Score]]]: Le modèle retenu par jeu
+        et le score de chaque candidat.
+    """
+    tasks = candidates(datasets, search_space)
+    workers = os.cpu_count() if workers is None else workers
+
+    def run(pool_map):
+        scores = list(zip(tasks, pool_map(evaluate, tasks)))
+        best = {
+            dataset: min(((c, s) for c, s in scores if c.dataset == dataset), key=lambda item: item[1].mse)
+            for dataset in datasets
+        }
+        trained = dict(zip(datasets, pool_map(refit, *zip(*(best[dataset] for dataset in datasets)))))
+        return trained, scores
+
+    if workers == 0:
+        return run(map)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return run(pool.map)
+
+
+# -------------------------------
+#  SORTIES
+# -------------------------------
+def write_bundle(path: Path, trained: Dict[str, Trained]) -> Path:
+    """
+    Écrit le fichier de modèles d'une ville, avec les clés `TYPE_LOCAL_KEYS` de chaque type de logement.
+    """
+    bundle = {}
+    for type_local, result in trained.items():
+        model_key, scaler_X_key, scaler_y_key = TYPE_LOCAL_KEYS[type_local]
+        bundle.update({model_key: result.model, scaler_X_key: result.scaler_X, scaler_y_key: result.scaler_y})
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Écriture atomique : la surveillance des modèles ne voit jamais un fichier partiel
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    joblib.dump(bundle, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def update_catalog(catalog_file: Path, bundles: Dict[str, Path]):
+    """
+    Fait pointer le catalogue des modèles (voir `api.models.read_catalog`) vers les fichiers
+    de modèles entraînés, pour chaque type de logement des villes entraînées.
+    """
+    catalog_file = Path(catalog_file)
+    try:
+        catalog = json.loads(catalog_file.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        catalog = {"cities": {}}
+
+    for city, path in bundles.items():
+        file = os.path.relpath(path, catalog_file.parent)
+        catalog["cities"][city] = {
+            type_local: {
+                name: {"file": file, "key": key}
+                for name, key in zip(("model", "scaler_X", "scaler_y"), keys)
+            }
+            for type_local, keys in TYPE_LOCAL_KEYS.items()
+        }
+
+    catalog_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = catalog_file.with_name(f"{catalog_file.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(catalog, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, catalog_file)
+
+
+def _loggable(params: Dict[str, Any]) -> Dict[str, str]:
+    return {name: str(value) for name, value in params.items()}
+
+
+def log_runs(trained: Dict[Dataset, Trained], scores: List, bundles: Dict[str, Path], settings: Dict[str, Any],
+             tracking_uri: str = TRAINING_TRACKING_URI, experiment: str = TRAINING_EXPERIMENT):
+    """
+    Journalise l'entraînement dans le store MLflow : un run par ville (paramètres de préparation,
+    fichier de modèles en artefact), un run imbriqué par type de logement (modèle retenu, MSE de
+    validation croisée et de test), puis un run imbriqué par candidat.
+    """
+    # Le store fichier (`mlruns/`) est en maintenance dans MLflow 3 : il doit être autorisé explicitement
+    os.environ.setdefault("MLFLOW_ALLOW_FILE_STORE", "true")
+    # Import local : MLflow est lent à importer et n'est utile qu'ici
+    import mlflow
+
+    mlflow.set_tracking_uri(tracking_uri)
+    mlflow.set_experiment(experiment)
+
+    for city, path in bundles.items():
+        with mlflow.start_run(run_name=city, tags={"ville": city}):
+            mlflow.log_params(_loggable(settings))
+            mlflow.log_artifact(str(path))
+            for dataset, result in trained.items():
+                if dataset.city != city:
+                    continue
+                tags = {"ville": city, "type_local": dataset.type_local}
+                with mlflow.start_run(run_name=f"{city}/{dataset.type_local}", nested=True, tags=tags):
+                    mlflow.log_params(_loggable({"family": result.candidate.family, **result.candidate.params,
+                                                 "n_estimators": result.score.n_estimators}))
+                    mlflow.log_metrics({"cv_mse": result.score.mse, "test_mse": result.test_mse,
+                                        "train_rows": result.train_rows, "test_rows": result.test_rows})
+                    for candidate, score in scores:
+                        if candidate.dataset != dataset:
+                            continue
+                        with mlflow.start_run(run_name=candidate.family, nested=True, tags=tags):
+                            mlflow.log_params(_loggable({"family": candidate.family, **candidate.params,
+                                                         "n_estimators": score.n_estimators}))
+                            mlflow.log_metrics({"cv_mse": score.mse, "seconds": score.seconds})
+
+
+# -------------------------------
+#  ENTRÉE
+# -------------------------------
+def train(
+    cities: Sequence[str],
+    output_dir: Path = MODELS_DIR,
+    workers: Optional[int] = None,
+    pieces: int = 4,
+    folds: int = TRAINING_FOLDS,
+    source: str = TRAINING_SOURCE,
+    cache_dir: Path = DVF_CACHE_DIR,
+    catalog_file: Optional[Path] = Path(MODEL_CATALOG),
+    tracking_uri: Optional[str] = TRAINING_TRACKING_URI,
+    experiment: str = TRAINING_EXPERIMENT,
+    search_space: Dict[str, Dict[str, list]] = SEARCH_SPACE,
+) -> Dict[str, Path]:
+    """
+    Entraîne les modèles de chaque ville et écrit `<output_dir>/best_model_<ville>.pkl`.
+
+    Args:
+        cities (Sequence[str]): Les villes.
+        output_dir (Path): Le dossier des fichiers de modèles.
+        workers (int): Le nombre de processus de la recherche (0 : sans pool ; défaut : nombre de CPU).
+        pieces (int): Le nombre de pièces des ventes retenues (0 : toutes).
+        folds (int): Le nombre de plis de la validation croisée.
+        source (str): Le modèle de chemin des exports DVF (voir `TRAINING_SOURCE`).
+        cache_dir (Path): Le dossier du cache d'ingestion.
+        catalog_file (Path): Le catalogue des modèles à mettre à jour (None : inchangé).
+        tracking_uri (str): Le store MLflow des runs (None : pas de journalisation).
+        experiment (str): L'expérience MLflow.
+        search_space (Dict): Les grilles d'hyperparamètres par famille.
+
+    Returns:
+        Dict[str, Path]: Le fichier de modèles de chaque ville.
+    """
+    start = time.perf_counter()
+    cities = [city.lower() for city in cities]
+    datasets = [
+        prepare_dataset(city, type_local, source, cache_dir, pieces, folds)
+        for city in cities for type_local in TYPES_LOCAL
+    ]
+    print(f"⏱ {len(datasets)} datasets ready in {time.perf_counter() - start:.1f}s")
+
+    trained, scores = search(datasets, workers, search_space)
+    print(f"⏱ {len(scores)} candidates evaluated in {time.perf_counter() - start:.1f}s")
+
+    bundles = {}
+    for city in cities:
+        selected = {d.type_local: result for d, result in trained.items() if d.city == city}
+        bundles[city] = write_bundle(Path(output_dir) / f"best_model_{city}.pkl", selected)
+        for type_local, result in selected.items():
+            print(f"✅ {city}/{type_local}: {result.candidate.family} {result.candidate.params} "
+                  f"(cv MSE {result.score.mse:.4f}, test MSE {result.test_mse:.4f}, {result.train_rows} rows)")
+
+    if catalog_file is not None:
+        update_catalog(catalog_file, bundles)
+    if tracking_uri is not None:
+        settings = {"pieces": pieces, "folds": folds, "source": source, "seed": SEED, "test_size": TEST_SIZE}
+        log_runs(trained, scores, bundles, settings, tracking_uri, experiment)
+
+    print(f"✅ Models written to {Path(output_dir)} in {time.perf_counter() - start:.1f}s")
+    return bundles
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Entraîne les modèles servis par l'API.")
+    parser.add_argument("--villes", default="lille,bordeaux", help="Villes entraînées")
+    parser.add_argument("--output", type=Path, default=MODELS_DIR, help="Dossier des fichiers de modèles")
+    parser.add_argument("--workers", type=int, default=None, help="Nombre de processus (0 : sans pool)")
+    parser.add_argument("--pieces", type=int, default=4, help="Nombre de pièces des ventes retenues (0 : toutes)")
+    parser.add_argument("--folds", type=int, default=TRAINING_FOLDS, help="Plis de la validation croisée")
+    parser.add_argument("--source", default=TRAINING_SOURCE, help="Export DVF ({city} : un fichier par ville)")
+    parser.add_argument("--catalog", type=Path, default=Path(MODEL_CATALOG), help="Catalogue des modèles mis à jour")
+    parser.add_argument("--no-catalog", action="store_true", help="Ne pas modifier le catalogue des modèles")
+    parser.add_argument("--no-mlflow", action="store_true", help="Ne pas journaliser les runs dans MLflow")
+    args = parser.parse_args(argv)
+    train(
+        args.villes.split(","), args.output, args.workers, args.pieces, args.folds, args.source,
+        catalog_file=None if args.no_catalog else args.catalog,
+        tracking_uri=None if args.no_mlflow else TRAINING_TRACKING_URI,
+    )
+
+
+if __name__ == "__main__":
+    main()
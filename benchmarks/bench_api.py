@@ -0,0 +1,388 @@
+"""
+Benchmark de latence et de débit de l'API, avec comparaison à une référence enregistrée.
+
+L'application réelle (`api/main.py`, lifespan compris : micro-batching, cache, file de monitoring)
+est appelée dans le processus via un client ASGI, avec de petits modèles générés localement
+(aucun fichier de `models/` ni `mlruns/` n'est lu). Chaque route est mesurée à plusieurs niveaux
+de concurrence (p50/p95/p99 en ms, requêtes/s) ; `_predict`, `_predict_batch`, le chargement
+des modèles et le traitement d'un lot de monitoring sont mesurés à part, ainsi que le décodage
+des corps et l'encodage des réponses, avec le codec rapide et avec le traitement standard.
+
+Usage :
+    python -m benchmarks.bench_api [--threshold 0.25]
+    python -m benchmarks.bench_api --compare autre_reference.json
+    python -m benchmarks.bench_api --save benchmarks/baselines/api.json
+
+Sans `--save`, les résultats sont comparés à la référence enregistrée dans le dépôt
+(`benchmarks/baselines/api.json`, produite avec les modèles de test ci-dessous et les options
+par défaut ; sa section `meta` décrit la machine). Le code de sortie est 1 si une mesure se dégrade
+de plus de `--threshold` (0.25 : +25 % de latence ou débit divisé par 1.25) par rapport à la référence.
+Les percentiles d'une mesure de moins de `MIN_PERCENTILE_COUNT` échantillons ne sont pas comparés.
+Une référence mesurée sur une autre machine n'est qu'indicative : régénérez-la avec `--save`
+sur la machine de comparaison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Sequence
+from unittest.mock import patch
+
+import httpx
+import joblib
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from api import codec, main as api_main, security
+from api.models import ModelRegistry, TYPE_LOCAL_KEYS
+from api.schemas import CityHouse, House, Prediction
+from api.service_monitoring import consume_monitoring_batch
+from api.services import _house_dict, _predict, _predict_batch
+
+REGRESSION_THRESHOLD = float(os.getenv("BENCH_REGRESSION_THRESHOLD", "0.25"))
+# Mesures comparées par défaut (le p99 est affiché mais trop bruité pour faire échouer la comparaison)
+COMPARED_METRICS = ("p50_ms", "p95_ms", "rps")
+# En dessous de ce nombre d'échantillons, le p95 n'est guère que la mesure la plus lente : seul le débit
+# est comparé. La règle est enregistrée dans la référence (`meta.min_percentile_count`).
+MIN_PERCENTILE_COUNT = int(os.getenv("BENCH_MIN_PERCENTILE_COUNT", "20"))
+
+# Référence enregistrée dans le dépôt, comparée par défaut
+BASELINE_FILE = Path(__file__).resolve().parent / "baselines" / "api.json"
+
+BENCH_USER = ("bench", "bench")
+BATCH_SIZE = 100
+
+
+# -------------------------------
+#  MODÈLES DE TEST
+# -------------------------------
+def build_fixture_models(directory: Path, seed: int = 0) -> Dict[str, str]:
+    """
+    Entraîne de petits modèles sur des données synthétiques et les écrit au format des
+    fichiers de `models/` (clés `model_a`, `scaler_Xa`…), un fichier par ville.
+
+    Returns:
+        Dict[str, str]: Le chemin du fichier de modèles de chaque ville, pour `ModelRegistry`.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.uniform(15, 200, 2000), rng.integers(1, 8, 2000),
+        rng.uniform(0, 800, 2000), rng.integers(0, 4, 2000),
+    ])
+    y = (3500 - 8 * X[:, 0] + 150 * X[:, 1] + 0.5 * X[:, 2] + rng.normal(0, 300, 2000)).reshape(-1, 1)
+    scaler_X, scaler_y = StandardScaler().fit(X), StandardScaler().fit(y)
+    X_scaled, y_scaled = scaler_X.transform(X), scaler_y.transform(y)[:, 0]
+
+    models = {
+        "lille": {
+            "appartement": GradientBoostingRegressor(n_estimators=50, max_depth=3, random_state=seed),
+            "maison": RandomForestRegressor(n_estimators=20, max_depth=6, random_state=seed),
+        },
+        "bordeaux": {
+            "appartement": LinearRegression(),
+            "maison": GradientBoostingRegressor(n_estimators=50, max_depth=3, random_state=seed),
+        },
+    }
+
+    files = {}
+    for city, by_type in models.items():
+        content = {}
+        for type_local, model in by_type.items():
+            model_key, scaler_X_key, scaler_y_key = TYPE_LOCAL_KEYS[type_local]
+            content[model_key] = model.fit(X_scaled, y_scaled)
+            content[scaler_X_key], content[scaler_y_key] = scaler_X, scaler_y
+        files[city] = str(Path(directory) / f"best_model_{city}.pkl")
+        joblib.dump(content, files[city])
+    return files
+
+
+def random_house(rng: np.random.Generator) -> dict:
+    return {
+        "surface_bati": float(rng.integers(15, 200)),
+        "nombre_pieces": int(rng.integers(1, 8)),
+        "type_local": str(rng.choice(["appartement", "maison"])),
+        "surface_terrain": float(rng.integers(0, 800)),
+        "nombre_lots": int(rng.integers(0, 4)),
+    }
+
+
+# -------------------------------
+#  MESURES
+# -------------------------------
+def latency_stats(timings: Sequence[float], elapsed: float) -> Dict[str, float]:
+    """
+    Résume des durées (en secondes) mesurées sur `elapsed` secondes au total.
+    """
+    p50, p95, p99 = np.percentile(np.asarray(timings) * 1e3, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "rps": round(len(timings) / elapsed, 2),
+        "count": len(timings),
+    }
+
+
+def time_function(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """
+    Mesure `repeat` appels successifs de `fn`, après un appel de préchauffage.
+    """
+    fn()
+    timings = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return latency_stats(timings, time.perf_counter() - start)
+
+
+ROUTES = {
+    "/predict": lambda rng: {"ville": str(rng.choice(["lille", "bordeaux"])), "features": random_house(rng)},
+    "/predict/lille": random_house,
+    "/predict/bordeaux": random_house,
+    "/predict/batch": lambda rng: [
+        {"ville": str(rng.choice(["lille", "bordeaux"])), "features": random_house(rng)} for _ in range(BATCH_SIZE)
+    ],
+}
+
+
+async def bench_route(client: httpx.AsyncClient, path: str, concurrency: int, requests: int,
+                      seed: int = 0) -> Dict[str, float]:
+    """
+    Envoie `requests` requêtes POST sur `path`, `concurrency` à la fois.
+
+    Les biens sont tirés au hasard : le cache de prédictions ne sert que les vraies répétitions.
+    """
+    rng = np.random.default_rng(seed)
+    payloads = [ROUTES[path](rng) for _ in range(requests)]
+    timings = []
+    position = 0
+
+    async def worker():
+        nonlocal position
+        while position < len(payloads):
+            payload = payloads[position]
+            position += 1
+            t0 = time.perf_counter()
+            response = await client.post(path, json=payload, auth=BENCH_USER)
+            timings.append(time.perf_counter() - t0)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path}: HTTP {response.status_code} {response.text}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latency_stats(timings, time.perf_counter() - start)
+
+
+async def bench_routes(registry: ModelRegistry, concurrency_levels: Sequence[int], requests: int) -> Dict:
+    """
+    Démarre l'application (lifespan compris) sur les modèles de test et mesure chaque route.
+    """
+    results = {}
+    with patch.object(api_main, "registry", registry), patch.dict(security.user_db, dict([BENCH_USER])):
+        async with api_main.app.router.lifespan_context(api_main.app):
+            if api_main.app.state.warmup is not None:
+                await api_main.app.state.warmup  # mesures sur les modèles chargés et préchauffés
+            transport = httpx.ASGITransport(app=api_main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for path in ROUTES:
+                    await bench_route(client, path, 1, min(requests, 20))  # préchauffage
+                    for concurrency in concurrency_levels:
+                        # Un lot coûte BATCH_SIZE prédictions, mais il faut assez de lots pour un p95 stable
+                        n = max(requests // 10, concurrency) if path == "/predict/batch" else requests
+                        stats = await bench_route(client, path, concurrency, n, seed=concurrency)
+                        results[f"route POST {path} c={concurrency}"] = stats
+                        _print_row(f"route POST {path} c={concurrency}", stats)
+    return results
+
+
+def bench_functions(registry_files: Dict[str, str], repeat: int) -> Dict:
+    """
+    Mesure séparément la prédiction synchrone, le chargement des modèles et le monitoring.
+    """
+    registry = ModelRegistry(bundle_files=registry_files).load()
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(registry=registry)))
+    rng = np.random.default_rng(1)
+    house = House(**random_house(rng))
+    cityhouses = [CityHouse(ville="lille", features=House(**random_house(rng))) for _ in range(BATCH_SIZE)]
+    monitoring_batch = [
+        (("lille", "appartement"), _house_dict(House(**random_house(rng))), float(rng.normal(3500, 500)))
+        for _ in range(500)
+    ]
+
+    cases = {
+        "function _predict": (lambda: _predict(house, request, "lille"), repeat),
+        f"function _predict_batch n={BATCH_SIZE}": (lambda: _predict_batch(cityhouses, request), repeat // 10),
+        "function model loading": (
+            lambda: ModelRegistry(bundle_files=registry_files).preload(), max(repeat // 100, 5)
+        ),
+        "function monitoring batch n=500": (lambda: consume_monitoring_batch(monitoring_batch), repeat // 10),
+    }
+    results = {}
+    for name, (fn, n) in cases.items():
+        results[name] = time_function(fn, max(n, 1))
+        _print_row(name, results[name])
+    return results
+
+
+def bench_codec(repeat: int) -> Dict:
+    """
+    Compare le codec des routes de prédiction (api/codec.py) au traitement standard de FastAPI :
+    `json.loads` puis validation du dictionnaire, et revalidation du `response_model` avant `JSONResponse`.
+    """
+    rng = np.random.default_rng(2)
+    bodies = {
+        "House": (House, json.dumps(random_house(rng)).encode()),
+        f"List[CityHouse] n={BATCH_SIZE}": (List[CityHouse], json.dumps(ROUTES["/predict/batch"](rng)).encode()),
+    }
+    prediction = Prediction(prix_m2_estime=3512.25, ville_modele="Lille", model="XGBRegressor", version_modele="v1")
+    responses = {
+        "Prediction": (Prediction, prediction),
+        f"List[Prediction] n={BATCH_SIZE}": (List[Prediction], [prediction] * BATCH_SIZE),
+    }
+
+    cases = {}
+    for name, (annotation, body) in bodies.items():
+        adapter = TypeAdapter(annotation)
+        n = repeat if annotation is House else max(repeat // 10, 1)
+        cases[f"decode {name} standard"] = (lambda a=adapter, b=body: a.validate_python(json.loads(b)), n)
+        cases[f"decode {name} codec"] = (
+            lambda a=adapter, b=body: a.validate_python(a.validate_json(b), from_attributes=True), n
+        )
+    for name, (annotation, content) in responses.items():
+        adapter = TypeAdapter(annotation)
+        n = repeat if annotation is Prediction else max(repeat // 10, 1)
+        cases[f"encode {name} standard"] = (
+            lambda a=adapter, c=content: JSONResponse(a.dump_python(a.validate_python(c), mode="json")), n
+        )
+        cases[f"encode {name} codec"] = (lambda c=content: codec.respond(c), n)
+
+    results = {}
+    with patch.object(codec, "FAST_CODEC", True):
+        for name, (fn, n) in cases.items():
+            results[f"codec {name}"] = time_function(fn, n)
+            _print_row(f"codec {name}", results[f"codec {name}"])
+    return results
+
+
+def run_suite(concurrency_levels: Sequence[int] = (1, 8, 32), requests: int = 500,
+              repeat: int = 1000) -> Dict:
+    """
+    Lance tout le benchmark.
+
+    Returns:
+        Dict: `{"meta": {...}, "results": {nom de la mesure: {p50_ms, p95_ms, p99_ms, rps, count}}}`.
+    """
+    _print_header()
+    with tempfile.TemporaryDirectory() as directory:
+        files = build_fixture_models(Path(directory))
+        results = asyncio.run(bench_routes(ModelRegistry(bundle_files=files), concurrency_levels, requests))
+        results.update(bench_functions(files, repeat))
+        results.update(bench_codec(repeat))
+
+    meta = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "concurrency": list(concurrency_levels),
+        "requests": requests,
+        "min_percentile_count": MIN_PERCENTILE_COUNT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    return {"meta": meta, "results": results}
+
+
+# -------------------------------
+#  RÉFÉRENCES
+# -------------------------------
+def compare(baseline: Dict, current: Dict, threshold: float = REGRESSION_THRESHOLD,
+            metrics: Sequence[str] = COMPARED_METRICS, min_count: Optional[int] = None) -> List[str]:
+    """
+    Compare deux résultats de `run_suite`.
+
+    Une latence est en régression si elle dépasse la référence de plus de `threshold`
+    (en proportion) ; un débit, si la référence le dépasse de plus de `threshold`.
+    Les mesures absentes de l'un des deux résultats sont ignorées, ainsi que les percentiles
+    d'une mesure de moins de `min_count` échantillons (par défaut, la règle de la référence,
+    sinon `MIN_PERCENTILE_COUNT`).
+
+    Returns:
+        List[str]: La description de chaque régression (vide si aucune).
+    """
+    if min_count is None:
+        min_count = baseline.get("meta", {}).get("min_percentile_count", MIN_PERCENTILE_COUNT)
+    regressions = []
+    for name, reference in baseline["results"].items():
+        measured = current["results"].get(name)
+        if measured is None:
+            continue
+        few = min(reference.get("count", min_count), measured.get("count", min_count)) < min_count
+        for metric in metrics:
+            if few and metric.endswith("_ms"):
+                continue
+            before, after = reference.get(metric), measured.get(metric)
+            if not before or not after:
+                continue
+            ratio = before / after if metric == "rps" else after / before
+            if ratio > 1 + threshold:
+                regressions.append(f"{name} {metric}: {before} → {after} ({(ratio - 1) * 100:+.0f} %)")
+    return regressions
+
+
+def _print_header():
+    print(f"{'mesure':<48}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>12}", file=sys.stderr)
+
+
+def _print_row(name: str, stats: Dict[str, float]):
+    print(f"{name:<48}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}{stats['rps']:>12.1f}",
+          file=sys.stderr)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32", help="Niveaux de concurrence, séparés par des virgules")
+    parser.add_argument("--requests", type=int, default=500, help="Requêtes par route et niveau de concurrence")
+    parser.add_argument("--repeat", type=int, default=1000, help="Appels pour les mesures de fonctions")
+    parser.add_argument("--save", type=Path, help="Écrit les résultats comme nouvelle référence (JSON)")
+    parser.add_argument("--compare", type=Path, nargs="?", const=BASELINE_FILE,
+                        help="Référence JSON comparée (sans --save : benchmarks/baselines/api.json)")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Dégradation tolérée, en proportion (0.25 : 25 %%)")
+    parser.add_argument("--metrics", default=",".join(COMPARED_METRICS), help="Mesures comparées")
+    args = parser.parse_args(argv)
+    if args.compare is None and not args.save:
+        args.compare = BASELINE_FILE
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    results = run_suite(levels, args.requests, args.repeat)
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+        print(f"✅ Baseline written to {args.save}", file=sys.stderr)
+
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), results, args.threshold, args.metrics.split(","))
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) over {args.threshold:.0%} vs {args.compare}:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print(f"✅ No regression over {args.threshold:.0%} vs {args.compare}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""
+Benchmark de la recherche de ventes comparables (api/comparables.py) face à un parcours
+pandas des ventes de la ville à chaque requête, sur les exports de `csv_data/`.
+
+Usage :
+    python -m benchmarks.bench_comparables [--villes lille,bordeaux] [--k 5] [--batch 1000] [--repeat 200]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from api.comparables import FEATURES, build, scale_features
+from benchmarks.timing import latency_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--villes", default="lille,bordeaux", help="Villes mesurées")
+    parser.add_argument("--k", type=int, default=5, help="Ventes comparables par bien")
+    parser.add_argument("--batch", type=int, default=1000, help="Taille du lot mesuré")
+    parser.add_argument("--repeat", type=int, default=200, help="Nombre de mesures par cas")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'index':<24}{'ventes':>8}{'scan pandas':>14}{'1 bien':>10}{'1 bien + section':>18}"
+          f"{'lot / bien':>12}   (µs, médiane)")
+
+    for city in args.villes.split(","):
+        index = build(city)
+        for type_local, partition in sorted(index.partitions.items()):
+            sales = partition.sales
+            frame = pd.DataFrame({name: sales[name] for name in FEATURES + ["section"]})
+            X = np.column_stack([sales[name] for name in FEATURES])[rng.integers(0, len(partition), args.batch)]
+            row = X[:1]
+            section = index.sections[int(sales["section"][0])]
+
+            def scan(row=row, frame=frame, partition=partition):
+                # Ce que ferait une requête sans index : distances à toutes les ventes, puis tri
+                points = (scale_features(frame[FEATURES].to_numpy()) - partition.center) / partition.scale
+                query = (scale_features(row) - partition.center) / partition.scale
+                distances = np.sqrt(((points - query) ** 2).sum(axis=1))
+                return frame.assign(distance=distances).nsmallest(args.k, "distance")
+
+            single = latency_us(lambda: index.query(type_local, row, args.k), repeat=args.repeat)
+            restricted = latency_us(lambda: index.query(type_local, row, args.k, section=section), repeat=args.repeat)
+            batch = latency_us(lambda: index.query(type_local, X, args.k), repeat=max(args.repeat // 20, 3)) / len(X)
+            print(f"{city + '/' + type_local:<24}{len(partition):>8}{latency_us(scan, repeat=args.repeat):>14.1f}"
+                  f"{single:>10.1f}{restricted:>18.1f}{batch:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
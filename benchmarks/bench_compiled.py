@@ -0,0 +1,53 @@
+"""
+Benchmark du moteur d'inférence compilé (api/compiled.py) face à la chaîne d'origine
+scaler → modèle → scaler inverse, sur les modèles servis par l'API.
+
+Usage :
+    python -m benchmarks.bench_compiled [--batch 1000] [--repeat 200]
+"""
+import argparse
+
+import numpy as np
+
+from api.compiled import compile_model, verify_compiled
+from api.models import registry
+from api.services import _predict_array
+from benchmarks.timing import latency_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=1000, help="Taille du lot mesuré")
+    parser.add_argument("--repeat", type=int, default=200, help="Nombre de mesures par cas")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'modèle':<26}{'erreur rel. max':>16}{'1 ligne std':>14}{'1 ligne comp':>14}"
+          f"{'lot std':>12}{'lot comp':>12}   (µs, médiane)")
+
+    for (city, type_local), bundle in sorted(registry.load().current().bundles.items()):
+        compiled = compile_model(bundle.model, bundle.scaler_X, bundle.scaler_y)
+        if compiled is None:
+            print(f"{city}/{type_local:<18} non compilable ({type(bundle.model).__name__})")
+            continue
+
+        mean, scale = bundle.scaler_X.mean_, bundle.scaler_X.scale_
+        X = np.abs(rng.normal(mean, 3 * scale, size=(args.batch, len(mean)))).round()
+        row = X[:1]
+
+        # Chemin servi par l'API (`services._predict_array`), sans puis avec le moteur compilé
+        standard = bundle._replace(compiled=None)
+        fast = bundle._replace(compiled=compiled)
+
+        error = verify_compiled(compiled, bundle.model, bundle.scaler_X, bundle.scaler_y)
+        print(
+            f"{city + '/' + type_local:<26}{error:>16.2e}"
+            f"{latency_us(_predict_array, standard, row, repeat=args.repeat):>14.1f}"
+            f"{latency_us(_predict_array, fast, row, repeat=args.repeat):>14.1f}"
+            f"{latency_us(_predict_array, standard, X, repeat=args.repeat):>12.1f}"
+            f"{latency_us(_predict_array, fast, X, repeat=args.repeat):>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark du backend d'inférence multi-processus (api/inference_pool.py) face à l'évaluation
+dans les threads du processus de l'API, à nombre de cœurs croissant.
+
+Un moteur compilé (XGBoost, arbres parcourus sans table) est évalué par `--clients` threads
+qui envoient chacun des lots de `--batch` logements ; le débit est mesuré en lignes par seconde.
+
+Usage :
+    python -m benchmarks.bench_inference_pool [--workers 1,2,4] [--batch 256] [--seconds 3]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import xgboost
+from sklearn.preprocessing import StandardScaler
+
+from api.compiled import CompiledTrees
+from api.inference_pool import InferencePool
+
+
+def build_engine(seed: int = 0) -> CompiledTrees:
+    """
+    Entraîne un XGBRegressor sur des données synthétiques et le compile, sans table précalculée
+    (variables continues : chaque prédiction parcourt les arbres).
+    """
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.uniform(15, 200, 5000), rng.uniform(1, 8, 5000),
+                         rng.uniform(0, 800, 5000), rng.uniform(0, 4, 5000)])
+    y = 3500 - 8 * X[:, 0] + 150 * X[:, 1] + 0.5 * X[:, 2] + rng.normal(0, 300, 5000)
+    scaler_X, scaler_y = StandardScaler().fit(X), StandardScaler().fit(y.reshape(-1, 1))
+    model = xgboost.XGBRegressor(n_estimators=300, max_depth=6, random_state=seed)
+    model.fit(scaler_X.transform(X), scaler_y.transform(y.reshape(-1, 1)).ravel())
+    return CompiledTrees.from_xgboost(model, scaler_X, scaler_y)
+
+
+def throughput(predict, batches, clients: int, seconds: float) -> float:
+    """
+    Évalue des lots depuis `clients` threads pendant `seconds` secondes.
+
+    Returns:
+        float: Le débit, en lignes par seconde.
+    """
+    deadline = time.perf_counter() + seconds
+
+    def client(index: int) -> int:
+        rows = 0
+        while time.perf_counter() < deadline:
+            batch = batches[(index + rows) % len(batches)]
+            predict(batch)
+            rows += len(batch)
+        return rows
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        rows = sum(executor.map(client, range(clients)))
+    return rows / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, cpus} & set(range(1, cpus + 1)))
+    parser.add_argument("--workers", default=",".join(map(str, default_workers)), help="Tailles de pool mesurées")
+    parser.add_argument("--batch", type=int, default=256, help="Logements par lot")
+    parser.add_argument("--clients", type=int, default=2 * cpus, help="Threads clients")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Durée de chaque mesure")
+    args = parser.parse_args()
+
+    engine = build_engine()
+    rng = np.random.default_rng(1)
+    batches = [np.column_stack([rng.uniform(15, 200, args.batch), rng.uniform(1, 8, args.batch),
+                                rng.uniform(0, 800, args.batch), rng.uniform(0, 4, args.batch)])
+               for _ in range(16)]
+
+    print(f"{'backend':<20}{'lignes/s':>14}{'accélération':>14}")
+    reference = throughput(engine.predict, batches, args.clients, args.seconds)
+    print(f"{'threads':<20}{reference:>14.0f}{1.0:>14.2f}")
+
+    for workers in (int(w) for w in args.workers.split(",")):
+        pool = InferencePool(workers).start()
+        try:
+            np.testing.assert_array_equal(pool.predict(engine, batches[0]), engine.predict(batches[0]))
+            rate = throughput(lambda batch: pool.predict(engine, batch), batches, args.clients, args.seconds)
+        finally:
+            pool.close()
+        print(f"{f'process × {workers}':<20}{rate:>14.0f}{rate / reference:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Classement des modèles XGBoost du store MLflow local (`mlruns/*/models/m-*`) : précision et coût
+d'inférence de chacun, sur les mêmes données, pour choisir le modèle servi.
+
+Chaque modèle est chargé depuis ses artefacts (durée de chargement, taille du fichier), puis évalué
+sur les ventes mises de côté du jeu préparé par api/training.py pour la ville et le type de logement :
+la part de test (20 %, `--holdout test`) ou tout le jeu (`--holdout all`, entraînement compris :
+plus de lignes, mais des erreurs optimistes pour les modèles entraînés dessus). Par défaut toutes les
+ventes sont retenues quel que soit leur nombre de pièces (`--pieces 0`), comme le trafic servi.
+
+Les variables sont centrées-réduites une seule fois avec les scalers servis (catalogue des modèles),
+chaque modèle prédit tout le lot en un appel, et les erreurs (MAE en €/m², MAPE) de tous les modèles
+sont calculées en une passe sur la matrice des prédictions. Les latences (1 ligne, lot de `--batch`
+lignes) sont mesurées sur le chemin de l'API (`services._predict_array` : chaîne scaler → modèle →
+scaler inverse, puis moteur compilé d'api/compiled.py). Un modèle qui ne peut pas être chargé ou
+évalué (nombre de variables différent…) garde son erreur dans son entrée, sans interrompre les autres.
+
+Usage :
+    python -m benchmarks.bench_leaderboard [--ville lille] [--type-local appartement] [--output leaderboard.json]
+
+Le classement (MAE croissante, puis latence par lot) est écrit en JSON : l'URI `models:/m-<id>`
+d'un modèle peut être reprise telle quelle dans models/catalog.json. En dessous de `--min-rows`
+ventes évaluées, les erreurs ne départagent pas les modèles : ils ne sont pas classés (pas de `rank`)
+et le code de sortie est 1.
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import joblib
+import numpy as np
+
+from api.compiled import compile_model
+from api.ingestion import DVF_CACHE_DIR
+from api.model_store import MLFLOW_DB, MLRUNS_DIR, file_sha256, instantiate_model, read_mlmodel
+from api.models import MODEL_CATALOG, ModelBundle, read_catalog
+from api.services import _predict_array
+from api.training import load_dataset, prepare_dataset
+from benchmarks.timing import latency_us
+
+# Nombre minimal de ventes évaluées pour classer les modèles
+MIN_ROWS = 30
+
+
+# -------------------------------
+#  MODÈLES
+# -------------------------------
+def registered_versions(mlflow_db: Path = MLFLOW_DB) -> Dict[str, List[str]]:
+    """
+    Retourne les versions enregistrées (`<nom>/<version>`) de chaque modèle journalisé, d'après `mlflow.db`.
+    """
+    versions: Dict[str, List[str]] = {}
+    if not Path(mlflow_db).is_file():
+        return versions
+    with sqlite3.connect(f"file:{mlflow_db}?mode=ro", uri=True) as connection:
+        rows = connection.execute("SELECT name, version, source FROM model_versions ORDER BY name, version")
+        for name, version, source in rows:
+            if source.startswith("models:/m-"):
+                versions.setdefault(source[len("models:/"):], []).append(f"{name}/{version}")
+    return versions
+
+
+def discover(mlruns_dir: Path = MLRUNS_DIR, mlflow_db: Path = MLFLOW_DB) -> List[Dict]:
+    """
+    Liste les modèles XGBoost journalisés dans le store local (les autres saveurs sont ignorées).
+
+    Returns:
+        List[Dict]: Pour chaque modèle : URI, run, date, classe, fichier du modèle et versions enregistrées.
+    """
+    versions = registered_versions(mlflow_db)
+    found = []
+    for mlmodel_file in sorted(Path(mlruns_dir).glob("*/models/m-*/artifacts/MLmodel")):
+        mlmodel = read_mlmodel(mlmodel_file.parent)
+        flavor = mlmodel.get("flavors", {}).get("xgboost")
+        if flavor is None:
+            continue
+        model_id = mlmodel.get("model_id") or mlmodel_file.parent.parent.name
+        found.append({
+            "model_uri": f"models:/{model_id}",
+            "registered": versions.get(model_id, []),
+            "run_id": mlmodel.get("run_id"),
+            "created": mlmodel.get("utc_time_created"),
+            "model_class": flavor["model_class"],
+            "data_file": mlmodel_file.parent / flavor["data"],
+        })
+    return found
+
+
+def served_scalers(city: str, type_local: str, catalog_file: Path = Path(MODEL_CATALOG)):
+    """
+    Charge les scalers servis pour une ville et un type de logement (entrées fichier du catalogue).
+
+    Les noms de variables des scalers ajustés sur des DataFrames sont retirés : le banc leur passe
+    des tableaux numpy, comme l'API, sans avertissement à chaque appel.
+    """
+    _, scaler_X, scaler_y = read_catalog(str(catalog_file))[(city, type_local)]
+    return tuple(
+        _without_feature_names(joblib.load(artifact.file)[artifact.key]) for artifact in (scaler_X, scaler_y)
+    )
+
+
+def _without_feature_names(scaler):
+    if not hasattr(scaler, "feature_names_in_"):
+        return scaler
+    scaler = copy.copy(scaler)
+    del scaler.feature_names_in_
+    return scaler
+
+
+# -------------------------------
+#  CLASSEMENT
+# -------------------------------
+def leaderboard(
+    city: str = "lille",
+    type_local: str = "appartement",
+    batch: int = 1000,
+    repeat: int = 200,
+    pieces: int = 0,
+    mlruns_dir: Path = MLRUNS_DIR,
+    mlflow_db: Path = MLFLOW_DB,
+    catalog_file: Path = Path(MODEL_CATALOG),
+    cache_dir: Path = DVF_CACHE_DIR,
+    holdout: str = "test",
+    min_rows: int = MIN_ROWS,
+) -> Dict:
+    """
+    Évalue tous les modèles de `discover` et les classe.
+
+    Args:
+        holdout (str): Ventes évaluées : "test" (part de test) ou "all" (tout le jeu préparé).
+        min_rows (int): Nombre minimal de ventes évaluées pour classer les modèles.
+
+    Returns:
+        Dict: `{"meta": {...}, "leaderboard": [une entrée par modèle, la meilleure en premier]}`.
+        `meta["ranked"]` est faux (et les entrées sans `rank`) s'il y a moins de `min_rows` ventes.
+    """
+    data = load_dataset(prepare_dataset(city, type_local, cache_dir=cache_dir, pieces=pieces).path)
+    X_test, y_test = data["X_test"], data["y_test"]
+    if holdout == "all":
+        X_test, y_test = np.vstack([data["X_train"], X_test]), np.concatenate([data["y_train"], y_test])
+    scaler_X, scaler_y = served_scalers(city, type_local, catalog_file)
+    X_scaled = scaler_X.transform(X_test)
+
+    rng = np.random.default_rng(0)
+    X_batch = X_test[rng.integers(0, len(X_test), batch)]
+    row = X_test[:1]
+
+    entries, evaluated, predictions = [], [], []
+    for entry in discover(mlruns_dir, mlflow_db):
+        entries.append(entry)
+        try:
+            predictions.append(_evaluate(entry, X_scaled, row, X_batch, repeat, scaler_X, scaler_y))
+            evaluated.append(entry)
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+
+    if evaluated:
+        # Une passe pour tous les modèles : matrice (modèles × lignes) des prix en €/m²
+        prices = scaler_y.inverse_transform(np.vstack(predictions).reshape(-1, 1)).reshape(len(evaluated), -1)
+        errors = np.abs(prices - y_test)
+        for entry, mae, mape in zip(evaluated, errors.mean(axis=1), (errors / y_test).mean(axis=1) * 100):
+            entry["mae"], entry["mape"] = float(mae), float(mape)
+
+    ranked = len(y_test) >= min_rows
+    if ranked:
+        evaluated.sort(key=lambda entry: (round(entry["mae"], 2), entry["batch_us_per_row"]))
+        for rank, entry in enumerate(evaluated, 1):
+            entry["rank"] = rank
+    entries = evaluated + [entry for entry in entries if "error" in entry]
+
+    meta = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "ville": city,
+        "type_local": type_local,
+        "pieces": pieces,
+        "holdout": holdout,
+        "rows": len(X_test),
+        "min_rows": min_rows,
+        "ranked": ranked,
+        "batch": batch,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    return {"meta": meta, "leaderboard": entries}
+
+
+def _evaluate(entry: Dict, X_scaled, row, X_batch, repeat: int, scaler_X, scaler_y) -> np.ndarray:
+    """
+    Charge un modèle de `discover`, complète son entrée (chargement, latences) et retourne
+    ses prédictions centrées-réduites sur `X_scaled`.
+    """
+    data_file = entry.pop("data_file")
+    start = time.perf_counter()
+    # Un Booster (xgb.train) est chargé dans un XGBRegressor : même modèle, interface scikit-learn
+    model_class = entry["model_class"].replace("xgboost.core.Booster", "xgboost.sklearn.XGBRegressor")
+    model = instantiate_model(model_class, data_file)
+    entry["load_ms"] = (time.perf_counter() - start) * 1e3
+    entry["size_bytes"] = data_file.stat().st_size
+    entry["sha256"] = file_sha256(data_file)[:12]
+    predictions = np.asarray(model.predict(X_scaled))
+
+    # Latences mesurées sur le chemin servi par l'API (`services._predict_array`)
+    bundle = ModelBundle(model, scaler_X, scaler_y)
+    batch = len(X_batch)
+    entry["single_row_us"] = latency_us(_predict_array, bundle, row, repeat=repeat)
+    entry["batch_us_per_row"] = latency_us(_predict_array, bundle, X_batch, repeat=max(repeat // 10, 3)) / batch
+    compiled = compile_model(model, scaler_X, scaler_y)
+    if compiled is not None:
+        bundle = bundle._replace(compiled=compiled)
+        entry["compiled_single_row_us"] = latency_us(_predict_array, bundle, row, repeat=repeat)
+        entry["compiled_batch_us_per_row"] = (
+            latency_us(_predict_array, bundle, X_batch, repeat=max(repeat // 10, 3)) / batch
+        )
+    return predictions
+
+
+def _print_table(result: Dict):
+    meta = result["meta"]
+    print(f"{meta['rows']} ventes évaluées ({meta['ville']}/{meta['type_local']}, holdout={meta['holdout']}, "
+          f"pieces={meta['pieces'] or 'toutes'})")
+    if not meta["ranked"]:
+        print(f"[WARNING] Fewer than {meta['min_rows']} rows: the errors cannot tell the models apart, "
+              "they are NOT ranked (try --pieces 0 or --holdout all)")
+    print(f"{'#':<3}{'modèle':<36}{'enregistré':<22}{'MAE':>8}{'MAPE %':>8}{'Ko':>6}{'charg. ms':>10}"
+          f"{'1 ligne':>9}{'lot/ligne':>10}{'1 l. comp':>10}{'lot comp':>9}   (µs, médiane)")
+    for entry in result["leaderboard"]:
+        if "error" in entry:
+            print(f"{'-':<3}{entry['model_uri']:<36}{', '.join(entry['registered']) or '-':<22}  {entry['error']}")
+            continue
+        print(f"{entry.get('rank', '-'):<3}{entry['model_uri']:<36}{', '.join(entry['registered']) or '-':<22}"
+              f"{entry['mae']:>8.1f}{entry['mape']:>8.2f}{entry['size_bytes'] / 1024:>6.0f}{entry['load_ms']:>10.2f}"
+              f"{entry['single_row_us']:>9.1f}{entry['batch_us_per_row']:>10.3f}"
+              f"{entry.get('compiled_single_row_us', float('nan')):>10.1f}"
+              f"{entry.get('compiled_batch_us_per_row', float('nan')):>9.3f}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ville", default="lille", help="Ville des données de test et des scalers")
+    parser.add_argument("--type-local", default="appartement", help="Type de logement des données et des scalers")
+    parser.add_argument("--pieces", type=int, default=0, help="Nombre de pièces du jeu préparé (0 : toutes)")
+    parser.add_argument("--holdout", choices=["test", "all"], default="test",
+                        help="Ventes évaluées : part de test, ou tout le jeu (entraînement compris)")
+    parser.add_argument("--min-rows", type=int, default=MIN_ROWS, help="Ventes évaluées nécessaires au classement")
+    parser.add_argument("--batch", type=int, default=1000, help="Taille du lot mesuré")
+    parser.add_argument("--repeat", type=int, default=200, help="Nombre de mesures par cas")
+    parser.add_argument("--mlruns", type=Path, default=MLRUNS_DIR, help="Dossier mlruns/ des modèles")
+    parser.add_argument("--output", type=Path, default=Path("leaderboard.json"), help="Classement écrit (JSON)")
+    args = parser.parse_args(argv)
+
+    result = leaderboard(args.ville, args.type_local, args.batch, args.repeat, args.pieces, args.mlruns,
+                         holdout=args.holdout, min_rows=args.min_rows)
+    _print_table(result)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+    print(f"✅ Leaderboard written to {args.output}", file=sys.stderr)
+    return 0 if result["meta"]["ranked"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,19 @@
+"""
+Mesure de latence commune aux benchmarks.
+"""
+import time
+
+import numpy as np
+
+
+def latency_us(fn, *args, repeat: int) -> float:
+    """
+    Retourne la durée médiane d'un appel `fn(*args)`, en µs, sur `repeat` appels après un préchauffage.
+    """
+    fn(*args)  # préchauffage
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1e6)
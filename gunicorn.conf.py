@@ -0,0 +1,29 @@
+"""
+Configuration gunicorn pour servir l'API avec plusieurs workers uvicorn.
+
+Les métriques Prometheus sont agrégées entre les workers (api/multiprocess_metrics.py) :
+
+    PROMETHEUS_MULTIPROC_DIR=/tmp/prometheus WEB_CONCURRENCY=4 gunicorn api.main:app -c gunicorn.conf.py
+
+Le répertoire des métriques est vidé au lancement, et les fichiers d'un worker sont rangés
+à sa mort, y compris quand il est tué (dépassement de délai, manque de mémoire).
+"""
+import os
+
+from api import multiprocess_metrics
+
+bind = f"{os.getenv('APP_HOST', '0.0.0.0')}:{os.getenv('APP_PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Workers partageant les modèles chargés avant le fork (voir PRELOAD_MODELS dans api/main.py)
+preload_app = os.getenv("PRELOAD_MODELS") == "1"
+
+
+def on_starting(server):
+    if multiprocess_metrics.MULTIPROCESS_DIR:
+        multiprocess_metrics.reset()
+
+
+def child_exit(server, worker):
+    if multiprocess_metrics.MULTIPROCESS_DIR:
+        multiprocess_metrics.archive(worker.pid)
@@ -0,0 +1,93 @@
+"""
+Shared test helpers: an identity scaler, models with a known output and a registry serving them,
+and small pipelines fitted on synthetic sales.
+
+Test modules import the helpers directly (`from conftest import FakeRegistry, cityhouse`).
+"""
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+from api.models import ModelBundle, ModelSet
+from api.schemas import CityHouse
+
+CITIES = ("lille", "bordeaux")
+TYPES_LOCAL = ("appartement", "maison")
+
+
+# ---------------------------
+# Fake models / scalers
+# ---------------------------
+class IdentityScaler:
+    def transform(self, X):
+        return X
+
+    def inverse_transform(self, y):
+        return y
+
+
+class SumModel:
+    """Predicts the sum of the features and records every call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, X):
+        self.calls.append(X.shape)
+        return X.sum(axis=1)
+
+
+class FakeRegistry:
+    """
+    Serves one model per (city, type_local), built by `model(city, type_local)`, with identity scalers.
+    """
+
+    def __init__(self, version="v-test", model=lambda city, type_local: SumModel()):
+        self.version = version
+        self.models = {(city, type_local): model(city, type_local) for city in CITIES for type_local in TYPES_LOCAL}
+
+    def load(self):
+        return self
+
+    def preload(self):
+        return self
+
+    def current(self):
+        bundles = {key: ModelBundle(model, IdentityScaler(), IdentityScaler()) for key, model in self.models.items()}
+        return ModelSet(self.version, bundles)
+
+
+def cityhouse(ville, type_local, surface):
+    return CityHouse(
+        ville=ville,
+        features={
+            "surface_bati": surface,
+            "nombre_pieces": 1,
+            "type_local": type_local,
+            "surface_terrain": 0,
+            "nombre_lots": 0,
+        },
+    )
+
+
+# ---------------------------
+# Small fitted pipelines
+# ---------------------------
+def training_data(seed=0, n=400):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(20, 200, n),   # surface bâtie
+        rng.integers(1, 8, n),      # pièces
+        rng.integers(0, 600, n),    # terrain
+        rng.integers(0, 3, n),      # lots
+    ]).astype(float)
+    y = 2000 + 15 * X[:, 0] - 80 * X[:, 1] + 2 * X[:, 2] + rng.normal(0, 100, n)
+    return X, y
+
+
+def fitted(model, **fit_kwargs):
+    """Fits `model` on scaled synthetic sales and returns (model, scaler_X, scaler_y)."""
+    X, y = training_data()
+    scaler_X = StandardScaler().fit(X)
+    scaler_y = StandardScaler().fit(y.reshape(-1, 1))
+    model.fit(scaler_X.transform(X), scaler_y.transform(y.reshape(-1, 1)).ravel(), **fit_kwargs)
+    return model, scaler_X, scaler_y
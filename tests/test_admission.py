@@ -0,0 +1,134 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import security
+from api.admission import AdmissionController, Overloaded, TokenBuckets, batch_cost
+from api.routes import router, authenticate
+
+PREDICTION = {"prix_m2_estime": 3500.5, "ville_modele": "Bordeaux", "model": "SumModel", "version_modele": "v1"}
+HOUSE = {"surface_bati": 80, "nombre_pieces": 4, "type_local": "maison", "surface_terrain": 150, "nombre_lots": 1}
+
+
+# ---------------------------
+# App with admission control
+# ---------------------------
+@pytest.fixture
+def app():
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[authenticate] = lambda: "mock_user"
+    with patch("api.routes.make_prediction", new_callable=AsyncMock, return_value=PREDICTION), \
+            patch.dict(security.user_db, {"alice": "secret"}):
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return TestClient(app)
+
+
+# ============================================================
+#                      TESTS
+# ============================================================
+
+# ---------------------------
+#        Token buckets
+# ---------------------------
+def test_bucket_allows_a_burst_then_refills():
+    buckets = TokenBuckets(rate=2, burst=3)
+    assert [buckets.take("alice", now=0) for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("alice", now=0) == pytest.approx(0.5)
+    assert buckets.take("bob", now=0) == 0  # one bucket per user
+
+    assert buckets.take("alice", now=0.5) == 0
+    assert buckets.take("alice", now=0.5) > 0
+
+
+def test_bucket_cost_is_capped_at_burst_and_users_are_bounded():
+    buckets = TokenBuckets(rate=1, burst=5, max_users=2)
+    assert buckets.take("alice", cost=50, now=0) == 0
+    for user in ("bob", "carol"):
+        buckets.take(user, now=0)
+    assert list(buckets._buckets) == ["bob", "carol"]
+    assert batch_cost(1) == 1 and batch_cost(250) == 3
+
+
+# ---------------------------
+#    Concurrency limiter
+# ---------------------------
+def test_waiters_get_the_released_slot_in_order_and_full_queue_is_rejected():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=1, latency_budget_ms=1000)
+        await controller.acquire()
+
+        waiter = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        assert controller.waiting == 1
+
+        with pytest.raises(Overloaded) as rejected:
+            await controller.acquire()
+        assert rejected.value.reason == "queue_full"
+
+        controller.release(0.01)
+        await waiter
+        assert controller.in_flight == 1 and controller.waiting == 0
+
+        controller.release(0.01)
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_requests_that_would_exceed_the_budget_are_rejected():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=10, latency_budget_ms=20)
+        await controller.acquire()
+
+        with pytest.raises(Overloaded) as rejected:
+            await controller.acquire()
+        assert rejected.value.reason == "timeout"
+        assert controller.waiting == 0
+
+        controller.service_time = 1.0  # one slot busy for about a second
+        with pytest.raises(Overloaded) as rejected:
+            await controller.acquire()
+        assert rejected.value.reason == "latency_budget"
+
+        controller.release()
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+# ---------------------------
+#           Routes
+# ---------------------------
+def test_rate_limit_is_per_user(app, client):
+    app.state.rate_limiter = TokenBuckets(rate=0.001, burst=2)
+
+    for _ in range(2):
+        assert client.post("/predict/bordeaux", json=HOUSE).status_code == 200
+    response = client.post("/predict/bordeaux", json=HOUSE)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+    # Authenticated callers have their own bucket, even on public routes
+    assert client.post("/predict/bordeaux", json=HOUSE, auth=("alice", "secret")).status_code == 200
+    assert client.post("/predict/lille", json=HOUSE).status_code == 200  # "mock_user"
+
+
+def test_saturated_service_answers_503_without_queueing(app, client):
+    app.state.admission = AdmissionController(max_concurrency=1, max_queue=0)
+    app.state.admission.in_flight = 1
+
+    response = client.post("/predict", json={"ville": "lille", "features": HOUSE})
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+    app.state.admission.release()
+    assert client.post("/predict", json={"ville": "lille", "features": HOUSE}).status_code == 200
+    assert app.state.admission.in_flight == 0
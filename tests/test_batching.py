@@ -0,0 +1,99 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from api.batching import MicroBatcher
+
+
+class RecordingPredictor:
+    """Returns the row sums and records the shape of every call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, key, matrix):
+        self.calls.append((key, matrix.shape))
+        return matrix.sum(axis=1).tolist()
+
+
+def test_concurrent_requests_are_merged_per_key():
+    predictor = RecordingPredictor()
+
+    async def scenario():
+        batcher = MicroBatcher(predictor, max_batch_size=64, max_wait_ms=5)
+        results = await asyncio.gather(
+            batcher.submit(("lille", "maison"), [1, 1, 0, 0]),
+            batcher.submit(("lille", "maison"), [2, 2, 0, 0]),
+            batcher.submit(("bordeaux", "appartement"), [3, 0, 0, 0]),
+            batcher.submit(("lille", "maison"), [4, 0, 0, 1]),
+        )
+        await batcher.close()
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert results == [2, 4, 3, 5]
+    assert sorted(predictor.calls) == [
+        (("bordeaux", "appartement"), (1, 4)),
+        (("lille", "maison"), (3, 4)),
+    ]
+
+
+def test_full_batch_is_flushed_without_waiting():
+    predictor = RecordingPredictor()
+
+    async def scenario():
+        # A huge max wait: only the size limit can trigger the flush
+        batcher = MicroBatcher(predictor, max_batch_size=2, max_wait_ms=60_000)
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                batcher.submit("k", [1, 0, 0, 0]),
+                batcher.submit("k", [2, 0, 0, 0]),
+            ),
+            timeout=1,
+        )
+        await batcher.close()
+        return results
+
+    assert asyncio.run(scenario()) == [1, 2]
+    assert predictor.calls == [("k", (2, 4))]
+
+
+def test_errors_are_propagated_to_every_request():
+    def failing(key, matrix):
+        raise ValueError("boom")
+
+    async def scenario():
+        batcher = MicroBatcher(failing, max_batch_size=8, max_wait_ms=1)
+        return await asyncio.gather(
+            batcher.submit("k", np.zeros(4).tolist()),
+            batcher.submit("k", np.ones(4).tolist()),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_predict_fn_is_called_in_a_worker_thread():
+    import threading
+
+    main_thread = threading.get_ident()
+    seen = []
+
+    def predictor(key, matrix):
+        seen.append(threading.get_ident())
+        return [0.0] * len(matrix)
+
+    async def scenario():
+        batcher = MicroBatcher(predictor, max_batch_size=1, max_wait_ms=0)
+        await batcher.submit("k", [0, 0, 0, 0])
+
+    asyncio.run(scenario())
+    assert seen and seen[0] != main_thread
+
+
+@pytest.mark.parametrize("max_batch_size", [0, -3])
+def test_batch_size_is_at_least_one(max_batch_size):
+    assert MicroBatcher(lambda k, m: [], max_batch_size=max_batch_size).max_batch_size == 1
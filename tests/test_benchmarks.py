@@ -0,0 +1,130 @@
+import json
+import warnings
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks import bench_api, bench_leaderboard
+
+
+class FiveFeaturesModel:
+    def predict(self, X):
+        raise ValueError(f"Feature shape mismatch, expected: 5, got {X.shape[1]}")
+
+
+def result(**stats):
+    return {"meta": {}, "results": {name: values for name, values in stats.items()}}
+
+
+# ============================================================
+#                      TESTS
+# ============================================================
+
+def test_latency_stats():
+    stats = bench_api.latency_stats([0.001] * 98 + [0.010, 0.020], elapsed=0.5)
+    assert stats["p50_ms"] == pytest.approx(1.0)
+    assert stats["p99_ms"] > stats["p95_ms"]
+    assert stats["rps"] == 200
+    assert stats["count"] == 100
+
+
+def test_compare_flags_slower_latencies_and_lower_throughput():
+    baseline = result(
+        a={"p50_ms": 10.0, "p95_ms": 20.0, "rps": 100.0},
+        b={"p50_ms": 10.0, "p95_ms": 20.0, "rps": 100.0},
+        gone={"p50_ms": 1.0},
+    )
+    current = result(
+        a={"p50_ms": 12.0, "p95_ms": 26.0, "rps": 95.0},
+        b={"p50_ms": 5.0, "p95_ms": 20.0, "rps": 70.0},
+        new={"p50_ms": 100.0},
+    )
+
+    regressions = bench_api.compare(baseline, current, threshold=0.25)
+    assert [line.split(":")[0] for line in regressions] == ["a p95_ms", "b rps"]
+    assert bench_api.compare(baseline, current, threshold=0.5) == []
+    assert len(bench_api.compare(baseline, current, threshold=0.1, metrics=["p50_ms"])) == 1
+
+
+def test_compare_ignores_percentiles_of_small_samples():
+    baseline = result(a={"p50_ms": 10.0, "p95_ms": 20.0, "rps": 100.0, "count": 5})
+    current = result(a={"p50_ms": 30.0, "p95_ms": 60.0, "rps": 100.0, "count": 5})
+
+    assert bench_api.compare(baseline, current, threshold=0.25) == []
+    assert len(bench_api.compare(baseline, current, threshold=0.25, min_count=5)) == 2
+
+    baseline["meta"]["min_percentile_count"] = 5
+    assert len(bench_api.compare(baseline, current, threshold=0.25)) == 2
+    current["results"]["a"]["rps"] = 50.0
+    assert bench_api.compare(baseline, current, threshold=0.25, min_count=100) == ["a rps: 100.0 → 50.0 (+100 %)"]
+
+
+def test_suite_runs_the_app_and_compares_with_its_baseline(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    argv = ["--concurrency", "1,2", "--requests", "4", "--repeat", "10"]
+
+    assert bench_api.main(argv + ["--save", str(baseline)]) == 0
+    results = json.loads(baseline.read_text())["results"]
+    assert results["route POST /predict c=2"]["count"] == 4
+    assert results["route POST /predict/batch c=2"]["count"] == 2
+    assert {"function _predict", "function model loading", "function monitoring batch n=500"} <= set(results)
+    assert {"codec decode House standard", "codec decode House codec"} <= set(results)
+
+    # The committed baseline, compared by default, covers every measurement of the suite
+    committed = json.loads(bench_api.BASELINE_FILE.read_text())
+    assert {"python", "platform", "cpus", "concurrency", "min_percentile_count"} <= set(committed["meta"])
+    assert {name for name in results if not name.startswith("route ")} <= set(committed["results"])
+    assert {name.rsplit(" c=", 1)[0] for name in results} == {name.rsplit(" c=", 1)[0] for name in committed["results"]}
+
+    assert bench_api.main(argv + ["--compare", str(baseline), "--threshold", "1000"]) == 0
+
+    results["function _predict"]["rps"] = 1e12
+    baseline.write_text(json.dumps({"meta": {}, "results": results}))
+    assert bench_api.main(argv + ["--compare", str(baseline)]) == 1
+
+
+def test_leaderboard_ranks_every_logged_xgboost_model(tmp_path, capsys):
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        result = bench_leaderboard.leaderboard(batch=50, repeat=3, cache_dir=tmp_path)
+    entries = result["leaderboard"]
+
+    assert not [w for w in caught if "feature names" in str(w.message)]
+    assert result["meta"]["rows"] >= bench_leaderboard.MIN_ROWS and result["meta"]["ranked"]
+    assert [entry["rank"] for entry in entries] == list(range(1, len(entries) + 1))
+    assert [round(entry["mae"], 2) for entry in entries] == sorted(round(entry["mae"], 2) for entry in entries)
+    served = next(entry for entry in entries if entry["model_uri"] == "models:/m-f9bb8a6503f845eb9634c0db839773ad")
+    assert served["registered"] == ["XGBRegressorModel/3"]
+    assert {"load_ms", "size_bytes", "mape", "single_row_us", "compiled_batch_us_per_row"} <= set(served)
+    # Identical artifacts give identical errors
+    for entry in entries:
+        if entry["sha256"] == served["sha256"]:
+            assert entry["mae"] == served["mae"]
+
+    bench_leaderboard._print_table(result)
+    out = capsys.readouterr().out
+    assert "XGBRegressorModel/3" in out
+    assert f"{result['meta']['rows']} ventes évaluées" in out
+
+
+def test_leaderboard_refuses_to_rank_too_few_rows_and_keeps_failing_models(tmp_path, capsys):
+    instantiate_model = bench_leaderboard.instantiate_model
+    broken = "models:/m-f9bb8a6503f845eb9634c0db839773ad"
+
+    def load(model_class, data_file):
+        if broken[len("models:/"):] in str(data_file):
+            return FiveFeaturesModel()
+        return instantiate_model(model_class, data_file)
+
+    with patch.object(bench_leaderboard, "instantiate_model", side_effect=load):
+        result = bench_leaderboard.leaderboard(batch=50, repeat=3, pieces=4, cache_dir=tmp_path)
+
+    assert result["meta"]["rows"] < bench_leaderboard.MIN_ROWS and not result["meta"]["ranked"]
+    assert all("rank" not in entry for entry in result["leaderboard"])
+    failed = [entry for entry in result["leaderboard"] if "error" in entry]
+    assert [entry["model_uri"] for entry in failed] == [broken]
+    assert "Feature shape mismatch" in failed[0]["error"] and "mae" not in failed[0]
+    assert all("mae" in entry for entry in result["leaderboard"] if "error" not in entry)
+
+    bench_leaderboard._print_table(result)
+    assert "NOT ranked" in capsys.readouterr().out
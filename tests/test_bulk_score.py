@@ -0,0 +1,122 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api import bulk_score
+from api.schemas import CityHouse
+from api.services import _predict_batch
+from conftest import FakeRegistry
+
+
+# ---------------------------
+# Fake registry
+# ---------------------------
+class WeightedModel:
+    def __init__(self, weight):
+        self.weight = weight
+
+    def predict(self, X):
+        return X @ np.array([10.0, -3.0, 0.5, 1.0]) * self.weight
+
+
+WEIGHTS = {
+    ("lille", "appartement"): 1, ("lille", "maison"): 2, ("bordeaux", "appartement"): 3, ("bordeaux", "maison"): 4,
+}
+
+
+def weighted_registry():
+    return FakeRegistry("v-bulk", model=lambda city, type_local: WeightedModel(WEIGHTS[(city, type_local)]))
+
+
+@pytest.fixture(autouse=True)
+def fake_registry():
+    with patch.object(bulk_score, "registry", weighted_registry()):
+        yield
+
+
+def houses(n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "ville": rng.choice(["lille", "Bordeaux"], n),
+        "surface_bati": rng.integers(20, 200, n).astype(float),
+        "nombre_pieces": rng.integers(1, 7, n),
+        "type_local": rng.choice(["appartement", "Maison"], n),
+        "surface_terrain": rng.integers(0, 500, n).astype(float),
+        "nombre_lots": rng.integers(0, 3, n),
+    })
+
+
+# ============================================================
+#                      TESTS
+# ============================================================
+
+def test_scores_match_the_api_pipeline():
+    frame = houses()
+    scored = bulk_score.score_chunk(frame)
+
+    cityhouses = [
+        CityHouse(ville=row.ville.lower(), features={k: getattr(row, k) for k in bulk_score.FEATURES + ["type_local"]})
+        for row in frame.itertuples()
+    ]
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(registry=weighted_registry())))
+    predictions, _ = _predict_batch(cityhouses, request)
+
+    assert scored["prix_m2_estime"].tolist() == [p.prix_m2_estime for p in predictions]
+    assert scored["ville_modele"].tolist() == [p.ville_modele for p in predictions]
+    assert scored["model"].tolist() == [p.model for p in predictions]
+    assert (scored["version_modele"] == "v-bulk").all()
+    assert (scored["erreur"] == "").all()
+
+
+def test_rows_the_api_would_reject_are_flagged():
+    frame = houses(5)
+    frame.loc[0, "ville"] = "paris"
+    frame.loc[1, "type_local"] = "dépendance"
+    frame.loc[2, "surface_terrain"] = np.nan
+    frame["nombre_pieces"] = frame["nombre_pieces"].astype(float)
+    frame.loc[3, "nombre_pieces"] = 2.5
+
+    scored = bulk_score.score_chunk(frame)
+    assert scored["erreur"].tolist() == [
+        "ville non prise en charge", "type de logement non supporté", "valeur manquante", "nombre non entier", "",
+    ]
+    assert scored["prix_m2_estime"].isna().tolist() == [True, True, True, True, False]
+
+
+def test_city_option_applies_to_every_row():
+    frame = houses(4).drop(columns=["ville"])
+    scored = bulk_score.score_chunk(frame, ville="bordeaux")
+    assert (scored["ville_modele"] == "Bordeaux").all()
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_bulk_score_writes_chunks_in_order(tmp_path, workers):
+    frame = houses(230)
+    frame.to_csv(tmp_path / "in.csv", index=False)
+
+    rows = bulk_score.bulk_score(tmp_path / "in.csv", tmp_path / "out.csv", workers=workers, chunk_rows=40)
+
+    out = pd.read_csv(tmp_path / "out.csv", keep_default_na=False)
+    assert rows == len(out) == 230
+    assert out["surface_bati"].tolist() == frame["surface_bati"].tolist()
+    np.testing.assert_array_equal(out["prix_m2_estime"], bulk_score.score_chunk(frame)["prix_m2_estime"])
+
+
+def test_dvf_exports_take_the_city_from_the_commune(tmp_path):
+    header = ("Date mutation|Nature mutation|Valeur fonciere|Code postal|Commune|Code departement|Code commune|"
+              "Section|Surface Carrez du 1er lot|Nombre de lots|Type local|Surface reelle bati|"
+              "Nombre pieces principales|Surface terrain")
+    lines = [
+        "05/01/2024|Vente|232000,00|59260|LILLE|59|350|AD||0|Maison|95|5|101",
+        "05/01/2024|Vente|90000,00|59000|LILLE|59|350|OT||1|Dépendance|0|0|",
+        "06/01/2024|Vente|300000,00|33000|BORDEAUX|33|63|AB||1|Appartement|60|3|0",
+    ]
+    (tmp_path / "dvf.txt").write_text("\n".join([header] + lines) + "\n", encoding="utf-8")
+
+    chunk = next(bulk_score.read_chunks(tmp_path / "dvf.txt"))
+    scored = bulk_score.score_chunk(chunk)
+    assert scored["ville_modele"].tolist() == ["Lille", "Bordeaux"]
+    assert scored["prix_m2"].tolist() == [232000 / 95, 5000.0]
@@ -0,0 +1,75 @@
+from unittest.mock import patch
+
+from api.cache import PredictionCache, prediction_key
+from api.schemas import House
+
+
+def house(**overrides):
+    features = {
+        "surface_bati": 80,
+        "nombre_pieces": 4,
+        "type_local": "Maison",
+        "surface_terrain": 150,
+        "nombre_lots": 1,
+    }
+    features.update(overrides)
+    return House(**features)
+
+
+def test_key_is_canonical():
+    assert prediction_key("lille", house(), "v1") == prediction_key("lille", house(surface_bati=80.0), "v1")
+    assert prediction_key("lille", house(), "v1") != prediction_key("lille", house(), "v2")
+    assert prediction_key("lille", house(), "v1")[1] == "maison"
+
+
+def test_hit_and_miss():
+    cache = PredictionCache(max_entries=10, ttl=60)
+    key = prediction_key("lille", house(), "v1")
+
+    assert cache.get(key) is None
+    cache.put(key, "prediction")
+    assert cache.get(key) == "prediction"
+
+
+def test_lru_eviction():
+    cache = PredictionCache(max_entries=2, ttl=60)
+    keys = [prediction_key("lille", house(surface_bati=s), "v1") for s in (10, 20, 30)]
+
+    cache.get(keys[0])
+    cache.put(keys[0], 0)
+    cache.put(keys[1], 1)
+    cache.get(keys[0])  # keys[0] becomes the most recently used
+    cache.put(keys[2], 2)
+
+    assert len(cache) == 2
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == 0
+    assert cache.get(keys[2]) == 2
+
+
+def test_ttl_expiry():
+    cache = PredictionCache(max_entries=10, ttl=5)
+    key = prediction_key("lille", house(), "v1")
+
+    with patch("api.cache.time.monotonic", return_value=100.0):
+        cache.get(key)
+        cache.put(key, "prediction")
+    with patch("api.cache.time.monotonic", return_value=104.0):
+        assert cache.get(key) == "prediction"
+    with patch("api.cache.time.monotonic", return_value=106.0):
+        assert cache.get(key) is None
+
+
+def test_new_model_version_invalidates_everything():
+    cache = PredictionCache(max_entries=10, ttl=60)
+    old_key = prediction_key("lille", house(), "v1")
+    cache.get(old_key)
+    cache.put(old_key, "old")
+
+    new_key = prediction_key("lille", house(), "v2")
+    assert cache.get(new_key) is None
+    assert len(cache) == 0
+
+    # A request that started on v1 finishes after the swap: its result is not kept
+    cache.put(old_key, "late")
+    assert len(cache) == 0
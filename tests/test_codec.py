@@ -0,0 +1,110 @@
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from api import codec
+from api.routes import router, authenticate
+from api.schemas import Prediction
+
+PREDICTION = Prediction(prix_m2_estime=3500.5, ville_modele="Lille", model="SumModel", version_modele="v1")
+HOUSE = {"surface_bati": 80, "nombre_pieces": 4, "type_local": "maison", "surface_terrain": 150, "nombre_lots": 1}
+
+
+# ---------------------------
+# Same routes, with and without the codec
+# ---------------------------
+def plain_router():
+    plain = APIRouter()
+    for route in router.routes:
+        plain.add_api_route(
+            route.path, route.endpoint, methods=list(route.methods), response_model=route.response_model,
+            summary=route.summary, name=route.name, include_in_schema=route.include_in_schema,
+            response_class=route.response_class, openapi_extra=route.openapi_extra,
+        )
+    return plain
+
+
+def build_app(api_router):
+    app = FastAPI()
+    app.include_router(api_router)
+    app.dependency_overrides[authenticate] = lambda: "mock_user"
+    return app
+
+
+@pytest.fixture
+def services():
+    with patch("api.routes.make_prediction", new_callable=AsyncMock, return_value=PREDICTION) as single, \
+            patch("api.routes.make_batch_prediction", new_callable=AsyncMock, return_value=[PREDICTION] * 2) as batch:
+        yield single, batch
+
+
+@pytest.fixture
+def fast_client(services):
+    return TestClient(build_app(router))
+
+
+@pytest.fixture
+def plain_client(services):
+    client = TestClient(build_app(plain_router()))
+    with patch.object(codec, "FAST_CODEC", False):
+        yield client
+
+
+BODIES = [
+    ("/predict/lille", HOUSE),
+    ("/predict/lille", {**HOUSE, "type_local": "MAISON", "surface_bati": "80.5", "nombre_pieces": 4.0}),
+    ("/predict/lille", {**HOUSE, "type_local": "chateau"}),
+    ("/predict/lille", {**HOUSE, "nombre_pieces": 4.5}),
+    ("/predict/bordeaux", {key: value for key, value in HOUSE.items() if key != "nombre_lots"}),
+    ("/predict", {"ville": " Lille ", "features": HOUSE}),
+    ("/predict", {"ville": 59, "features": HOUSE}),
+    ("/predict/batch", [{"ville": "lille", "features": HOUSE}, {"ville": "bordeaux", "features": HOUSE}]),
+    ("/predict/batch", [{"ville": "lille", "features": HOUSE}, {"ville": "bordeaux"}]),
+]
+RAW_BODIES = [
+    ("/predict/lille", b'{"surface_bati": 80,', "application/json"),
+    ("/predict/lille", json.dumps(HOUSE).encode(), "text/plain"),
+    ("/predict/lille", b"", "application/json"),
+]
+
+
+# ============================================================
+#                      TESTS
+# ============================================================
+
+@pytest.mark.parametrize("path, body", BODIES)
+def test_responses_and_errors_match_the_standard_path(fast_client, plain_client, services, path, body):
+    fast = fast_client.post(path, json=body)
+    fast_calls = [mock.call_args and mock.call_args.args[:-1] for mock in services]
+    plain = plain_client.post(path, json=body)
+
+    assert (fast.status_code, fast.json()) == (plain.status_code, plain.json())
+    assert fast.headers["content-type"] == plain.headers["content-type"]
+    # The services receive the same validated models
+    assert fast_calls == [mock.call_args and mock.call_args.args[:-1] for mock in services]
+
+
+@pytest.mark.parametrize("path, body, content_type", RAW_BODIES)
+def test_malformed_bodies_get_the_standard_errors(fast_client, plain_client, path, body, content_type):
+    fast = fast_client.post(path, content=body, headers={"content-type": content_type})
+    plain = plain_client.post(path, content=body, headers={"content-type": content_type})
+    assert fast.status_code == 422
+    assert fast.json() == plain.json()
+
+
+def test_valid_bodies_skip_the_generic_json_decoding(fast_client, services):
+    with patch("starlette.requests.json.loads", side_effect=AssertionError("decoded twice")):
+        assert fast_client.post("/predict/lille", json={**HOUSE, "type_local": "Maison"}).status_code == 200
+    assert services[0].call_args.args[0].type_local == "maison"
+
+
+def test_openapi_schema_is_unchanged():
+    assert build_app(router).openapi() == build_app(plain_router()).openapi()
+
+
+def test_encode_matches_the_standard_serialization():
+    encoded = json.loads(codec.encode([PREDICTION, {"prix_m2_estime": PREDICTION.prix_m2_estime}]))
+    assert encoded == [PREDICTION.model_dump(), {"prix_m2_estime": 3500.5}]
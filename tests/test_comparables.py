@@ -0,0 +1,199 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import comparables, routes_comparables
+from api.comparables import ComparablesIndex, ComparablesRegistry, build
+from api.routes_comparables import router_comparables
+
+HEADER = [
+    "Date mutation", "Nature mutation", "Valeur fonciere", "Code postal", "Commune", "Code departement",
+    "Code commune", "Section", "Surface Carrez du 1er lot", "Nombre de lots", "Type local", "Surface reelle bati",
+    "Nombre pieces principales", "Surface terrain",
+]
+
+
+def sale(day, valeur, code_postal, section, type_local, surface, pieces, terrain="", lots="1"):
+    return [f"{day:02d}/03/2024", "Vente", str(valeur), str(code_postal), "LILLE", "59", "350",
+            section, "", lots, type_local, str(surface), str(pieces), terrain]
+
+
+ROWS = [
+    sale(1, 150000, 59000, "AB", "Appartement", 40, 2),
+    sale(2, 160000, 59000, "AB", "Appartement", 42, 2),
+    sale(3, 240000, 59000, "CD", "Appartement", 60, 3),
+    sale(4, 250000, 59800, "EF", "Appartement", 62, 3),
+    sale(5, 400000, 59800, "EF", "Appartement", 95, 4),
+    sale(5, 400000, 59800, "EF", "Appartement", 95, 4),  # duplicated line of the export
+    sale(6, 9000000, 59800, "EF", "Appartement", 61, 3),  # multi-lot sale: aberrant price per m²
+    sale(7, 300000, 59000, "AB", "Maison", 90, 4, terrain="150", lots="0"),
+    sale(8, 330000, 59800, "GH", "Maison", 100, 5, terrain="200", lots="0"),
+    sale(9, 390000, 59800, "GH", "Maison", 120, 5, terrain="400", lots="0"),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "lille_2024.csv"
+    path.write_text("\n".join(",".join(row) for row in [HEADER] + ROWS) + "\n", encoding="utf-8")
+    return build("lille", path, tmp_path / "cache")
+
+
+def house(surface, pieces, terrain=np.nan, lots=1):
+    return np.array([[surface, pieces, terrain, lots]], dtype=np.float64)
+
+
+# ============================================================
+#                      INDEX
+# ============================================================
+
+def test_nearest_sales_are_returned_closest_first(index):
+    found = index.query("appartement", house(40.5, 2), k=3)[0]
+
+    assert [c["surface_bati"] for c in found[:2]] == [40, 42]
+    assert found[2]["surface_bati"] == 60
+    assert [c["distance"] for c in found] == sorted(c["distance"] for c in found)
+    assert found[0] == {
+        "date_mutation": "2024-03-01", "valeur_fonciere": 150000.0, "prix_m2": 3750.0, "surface_bati": 40.0,
+        "nombre_pieces": 2, "surface_terrain": None, "nombre_lots": 1, "type_local": "appartement",
+        "code_postal": 59000, "section": "AB", "distance": found[0]["distance"],
+    }
+
+
+def test_exact_match_has_zero_distance(index):
+    found = index.query("maison", house(100, 5, terrain=200, lots=0), k=1)[0]
+
+    assert found[0]["date_mutation"] == "2024-03-08"
+    assert found[0]["distance"] == 0
+
+
+def test_duplicates_and_aberrant_prices_are_not_indexed(index):
+    assert len(index.partitions["appartement"]) == 5
+    found = index.query("appartement", house(95, 4), k=5)[0]
+    assert [c["valeur_fonciere"] for c in found].count(400000) == 1
+    assert 9000000 not in [c["valeur_fonciere"] for c in found]
+
+
+def test_comparables_have_the_same_type_local(index):
+    found = index.query("maison", house(40, 2), k=10)[0]
+
+    assert len(found) == 3
+    assert {c["type_local"] for c in found} == {"maison"}
+
+
+def test_search_can_be_restricted_to_a_postcode_and_section(index):
+    by_postcode = index.query("appartement", house(40.5, 2), k=10, code_postal=59800)[0]
+    assert {c["code_postal"] for c in by_postcode} == {59800}
+    assert len(by_postcode) == 2
+
+    by_section = index.query("appartement", house(60, 3), k=10, code_postal=59000, section=" ab")[0]
+    assert [c["surface_bati"] for c in by_section] == [42, 40]
+
+    assert index.query("appartement", house(60, 3), k=3, section="ZZ") == [[]]
+    assert index.query("appartement", house(60, 3), k=3, code_postal=59000, section="EF") == [[]]
+
+
+def test_restricted_searches_keep_a_bounded_cache_of_known_values(index, monkeypatch):
+    monkeypatch.setattr(comparables, "COMPARABLES_SUBSETS", 2)
+    partition = index.partitions["appartement"]
+
+    for code_postal in range(10000, 10100):  # made-up postcodes: nothing built nor kept
+        assert index.query("appartement", house(60, 3), k=3, code_postal=code_postal) == [[]]
+    assert len(partition._subsets) == 0
+
+    for code_postal, section in ((59000, None), (59800, None), (59000, "AB"), (59800, None)):
+        assert index.query("appartement", house(60, 3), k=3, code_postal=code_postal, section=section) != [[]]
+    assert len(partition._subsets) == 2
+    assert list(partition._subsets) == [(("code_postal", 59000), ("section", 0)), (("code_postal", 59800),)]
+
+
+def test_batch_query_matches_single_queries(index):
+    batch = np.vstack([house(40.5, 2), house(90, 4), house(61, 3)])
+
+    found = index.query("appartement", batch, k=2, code_postal=59000)
+
+    assert found == [index.query("appartement", row[None, :], k=2, code_postal=59000)[0] for row in batch]
+
+
+def test_index_is_saved_next_to_the_ingestion_cache(index, tmp_path):
+    path = tmp_path / "lille_2024.csv"
+    with patch.object(ComparablesIndex, "from_table", side_effect=AssertionError("rebuilt")):
+        cached = build("lille", path, tmp_path / "cache")
+
+    assert cached.query("appartement", house(40.5, 2), k=3, section="AB") == \
+        index.query("appartement", house(40.5, 2), k=3, section="AB")
+
+
+def test_registry_skips_cities_without_sales(index, tmp_path, monkeypatch):
+    monkeypatch.setattr(comparables, "COMPARABLES_SOURCE", str(tmp_path / "{city}_2024.csv"))
+    monkeypatch.setattr(comparables, "build", lambda city: index)
+
+    registry = ComparablesRegistry().preload(["lille", "bordeaux"])
+
+    assert registry.loaded("lille") is index
+    assert registry.loaded("bordeaux") is None
+
+
+# ============================================================
+#                      ROUTES
+# ============================================================
+
+@pytest.fixture
+def client(index, tmp_path, monkeypatch):
+    monkeypatch.setattr(comparables, "COMPARABLES_SOURCE", str(tmp_path / "{city}_2024.csv"))
+    monkeypatch.setattr(comparables, "build", lambda city: index if city == "lille" else build(city))
+    monkeypatch.setattr(routes_comparables, "comparables_registry", ComparablesRegistry())
+
+    app = FastAPI()
+    app.include_router(router_comparables)
+    app.state.registry = SimpleNamespace(current=lambda: SimpleNamespace(cities={"lille", "bordeaux"}))
+    return TestClient(app)
+
+
+def payload(surface=40.5, pieces=2, type_local="appartement", **extra):
+    features = {
+        "surface_bati": surface, "nombre_pieces": pieces, "type_local": type_local,
+        "surface_terrain": 0, "nombre_lots": 1,
+    }
+    return {"ville": "Lille", "features": features, **extra}
+
+
+def test_comparables_route(client, index):
+    response = client.post("/comparables", json=payload(k=2, section="AB"))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ville"] == "lille"
+    assert [c["surface_bati"] for c in body["comparables"]] == [40, 42]
+
+
+def test_comparables_batch_route_keeps_the_request_order(client):
+    queries = [payload(95, 4, k=1), payload(90, 4, "maison", k=2), payload(40.5, 2, k=3), payload(95, 4, k=3)]
+
+    response = client.post("/comparables/batch", json=queries)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [len(item["comparables"]) for item in body] == [1, 2, 3, 3]
+    assert body[0]["comparables"] == body[3]["comparables"][:1]
+    assert body[1]["comparables"][0]["type_local"] == "maison"
+    assert body[2]["comparables"][0]["surface_bati"] == 40
+
+
+def test_restricted_search_runs_in_a_thread(client):
+    with patch.object(routes_comparables.asyncio, "to_thread", wraps=routes_comparables.asyncio.to_thread) as to_thread:
+        assert client.post("/comparables", json=payload(k=2)).status_code == 200
+        assert not any(call.args[0] is routes_comparables._search for call in to_thread.call_args_list)
+
+        assert client.post("/comparables", json=payload(k=2, code_postal=59000)).status_code == 200
+        assert to_thread.call_args.args[0] is routes_comparables._search
+
+
+def test_comparables_route_errors(client):
+    assert client.post("/comparables", json={**payload(), "ville": "paris"}).status_code == 400
+    assert client.post("/comparables", json={**payload(), "ville": "bordeaux"}).status_code == 404
+    assert client.post("/comparables", json=payload(k=0)).status_code == 422
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+import xgboost
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeRegressor
+
+from api.compiled import CompiledLinear, CompiledTrees, compile_model, maybe_compile
+from conftest import fitted, training_data
+
+
+# ---------------------------
+# Reference pipeline
+# ---------------------------
+def reference(model, scaler_X, scaler_y, X):
+    return scaler_y.inverse_transform(np.asarray(model.predict(scaler_X.transform(X))).reshape(-1, 1))[:, 0]
+
+
+# ============================================================
+#                      TESTS
+# ============================================================
+
+def test_compiled_trees_match_pipeline_on_integer_features():
+    model, scaler_X, scaler_y = fitted(xgboost.XGBRegressor(n_estimators=40, max_depth=4))
+    compiled = compile_model(model, scaler_X, scaler_y)
+    assert isinstance(compiled, CompiledTrees)
+
+    # Integer inputs hit split values exactly: branching must match XGBoost's float32 test
+    X, _ = training_data(seed=1, n=3000)
+    np.testing.assert_allclose(compiled.predict(X), reference(model, scaler_X, scaler_y, X), rtol=1e-5)
+
+
+def test_compiled_trees_use_best_iteration():
+    X, y = training_data(seed=2)
+    scaler_X = StandardScaler().fit(X)
+    scaler_y = StandardScaler().fit(y.reshape(-1, 1))
+    Xs, ys = scaler_X.transform(X), scaler_y.transform(y.reshape(-1, 1)).ravel()
+    model = xgboost.XGBRegressor(n_estimators=300, learning_rate=0.5, early_stopping_rounds=3)
+    model.fit(Xs[:300], ys[:300], eval_set=[(Xs[300:], ys[300:])], verbose=False)
+    assert model.best_iteration < model.get_booster().num_boosted_rounds() - 1
+
+    compiled = compile_model(model, scaler_X, scaler_y)
+    np.testing.assert_allclose(compiled.predict(X), reference(model, scaler_X, scaler_y, X), rtol=1e-5)
+
+
+def test_compiled_trees_handle_missing_values_and_large_batches():
+    model, scaler_X, scaler_y = fitted(xgboost.XGBRegressor(n_estimators=10, max_depth=3))
+    compiled = compile_model(model, scaler_X, scaler_y)
+
+    X, _ = training_data(seed=3, n=9000)  # more than one chunk
+    X[::7, 2] = np.nan
+    np.testing.assert_allclose(compiled.predict(X), reference(model, scaler_X, scaler_y, X), rtol=1e-5)
+
+
+def test_compiled_trees_fall_back_to_traversal_for_large_grids(monkeypatch):
+    model, scaler_X, scaler_y = fitted(xgboost.XGBRegressor(n_estimators=40, max_depth=4))
+    with_table = compile_model(model, scaler_X, scaler_y)
+    assert with_table.table is not None
+
+    monkeypatch.setattr(CompiledTrees, "TABLE_MAX_CELLS", 1)
+    without_table = compile_model(model, scaler_X, scaler_y)
+    assert without_table.table is None
+
+    X, _ = training_data(seed=5, n=2000)
+    np.testing.assert_allclose(without_table.predict(X), with_table.predict(X), rtol=1e-12)
+
+
+def test_compiled_linear_folds_both_scalers():
+    model, scaler_X, scaler_y = fitted(LinearRegression())
+    compiled = compile_model(model, scaler_X, scaler_y)
+    assert isinstance(compiled, CompiledLinear)
+
+    X, _ = training_data(seed=4)
+    np.testing.assert_allclose(compiled.predict(X), reference(model, scaler_X, scaler_y, X), rtol=1e-9)
+
+
+def test_unsupported_model_is_not_compiled():
+    model, scaler_X, scaler_y = fitted(DecisionTreeRegressor(max_depth=3))
+    assert compile_model(model, scaler_X, scaler_y) is None
+
+
+@pytest.mark.parametrize("mode, compiled", [("standard", False), ("compiled", True)])
+def test_maybe_compile_follows_inference_mode(mode, compiled):
+    model, scaler_X, scaler_y = fitted(xgboost.XGBRegressor(n_estimators=5, max_depth=2))
+    assert (maybe_compile(model, scaler_X, scaler_y, mode=mode) is not None) is compiled
@@ -0,0 +1,100 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+
+from api import service_monitoring
+from api.drift import DriftMonitor, reference_edges
+from api.reference_profiles import ReferenceProfile
+
+
+def reference(n=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Surface reelle bati": rng.normal(80, 20, n),
+        "Nombre pieces principales": rng.integers(1, 6, n).astype(float),
+        "prix_m2": rng.normal(3500, 500, n),
+    })
+
+
+def monitor_for(frame, **kwargs):
+    return DriftMonitor(ReferenceProfile.from_frame(frame, features=list(frame.columns)), **kwargs)
+
+
+def rows(frame):
+    return frame.to_dict(orient="records")
+
+
+def test_same_distribution_has_no_drift():
+    monitor = monitor_for(reference(seed=0), seed=0)
+    monitor.update(rows(reference(seed=1)))
+
+    stats = monitor.stats()
+    assert stats["prix_m2"]["observations"] == 1000
+    assert all(s["psi"] < 0.05 and s["ks"] < 0.1 for s in stats.values())
+
+
+def test_shifted_feature_drifts():
+    monitor = monitor_for(reference(seed=0), seed=0)
+    current = reference(seed=1)
+    current["Surface reelle bati"] += 40
+    monitor.update(rows(current))
+
+    stats = monitor.stats()
+    assert stats["Surface reelle bati"]["psi"] > 1
+    assert stats["Surface reelle bati"]["ks"] > 0.5
+    assert stats["prix_m2"]["psi"] < 0.05
+
+
+def test_constant_reference_and_missing_values():
+    assert list(reference_edges(np.array([0.0, 0.0, 0.0]))) == [0.0, np.nextafter(0.0, 1.0)]
+
+    monitor = monitor_for(pd.DataFrame({"lots": [0.0] * 10}), seed=0)
+    monitor.update([{"lots": 0.0}, {"lots": 2.0}, {"lots": np.nan}, {}])
+
+    stats = monitor.stats()["lots"]
+    assert stats["observations"] == 2
+    assert stats["ks"] == 0.5
+
+
+def test_memory_is_bounded_and_reset_opens_a_new_window():
+    monitor = monitor_for(reference(), sample_size=50, seed=0)
+    for _ in range(20):
+        monitor.update(rows(reference(n=100, seed=2)))
+
+    assert monitor.seen == 2000
+    assert len(monitor.sample_frame()) == 50
+    assert monitor.counts.shape == monitor.reference_counts.shape
+
+    monitor.reset()
+    assert monitor.stats()["prix_m2"]["observations"] == 0
+    assert monitor.sample_frame().empty
+
+
+def test_logging_predictions_does_not_run_a_report():
+    monitor = monitor_for(reference(), seed=0)
+    with patch.object(service_monitoring, "get_drift_monitor", return_value=monitor), \
+            patch.object(service_monitoring, "get_report") as get_report:
+        service_monitoring.log_prediction_for_evidently(
+            {"Surface reelle bati": 80.0, "Nombre pieces principales": 3.0}, 3400.0
+        )
+
+    get_report.assert_not_called()
+    assert monitor.stats()["prix_m2"]["observations"] == 1
+
+
+def test_report_runs_on_the_sample_and_resets():
+    monitor = monitor_for(reference(), seed=0)
+    monitor.update(rows(reference(n=40, seed=3)))
+    report = MagicMock()
+
+    with patch.object(service_monitoring, "get_drift_monitor", return_value=monitor), \
+            patch.object(service_monitoring, "get_report", return_value=report), \
+            patch.object(service_monitoring, "get_reference_data", return_value=reference()), \
+            patch.object(service_monitoring, "get_workspace", return_value=None):
+        assert service_monitoring.generate_drift_report(min_rows=100) is None
+        name = service_monitoring.generate_drift_report(reset=True, min_rows=30)
+
+    assert name.startswith("evidently_reports/")
+    assert len(report.run.call_args[0][0]) == 40
+    assert monitor.seen == 0
@@ -0,0 +1,133 @@
+import gc
+import os
+import signal
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+import xgboost
+from prometheus_client import REGISTRY
+from sklearn.linear_model import LinearRegression
+
+from api import inference_pool
+from api.compiled import compile_model
+from api.inference_pool import InferencePool, attach, share
+from api.models import ModelBundle
+from api.services import _predict_array
+from conftest import fitted, training_data
+
+
+# ---------------------------
+# Compiled engines
+# ---------------------------
+def compiled(model):
+    return compile_model(*fitted(model))
+
+
+@pytest.fixture(scope="module")
+def engines():
+    return {
+        "trees": compiled(xgboost.XGBRegressor(n_estimators=30, max_depth=4)),
+        "linear": compiled(LinearRegression()),
+    }
+
+
+@pytest.fixture(scope="module")
+def pool(tmp_path_factory):
+    pool = InferencePool(workers=2, directory=str(tmp_path_factory.mktemp("shm"))).start()
+    yield pool
+    pool.close()
+
+
+# ============================================================
+#                      TESTS
+# ============================================================
+
+@pytest.mark.parametrize("name", ["trees", "linear"])
+def test_shared_engine_predicts_like_the_original(tmp_path, engines, name):
+    engine = engines[name]
+    descriptor = share(engine, str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+
+    attached = attach(descriptor)
+    X, _ = training_data(seed=1, n=500)
+    np.testing.assert_array_equal(attached.predict(X), engine.predict(X))
+
+    # The arrays are read-only views of the shared file, not copies
+    arrays = [value for value in vars(attached).values() if isinstance(value, np.ndarray)]
+    assert arrays and all(not array.flags.writeable and not array.flags.owndata for array in arrays)
+
+
+def test_pool_evaluates_engines_in_worker_processes(pool, engines):
+    X, _ = training_data(seed=2, n=300)
+    for engine in engines.values():
+        np.testing.assert_array_equal(pool.predict(engine, X), engine.predict(X))
+        np.testing.assert_array_equal(pool.predict(engine, X[:1]), engine.predict(X[:1]))
+
+    pids = set(pool.executor.map(inference_pool._ready, range(4)))
+    assert os.getpid() not in pids
+
+
+def test_shared_files_are_removed_with_their_engine(pool):
+    engine = compiled(LinearRegression())
+    path = pool.descriptor(engine).path
+    assert pool.descriptor(engine).path == path  # shared once
+    assert os.path.exists(path)
+
+    del engine
+    gc.collect()
+    assert not os.path.exists(path)
+
+
+def test_predict_array_uses_the_active_pool(pool, engines):
+    bundle = ModelBundle(None, None, None, engines["trees"])
+    X, _ = training_data(seed=3, n=10)
+
+    with patch.object(inference_pool, "_pool", pool), patch.object(pool, "predict", wraps=pool.predict) as remote:
+        np.testing.assert_array_equal(_predict_array(bundle, X), engines["trees"].predict(X))
+    assert remote.call_count == 1
+
+    assert inference_pool.current() is None
+    np.testing.assert_array_equal(_predict_array(bundle, X), engines["trees"].predict(X))
+
+
+def test_pool_is_rebuilt_when_a_worker_dies(tmp_path, engines):
+    pool = InferencePool(workers=1, directory=str(tmp_path)).start()
+    X, _ = training_data(seed=5, n=20)
+    restarts = REGISTRY.get_sample_value("inference_pool_restarts_total")
+    try:
+        broken = pool.executor
+        os.kill(broken.submit(inference_pool._ready).result(), signal.SIGKILL)
+        with pytest.raises(BrokenProcessPool):
+            while True:
+                broken.submit(inference_pool._ready).result()
+
+        np.testing.assert_array_equal(pool.predict(engines["trees"], X), engines["trees"].predict(X))
+        assert pool.executor is not broken
+        assert REGISTRY.get_sample_value("inference_pool_restarts_total") == restarts + 1
+    finally:
+        pool.close()
+
+
+def test_engine_that_keeps_breaking_the_pool_is_evaluated_in_process(tmp_path, engines):
+    def broken_executor():
+        executor = MagicMock()
+        executor.submit.return_value.result.side_effect = BrokenProcessPool()
+        return executor
+
+    with patch.object(InferencePool, "_executor", side_effect=broken_executor):
+        pool = InferencePool(workers=1, directory=str(tmp_path))
+        X, _ = training_data(seed=6, n=20)
+        np.testing.assert_array_equal(pool.predict(engines["linear"], X), engines["linear"].predict(X))
+        pool.close()
+
+
+def test_close_removes_every_shared_file(tmp_path, engines):
+    pool = InferencePool(workers=1, directory=str(tmp_path))
+    X, _ = training_data(seed=4, n=5)
+    pool.predict(engines["linear"], X)
+    assert len(os.listdir(tmp_path)) == 1
+
+    pool.close()
+    assert os.listdir(tmp_path) == []
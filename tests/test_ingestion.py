@@ -0,0 +1,87 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from api import ingestion
+from api.ingestion import ingest, read_dvf_chunks
+
+HEADER = [
+    "No disposition", "Date mutation", "Nature mutation", "Valeur fonciere", "Code postal", "Commune",
+    "Code departement", "Code commune", "Section", "Surface Carrez du 1er lot", "Nombre de lots",
+    "Type local", "Surface reelle bati", "Nombre pieces principales", "Surface terrain",
+]
+
+ROWS = [
+    ["1", "05/01/2024", "Vente", "232000,00", "59260", "Lille", "59", "350", "AD", "", "0",
+     "Maison", "95", "5", "101"],
+    ["1", "05/01/2024", "Vente", "232000,00", "59260", "Lille", "59", "350", "AD", "", "0",
+     "Dépendance", "0", "0", "101"],
+    ["1", "05/01/2024", "Vente", "57500,00", "59000", "Lille", "59", "350", "OT", "12,19", "1",
+     "Appartement", "13", "1", ""],
+    ["1", "06/01/2024", "Vente", "80000,00", "59000", "Lille", "59", "350", "OT", "", "1",
+     "Appartement", "0", "1", ""],  # infinite price
+    ["1", "07/01/2024", "Echange", "90000,00", "59000", "Lille", "59", "350", "OT", "", "1",
+     "Appartement", "30", "1", ""],
+    ["1", "08/01/2024", "Vente", "300000,00", "97200", "Fort-de-France", "972", "209", "AB", "", "0",
+     "Maison", "120", "4", "500"],
+]
+
+
+def write_dvf(path, rows=ROWS, sep="|"):
+    lines = [sep.join(HEADER)] + [sep.join(f'"{v}"' if sep in v else v for v in row) for row in rows]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+# ============================================================
+#                      TESTS
+# ============================================================
+
+@pytest.mark.parametrize("sep", ["|", ","])
+def test_chunks_are_typed_filtered_and_projected(tmp_path, sep):
+    path = write_dvf(tmp_path / "dvf.txt", sep=sep)
+    frame = next(read_dvf_chunks(path, chunk_rows=100))
+
+    assert list(frame.columns) == list(ingestion.COLUMNS)
+    assert frame["type_local"].tolist() == ["maison", "appartement", "maison"]
+    assert frame["prix_m2"].tolist() == [232000 / 95, 57500 / 13, 300000 / 120]
+    assert frame["surface_carrez"].iloc[1] == 12.19
+    assert np.isnan(frame["surface_terrain"].iloc[1])
+    assert frame["code_commune"].tolist() == ["59350", "59350", "97209"]
+    assert frame["commune"].iloc[2] == "FORT-DE-FRANCE"
+    assert str(frame["date_mutation"].iloc[2].date()) == "2024-01-08"
+
+
+def test_ingest_streams_chunks_into_a_memory_mapped_cache(tmp_path):
+    path = write_dvf(tmp_path / "dvf.txt", rows=ROWS * 50)
+    table = ingest(path, cache_dir=tmp_path / "cache", chunk_rows=7)
+
+    assert len(table) == 150
+    assert isinstance(table["prix_m2"], np.memmap)
+    assert table.categories["type_local"] == ["maison", "appartement"]
+    assert table.mask(type_local="maison").sum() == 100
+    assert table.mask(commune="PARIS").sum() == 0
+
+    frame = table.to_frame(["commune", "prix_m2"], mask=table.mask(code_commune="97209"))
+    assert frame["commune"].unique().tolist() == ["FORT-DE-FRANCE"]
+    assert len(frame) == 50
+
+
+def test_cache_is_reused_until_the_source_changes(tmp_path):
+    path = write_dvf(tmp_path / "dvf.txt")
+    ingest(path, cache_dir=tmp_path / "cache")
+
+    with patch.object(ingestion, "read_dvf_chunks", side_effect=AssertionError("source re-parsed")):
+        assert len(ingest(path, cache_dir=tmp_path / "cache")) == 3
+
+    write_dvf(path, rows=ROWS[:3])
+    assert len(ingest(path, cache_dir=tmp_path / "cache")) == 2
+    assert len(list((tmp_path / "cache").iterdir())) == 2
+
+
+def test_empty_result(tmp_path):
+    path = write_dvf(tmp_path / "dvf.txt", rows=ROWS[1:2])
+    table = ingest(path, cache_dir=tmp_path / "cache")
+    assert len(table) == 0
+    assert table.to_frame().empty
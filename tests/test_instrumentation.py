@@ -0,0 +1,121 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from api.main import prometheus_middleware
+from api.monitoring_queue import MonitoringQueue
+from api.routes import router, authenticate
+from api.services import _predict_array
+from conftest import FakeRegistry
+
+VERSION = "v-instr"
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(router)
+    app.middleware("http")(prometheus_middleware)
+    app.dependency_overrides[authenticate] = lambda: "mock_user"
+    app.state.registry = FakeRegistry(VERSION)
+    app.state.monitoring_queue = MonitoringQueue(lambda items: None, maxsize=100)
+    return TestClient(app)
+
+
+HOUSE = {"surface_bati": 80, "nombre_pieces": 4, "type_local": "maison", "surface_terrain": 150, "nombre_lots": 1}
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def stage_count(stage, city, type_local):
+    return sample(
+        "prediction_stage_latency_seconds_count", stage=stage, city=city, type_local=type_local, version=VERSION
+    )
+
+
+def stage_sum(stage, city, type_local):
+    return sample(
+        "prediction_stage_latency_seconds_sum", stage=stage, city=city, type_local=type_local, version=VERSION
+    )
+
+
+# ============================================================
+#                      TESTS
+# ============================================================
+
+def test_requests_are_counted_once_by_route_template(client):
+    before = sample("api_requests_total", method="POST", endpoint="/predict/lille")
+    assert client.post("/predict/lille", json=HOUSE).status_code == 200
+    assert sample("api_requests_total", method="POST", endpoint="/predict/lille") == before + 1
+    assert sample("api_request_latency_seconds_count", method="POST", endpoint="/predict/lille") >= 1
+
+
+def test_unknown_paths_share_one_label(client):
+    before = sample("api_requests_total", method="GET", endpoint="unmatched")
+    errors = sample("api_errors_total", method="GET", endpoint="unmatched", status_code="404")
+    for path in ("/wp-admin/setup.php", "/.env", "/predict/lille/../../etc/passwd"):
+        assert client.get(path).status_code == 404
+
+    assert sample("api_requests_total", method="GET", endpoint="unmatched") == before + 3
+    assert sample("api_errors_total", method="GET", endpoint="unmatched", status_code="404") == errors + 3
+    assert sample("api_requests_total", method="GET", endpoint="/.env") == 0
+
+
+def test_validation_errors_are_labelled_by_route(client):
+    before = sample("api_errors_total", method="POST", endpoint="/predict", status_code="422")
+    assert client.post("/predict", json={"ville": "lille"}).status_code == 422
+    assert sample("api_errors_total", method="POST", endpoint="/predict", status_code="422") == before + 1
+
+
+def test_every_stage_of_a_prediction_is_timed(client):
+    stages = ("validation", "admission_queue", "thread_queue", "transform", "predict", "inverse_transform",
+              "monitoring_enqueue")
+    before = {stage: stage_count(stage, "bordeaux", "maison") for stage in stages}
+
+    response = client.post("/predict", json={"ville": "bordeaux", "features": HOUSE})
+    assert response.status_code == 200
+
+    for stage in stages:
+        assert stage_count(stage, "bordeaux", "maison") == before[stage] + 1, stage
+
+
+def test_admission_wait_is_not_counted_as_validation(client):
+    async def slow_acquire():
+        await asyncio.sleep(0.2)
+
+    client.app.state.admission = SimpleNamespace(acquire=slow_acquire, release=lambda service_time: None)
+    before = {stage: stage_sum(stage, "lille", "maison") for stage in ("validation", "admission_queue")}
+
+    assert client.post("/predict", json={"ville": "lille", "features": HOUSE}).status_code == 200
+
+    assert stage_sum("validation", "lille", "maison") - before["validation"] < 0.1
+    assert stage_sum("admission_queue", "lille", "maison") - before["admission_queue"] >= 0.2
+
+
+def test_mixed_batches_are_labelled_with_a_wildcard(client):
+    payload = [
+        {"ville": "lille", "features": HOUSE},
+        {"ville": "lille", "features": {**HOUSE, "type_local": "appartement"}},
+    ]
+    before = {
+        "validation": stage_count("validation", "lille", "*"),
+        "predict": stage_count("predict", "lille", "appartement"),
+    }
+
+    assert client.post("/predict/batch", json=payload).status_code == 200
+    assert stage_count("validation", "lille", "*") == before["validation"] + 1
+    assert stage_count("predict", "lille", "appartement") == before["predict"] + 1
+
+
+def test_predict_array_without_labels_records_nothing():
+    bundle = FakeRegistry(VERSION).current().get("lille", "maison")
+    before = stage_count("predict", "lille", "maison")
+    assert _predict_array(bundle, np.ones((2, 4))).tolist() == [4.0, 4.0]
+    assert stage_count("predict", "lille", "maison") == before
@@ -0,0 +1,173 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import ingestion, market_stats, model_store, routes_market
+from api.market_stats import ALL, CubeFile, MarketCube, bin_values, build_cube, sketch_bins
+from api.routes_market import router_market
+
+HEADER = [
+    "Date mutation", "Nature mutation", "Valeur fonciere", "Code postal", "Commune", "Code departement",
+    "Code commune", "Section", "Surface Carrez du 1er lot", "Nombre de lots", "Type local", "Surface reelle bati",
+    "Nombre pieces principales", "Surface terrain",
+]
+
+
+def sale(date, prix_m2, code_postal, section, type_local, commune="LILLE", surface=50):
+    return [date, "Vente", str(prix_m2 * surface), str(code_postal), commune, "59", "350", section, "", "1",
+            type_local, str(surface), "3", ""]
+
+
+JANUARY = [
+    sale("05/01/2024", 2000, 59000, "AB", "Appartement"),
+    sale("06/01/2024", 3000, 59000, "AB", "Appartement"),
+    sale("07/01/2024", 4000, 59000, "CD", "Appartement"),
+    sale("08/01/2024", 2500, 59800, "EF", "Maison"),
+    sale("08/01/2024", 0, 59800, "EF", "Maison"),  # no price: not counted
+]
+FEBRUARY = [
+    sale("03/02/2024", 5000, 59000, "AB", "Appartement"),
+    sale("04/02/2024", 6000, 33000, "AB", "Appartement", commune="BORDEAUX"),
+]
+
+
+def write_dvf(path, rows):
+    path.write_text("\n".join(",".join(row) for row in [HEADER] + rows) + "\n", encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def files(tmp_path):
+    return write_dvf(tmp_path / "2024-01.csv", JANUARY), write_dvf(tmp_path / "2024-02.csv", FEBRUARY)
+
+
+@pytest.fixture
+def cube(files, tmp_path):
+    return build_cube(files, tmp_path / "cube.npz", tmp_path / "cache")
+
+
+def assert_close(value, expected):
+    assert abs(value - expected) / expected <= 0.01
+
+
+# ============================================================
+#                      SKETCH
+# ============================================================
+
+def test_sketch_bins_estimate_prices_within_one_percent():
+    prices = np.geomspace(101, 99_000, 1000)
+    relative_error = np.abs(bin_values(sketch_bins(prices)) - prices) / prices
+    assert relative_error.max() <= 0.01
+    assert sketch_bins(np.array([1.0, 1e7])).tolist() == [0, market_stats.SKETCH_BINS - 1]
+
+
+# ============================================================
+#                      CUBE
+# ============================================================
+
+def test_cells_and_rollups(cube):
+    cell = cube.get(commune="lille", code_postal=59000, section="ab", type_local="appartement", mois="2024-01")
+    assert cell["nombre_ventes"] == 2
+
+    lille_apartments = cube.get(commune="LILLE", type_local="appartement")
+    assert lille_apartments["nombre_ventes"] == 4
+    assert_close(lille_apartments["prix_m2_median"], 3000)
+    assert_close(lille_apartments["prix_m2_quantiles"]["p90"], 5000)
+
+    assert cube.get()["nombre_ventes"] == 6
+    assert cube.get(mois="2024-02")["nombre_ventes"] == 2
+    assert cube.get(type_local="maison")["nombre_ventes"] == 1
+    assert cube.get(commune="PARIS") is None
+
+
+def test_section_is_only_aggregated_within_its_commune(cube):
+    assert cube.get(section="AB") is None
+    assert cube.get(commune="BORDEAUX", section="AB")["nombre_ventes"] == 1
+
+
+def test_cube_is_saved_and_reloaded(cube, files, tmp_path):
+    loaded = MarketCube.load(tmp_path / "cube.npz")
+
+    assert loaded.cells == cube.cells
+    assert loaded.get(commune="LILLE", mois="2024-01") == cube.get(commune="LILLE", mois="2024-01")
+    assert [source["path"] for source in loaded.sources] == [str(path) for path in files]
+
+
+def test_adding_a_file_only_summarises_that_file(files, tmp_path):
+    january, february = files
+    build_cube([january], tmp_path / "cube.npz", tmp_path / "cache")
+
+    with patch.object(market_stats, "build_part", wraps=market_stats.build_part) as build_part, \
+            patch.object(ingestion, "file_sha256", wraps=ingestion.file_sha256) as file_sha256:
+        incremental = build_cube([january, february], tmp_path / "cube.npz", tmp_path / "cache")
+    assert build_part.call_count == 1
+    # Each source is read once, by the ingestion, whose hash is recorded in the cube
+    assert file_sha256.call_count == 2
+    assert [source["sha256"] for source in incremental.sources] == [model_store.file_sha256(f) for f in files]
+
+    full = build_cube([january, february], tmp_path / "full.npz", tmp_path / "other-cache")
+    assert incremental.cells == full.cells
+    for filters in ({}, {"commune": "LILLE"}, {"mois": "2024-02"}, {"commune": "LILLE", "section": "AB"}):
+        assert incremental.get(**filters) == full.get(**filters)
+
+
+def test_cli_adds_files_to_the_existing_cube(files, tmp_path):
+    january, february = files
+    output = tmp_path / "cube.npz"
+    market_stats.main([str(january), "--output", str(output), "--cache-dir", str(tmp_path / "cache")])
+    market_stats.main([str(february), "--output", str(output), "--cache-dir", str(tmp_path / "cache")])
+
+    cube = MarketCube.load(output)
+    assert cube.get()["nombre_ventes"] == 6
+    assert len(cube.sources) == 2
+
+
+def test_cube_file_reloads_when_rebuilt(files, tmp_path):
+    january, february = files
+    cube_file = CubeFile(tmp_path / "cube.npz")
+    assert cube_file.load() is None
+
+    build_cube([january], cube_file.path, tmp_path / "cache")
+    assert cube_file.load().get()["nombre_ventes"] == 4
+    first = cube_file.cube
+    assert cube_file.load() is first
+
+    build_cube([january, february], cube_file.path, tmp_path / "cache")
+    with patch.object(CubeFile, "signature", return_value=-1.0):
+        assert cube_file.load().get()["nombre_ventes"] == 6
+
+
+# ============================================================
+#                      ROUTE
+# ============================================================
+
+@pytest.fixture
+def client(cube, tmp_path, monkeypatch):
+    cube_file = CubeFile(tmp_path / "cube.npz")
+    monkeypatch.setattr(routes_market, "market_cube", cube_file)
+    app = FastAPI()
+    app.include_router(router_market)
+    return TestClient(app)
+
+
+def test_market_stats_route(client):
+    response = client.get("/market-stats", params={"commune": "lille", "type_local": "appartement"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["commune"] == "LILLE"
+    assert body["code_postal"] == body["section"] == body["mois"] == ALL
+    assert body["nombre_ventes"] == 4
+    assert set(body["prix_m2_quantiles"]) == {"p10", "p25", "p50", "p75", "p90"}
+
+
+def test_market_stats_route_errors(client, tmp_path, monkeypatch):
+    assert client.get("/market-stats", params={"commune": "paris"}).status_code == 404
+    assert client.get("/market-stats", params={"section": "AB"}).status_code == 400
+    assert client.get("/market-stats", params={"mois": "2024-1"}).status_code == 422
+
+    monkeypatch.setattr(routes_market, "market_cube", CubeFile(tmp_path / "missing.npz"))
+    assert client.get("/market-stats").status_code == 503
@@ -0,0 +1,91 @@
+import sqlite3
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import xgboost
+
+from api.model_store import ModelResolutionError, ModelStore, resolve_model_uri
+
+MODEL_ID = "m-0123456789abcdef"
+MLMODEL = """artifact_path: file:///C:/Users/someone/project/mlruns/2/models/{model_id}/artifacts
+flavors:
+  xgboost:
+    code: null
+    data: model.ubj
+    model_class: xgboost.sklearn.XGBRegressor
+    model_format: ubj
+model_id: {model_id}
+run_id: run123
+"""
+
+
+# ---------------------------
+# Fake local MLflow store
+# ---------------------------
+@pytest.fixture
+def store_dirs(tmp_path):
+    """A tiny mlruns/ tree with one model registered (in mlflow.db) under a foreign absolute path."""
+    artifacts = tmp_path / "mlruns" / "2" / "models" / MODEL_ID / "artifacts"
+    artifacts.mkdir(parents=True)
+    (artifacts / "MLmodel").write_text(MLMODEL.format(model_id=MODEL_ID))
+
+    X = np.random.default_rng(0).normal(size=(50, 4))
+    model = xgboost.XGBRegressor(n_estimators=5, max_depth=2)
+    model.fit(X, X[:, 0])
+    model.save_model(str(artifacts / "model.ubj"))
+
+    db = tmp_path / "mlflow.db"
+    location = f"file:///C:/Users/someone/project/mlruns/2/models/{MODEL_ID}/artifacts"
+    with sqlite3.connect(db) as connection:
+        connection.execute("CREATE TABLE model_versions (name TEXT, version INT, source TEXT, storage_location TEXT)")
+        connection.execute(
+            "INSERT INTO model_versions VALUES (?, ?, ?, ?)",
+            ("immo", 1, f"models:/{MODEL_ID}", location),
+        )
+
+    return tmp_path / "mlruns", db, tmp_path / "cache", model, X
+
+
+# ============================================================
+#                      TESTS
+# ============================================================
+
+def test_resolve_registered_version_to_local_artifacts(store_dirs):
+    mlruns, db, _, _, _ = store_dirs
+
+    path = resolve_model_uri("models:/immo/1", mlruns, db)
+    assert path == mlruns / "2" / "models" / MODEL_ID / "artifacts"
+    assert resolve_model_uri("models:/immo/latest", mlruns, db) == path
+    assert resolve_model_uri(f"models:/{MODEL_ID}", mlruns, db) == path
+
+
+def test_resolve_unknown_version(store_dirs):
+    mlruns, db, _, _, _ = store_dirs
+
+    with pytest.raises(ModelResolutionError):
+        resolve_model_uri("models:/immo/7", mlruns, db)
+    with pytest.raises(ModelResolutionError):
+        resolve_model_uri("s3://bucket/model", mlruns, db)
+
+
+def test_load_populates_content_addressed_cache(store_dirs):
+    mlruns, db, cache, original, X = store_dirs
+    store = ModelStore(mlruns, db, cache)
+
+    model = store.load("models:/immo/1")
+
+    np.testing.assert_allclose(model.predict(X), original.predict(X))
+    objects = list((cache / "objects").glob("*.ubj"))
+    assert len(objects) == 1
+    assert len(objects[0].stem) == 64  # sha256
+
+
+def test_warm_cache_skips_resolution(store_dirs):
+    mlruns, db, cache, original, X = store_dirs
+    ModelStore(mlruns, db, cache).load("models:/immo/1")
+
+    with patch("api.model_store.resolve_model_uri", side_effect=AssertionError("resolved again")):
+        model = ModelStore(mlruns, db, cache).load("models:/immo/1")
+
+    np.testing.assert_allclose(model.predict(X), original.predict(X))
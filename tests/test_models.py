@@ -1,61 +1,219 @@
+import json
+import os
 from unittest.mock import patch
 
+import joblib
+import pytest
+
 import api.models as models
 
 
 # -------------------------------------
 # Helper: fake dummy model/scaler dict
 # -------------------------------------
-DUMMY_MODEL_DATA = {
-    "model_a": "dummy_model_a",
-    "model_m": "dummy_model_m",
-    "scaler_Xa": "dummy_scaler_Xa",
-    "scaler_ya": "dummy_scaler_ya",
-    "scaler_Xm": "dummy_scaler_Xm",
-    "scaler_ym": "dummy_scaler_ym",
-}
+def dummy_model_data(city):
+    return {
+        "model_a": f"dummy_model_a_{city}",
+        "model_m": f"dummy_model_m_{city}",
+        "scaler_Xa": f"dummy_scaler_Xa_{city}",
+        "scaler_ya": f"dummy_scaler_ya_{city}",
+        "scaler_Xm": f"dummy_scaler_Xm_{city}",
+        "scaler_ym": f"dummy_scaler_ym_{city}",
+    }
+
+
+def fake_load(path, mmap_mode=None):
+    return dummy_model_data("lille" if path == models.models_file else "bordeaux")
 
 
 # -------------------------------------
 # Tests using joblib.load patching
 # -------------------------------------
-@patch("api.models.joblib.load", return_value=DUMMY_MODEL_DATA)
-def test_load_model_a_lille(mock_load):
-    result = models.load_model_a_lille()
-    assert result == "dummy_model_a"
-    mock_load.assert_called_once_with(models.models_file)
+@patch("api.models.joblib.load", side_effect=fake_load)
+def test_registry_loads_each_bundle_once(mock_load):
+    registry = models.ModelRegistry().load()
+    registry.load()  # second call is a no-op
+    assert mock_load.call_count == 0  # models are loaded on first use
+
+    for city in ("lille", "bordeaux"):
+        for type_local in ("appartement", "maison"):
+            registry.get(city, type_local)
+
+    assert mock_load.call_count == 2
+    mock_load.assert_any_call(models.models_file, mmap_mode="r")
+    mock_load.assert_any_call(models.models_bordeaux_file, mmap_mode="r")
+    assert registry.loaded
+
+
+@patch("api.models.joblib.load", side_effect=fake_load)
+def test_registry_lookup_lille(mock_load):
+    registry = models.ModelRegistry().load()
+
+    bundle = registry.get("lille", "appartement")
+    assert (bundle.model, bundle.scaler_X, bundle.scaler_y) == (
+        "dummy_model_a_lille", "dummy_scaler_Xa_lille", "dummy_scaler_ya_lille"
+    )
+    assert bundle.compiled is None
+    bundle = registry.get("lille", "maison")
+    assert bundle.model == "dummy_model_m_lille"
+    assert bundle.scaler_X == "dummy_scaler_Xm_lille"
+    assert bundle.scaler_y == "dummy_scaler_ym_lille"
+
+
+@patch("api.models.joblib.load", side_effect=fake_load)
+def test_registry_bordeaux_uses_lille_scalers(mock_load):
+    registry = models.ModelRegistry().load()
+
+    bundle = registry.get("bordeaux", "appartement")
+    assert bundle.model == "dummy_model_a_bordeaux"
+    assert bundle.scaler_X == "dummy_scaler_Xa_lille"
+    assert registry.get("bordeaux", "maison").model == "dummy_model_m_bordeaux"
+
+
+@patch("api.models.joblib.load", side_effect=fake_load)
+def test_registry_overrides(mock_load):
+    registry = models.ModelRegistry(overrides={("lille", "appartement"): lambda: "mlflow_model"}).load()
+
+    assert registry.get("lille", "appartement").model == "mlflow_model"
+    assert registry.get("lille", "appartement").scaler_X == "dummy_scaler_Xa_lille"
+
+
+@patch("api.models.joblib.load", side_effect=fake_load)
+def test_registry_unknown_key(mock_load):
+    registry = models.ModelRegistry().load()
+
+    with pytest.raises(KeyError):
+        registry.get("paris", "maison")
+
+
+@patch("api.models.joblib.load", side_effect=fake_load)
+def test_registry_is_versioned(mock_load):
+    registry = models.ModelRegistry().load()
+
+    assert len(registry.version) == 12
+    assert registry.current().get("lille", "maison").model == "dummy_model_m_lille"
+
+
+@patch("api.models.joblib.load", side_effect=fake_load)
+def test_reload_keeps_version_when_files_unchanged(mock_load):
+    registry = models.ModelRegistry().load()
+    before = registry.current()
+
+    warmed = []
+    assert registry.reload(warmup=warmed.append) is before
+    assert warmed == []
+
+
+def test_reload_swaps_atomically_and_keeps_old_set_for_in_flight_requests(tmp_path):
+    bundle_file = tmp_path / "bundle.pkl"
+    joblib.dump(dummy_model_data("v1"), bundle_file)
+    registry = models.ModelRegistry(bundle_files={"lille": str(bundle_file)}).load()
+
+    in_flight = registry.current()
+    for type_local in ("appartement", "maison"):
+        in_flight.get("lille", type_local)  # models in use are reloaded before the swap
+    joblib.dump(dummy_model_data("v2"), bundle_file)
+
+    warmed = []
+    new_set = registry.reload(warmup=warmed.append)
+
+    assert new_set.version != in_flight.version
+    assert registry.current() is new_set
+    assert len(warmed) == 2
+    assert registry.get("lille", "maison").model == "dummy_model_m_v2"
+    # A request that started before the swap still sees the old models
+    assert in_flight.get("lille", "maison").model == "dummy_model_m_v1"
+
+
+def test_reload_failure_keeps_serving_current_version(tmp_path):
+    bundle_file = tmp_path / "bundle.pkl"
+    joblib.dump(dummy_model_data("v1"), bundle_file)
+    registry = models.ModelRegistry(bundle_files={"lille": str(bundle_file)}).load()
+    version = registry.version
+    registry.get("lille", "maison")
+
+    bundle_file.write_bytes(b"not a pickle")
+    with pytest.raises(Exception):
+        registry.reload()
+
+    assert registry.version == version
+    assert registry.get("lille", "maison").model == "dummy_model_m_v1"
+
+
+# -------------------------------------
+# Catalog, lazy loading and eviction
+# -------------------------------------
+def write_catalog(tmp_path, cities):
+    catalog = {"cities": {}}
+    for city in cities:
+        joblib.dump(dummy_model_data(city), tmp_path / f"{city}.pkl")
+        catalog["cities"][city] = {
+            type_local: {
+                "model": {"file": f"{city}.pkl", "key": model_key},
+                "scaler_X": {"file": f"{city}.pkl", "key": scaler_X_key},
+                "scaler_y": {"file": f"{city}.pkl", "key": scaler_y_key},
+            }
+            for type_local, (model_key, scaler_X_key, scaler_y_key) in models.TYPE_LOCAL_KEYS.items()
+        }
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps(catalog))
+    return path
+
+
+def test_catalog_lists_the_cities_served(tmp_path):
+    path = write_catalog(tmp_path, ["lille", "roubaix", "Tourcoing"])
+    registry = models.ModelRegistry(catalog_file=str(path)).load()
+
+    assert registry.current().cities == {"lille", "roubaix", "tourcoing"}
+    assert registry.get("tourcoing", "maison").model == "dummy_model_m_Tourcoing"
+    assert registry.get("roubaix", "appartement").scaler_X == "dummy_scaler_Xa_roubaix"
+    with pytest.raises(KeyError):
+        registry.get("paris", "maison")
+
+
+def test_reload_is_signalled_to_the_other_workers_through_the_catalog(tmp_path):
+    path = write_catalog(tmp_path, ["lille"])
+    os.utime(path, (0, 0))
+    worker, other_worker = (models.ModelRegistry(catalog_file=str(path)).load() for _ in range(2))
+    signature = other_worker.signature()
+
+    assert worker.notify_workers(watch_interval=0) is False
+    assert other_worker.signature() == signature
 
+    assert worker.notify_workers(watch_interval=5) is True
+    assert other_worker.signature() != signature  # its watch_models loop reloads on the next pass
 
-@patch("api.models.joblib.load", return_value=DUMMY_MODEL_DATA)
-def test_load_scaler_Xa_lille(mock_load):
-    result = models.load_scaler_Xa_lille()
-    assert result == "dummy_scaler_Xa"
-    mock_load.assert_called_once_with(models.models_file)
 
+def test_shipped_catalog_matches_the_historical_layout():
+    catalog = models.read_catalog(models.MODEL_CATALOG)
+    assert set(catalog) == {(c, t) for c in ("lille", "bordeaux") for t in ("appartement", "maison")}
+    assert catalog[("lille", "appartement")][0].mlflow == "models:/XGBRegressorModel/3"
+    for (city, type_local), artifacts in catalog.items():
+        for artifact in artifacts[1:]:
+            assert os.path.isfile(artifact.file)
 
-@patch("api.models.joblib.load", return_value=DUMMY_MODEL_DATA)
-def test_load_model_m_lille(mock_load):
-    result = models.load_model_m_lille()
-    assert result == "dummy_model_m"
-    mock_load.assert_called_once_with(models.models_file)
 
+def test_cold_models_are_evicted_within_the_memory_budget(tmp_path):
+    path = write_catalog(tmp_path, ["a", "b", "c"])
+    file_size = os.path.getsize(tmp_path / "a.pkl")
+    registry = models.ModelRegistry(catalog_file=str(path), memory_budget_mb=2.5 * file_size / 2**20).load()
+    bundles = registry.current().bundles
 
-@patch("api.models.joblib.load", return_value=DUMMY_MODEL_DATA)
-def test_load_model_a_bordeaux(mock_load):
-    result = models.load_model_a_bordeaux()
-    assert result == "dummy_model_a"
-    mock_load.assert_called_once_with(models.models_bordeaux_file)
+    registry.get("a", "maison")
+    registry.get("b", "maison")
+    registry.get("a", "appartement")  # same file as a/maison: no extra memory
+    assert set(bundles.loaded()) == {("a", "maison"), ("b", "maison"), ("a", "appartement")}
 
+    registry.get("a", "maison")
+    registry.get("c", "maison")  # over budget: b (least recently used) is evicted
+    assert set(bundles.loaded()) == {("a", "maison"), ("a", "appartement"), ("c", "maison")}
+    assert bundles.memory_used == 2 * file_size
 
-@patch("api.models.joblib.load", return_value=DUMMY_MODEL_DATA)
-def test_load_model_m_bordeaux(mock_load):
-    result = models.load_model_m_bordeaux()
-    assert result == "dummy_model_m"
-    mock_load.assert_called_once_with(models.models_bordeaux_file)
+    assert registry.get("b", "maison").model == "dummy_model_m_b"  # reloaded on demand
 
 
-@patch("api.models.joblib.load", return_value=DUMMY_MODEL_DATA)
-def test_load_scaler_ym_lille(mock_load):
-    result = models.load_scaler_ym_lille()
-    assert result == "dummy_scaler_ym"
-    mock_load.assert_called_once_with(models.models_file)
+def test_invalid_catalog_entry_is_rejected(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({"cities": {"lille": {"maison": {"model": {"file": "x.pkl"}}}}}))
+    with pytest.raises(ValueError):
+        models.read_catalog(str(path))
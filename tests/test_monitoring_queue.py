@@ -0,0 +1,100 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from api.monitoring_queue import MonitoringQueue
+from api.services import _monitor
+
+
+class Recorder:
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+
+    def __call__(self, batch):
+        time.sleep(self.delay)
+        self.batches.append(list(batch))
+
+    @property
+    def items(self):
+        return [item for batch in self.batches for item in batch]
+
+
+def test_worker_consumes_in_batches_and_drains_on_close():
+    recorder = Recorder()
+    queue = MonitoringQueue(recorder, maxsize=100, batch_size=10, flush_interval=0.05).start()
+
+    assert queue.put_many(range(25)) == 25
+    queue.close()
+
+    assert recorder.items == list(range(25))
+    assert max(len(batch) for batch in recorder.batches) <= 10
+    assert not queue.put(99)  # closed
+
+
+def test_partial_batch_is_flushed_after_the_interval():
+    recorder = Recorder()
+    queue = MonitoringQueue(recorder, maxsize=100, batch_size=50, flush_interval=0.05).start()
+    queue.put("a")
+
+    deadline = time.monotonic() + 2
+    while not recorder.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    queue.close()
+    assert recorder.batches[0] == ["a"]
+
+
+def test_drop_oldest_keeps_the_most_recent_items():
+    queue = MonitoringQueue(Recorder(), maxsize=3, policy="drop_oldest")
+    assert queue.put_many(range(5)) == 5
+    assert list(queue._items) == [2, 3, 4]
+
+
+def test_sample_keeps_items_from_the_whole_burst():
+    queue = MonitoringQueue(Recorder(), maxsize=100, policy="sample", seed=0)
+    queue.put_many(range(10_000))
+
+    kept = list(queue._items)
+    assert len(kept) == 100
+    assert min(kept) < 1000 and max(kept) > 9000
+
+
+def test_block_waits_a_bounded_time_then_drops():
+    queue = MonitoringQueue(Recorder(), maxsize=2, policy="block", block_timeout=0.05)
+    queue.put_many([1, 2])
+
+    start = time.monotonic()
+    assert not queue.put(3)
+    assert time.monotonic() - start < 1
+    assert list(queue._items) == [1, 2]
+
+
+def test_consumer_errors_do_not_stop_the_worker():
+    calls = []
+
+    def consumer(batch):
+        calls.append(batch)
+        if len(calls) == 1:
+            raise RuntimeError("evidently down")
+
+    queue = MonitoringQueue(consumer, maxsize=10, batch_size=1, flush_interval=0.01).start()
+    queue.put_many(["a", "b"])
+    queue.close()
+    assert calls == [["a"], ["b"]]
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        MonitoringQueue(Recorder(), policy="drop_newest")
+
+
+def test_services_enqueue_without_consuming():
+    recorder = Recorder()
+    queue = MonitoringQueue(recorder, maxsize=10)
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(monitoring_queue=queue)))
+
+    _monitor(request, [("lille", "maison")], [{"Surface reelle bati": 80.0}], [3500.0])
+
+    assert list(queue._items) == [(("lille", "maison"), {"Surface reelle bati": 80.0}, 3500.0)]
+    assert recorder.batches == []
@@ -0,0 +1,113 @@
+import os
+import subprocess
+import sys
+
+from prometheus_client import CollectorRegistry, Counter
+from prometheus_client.parser import text_string_to_metric_families
+
+from api.multiprocess_metrics import ArchivingCollector, CachedScrape, archive, reset
+
+WORKER = """
+import os, sys
+from api.metrics import MODEL_LOADED, REQUEST_COUNT, REQUEST_LATENCY
+
+requests, loaded = int(sys.argv[1]), int(sys.argv[2])
+REQUEST_COUNT.labels(method="POST", endpoint="/predict/lille").inc(requests)
+REQUEST_LATENCY.labels(method="POST", endpoint="/predict/lille").observe(0.01)
+MODEL_LOADED.labels(model="maison", city="lille").set(loaded)
+print(os.getpid(), flush=True)
+"""
+
+
+def run_worker(directory, requests, loaded) -> int:
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(directory)}
+    result = subprocess.run([sys.executable, "-c", WORKER, str(requests), str(loaded)],
+                            env=env, capture_output=True, text=True, check=True)
+    return int(result.stdout.split()[-1])
+
+
+def scrape(directory) -> dict:
+    registry = CollectorRegistry()
+    ArchivingCollector(registry, str(directory))
+    output = CachedScrape(registry, ttl=0).get().decode()
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(output)
+        for sample in family.samples
+    }
+
+
+ROUTE = (("endpoint", "/predict/lille"), ("method", "POST"))
+MODEL = (("city", "lille"), ("model", "maison"))
+
+
+def db_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".db"))
+
+
+def test_metrics_are_aggregated_across_workers(tmp_path):
+    run_worker(tmp_path, requests=2, loaded=1)
+    run_worker(tmp_path, requests=3, loaded=0)
+
+    values = scrape(tmp_path)
+    assert values[("api_requests_total", ROUTE)] == 5
+    assert values[("api_request_latency_seconds_count", ROUTE)] == 2
+    assert values[("model_loaded", MODEL)] == 1  # livemax: loaded in at least one worker
+
+
+def test_dead_workers_are_archived_without_changing_totals(tmp_path):
+    first = run_worker(tmp_path, requests=2, loaded=1)
+    second = run_worker(tmp_path, requests=3, loaded=0)
+    before = scrape(tmp_path)
+
+    archive(first, str(tmp_path))
+    archive(second, str(tmp_path))
+
+    assert db_files(tmp_path) == ["counter_archive.db", "histogram_archive.db"]
+    after = scrape(tmp_path)
+    assert ("model_loaded", MODEL) not in after  # gauges of dead workers are dropped
+    assert after[("api_requests_total", ROUTE)] == 5
+    assert {key: before[key] for key in after} == after
+
+    third = run_worker(tmp_path, requests=4, loaded=1)
+    archive(third, str(tmp_path))
+    values = scrape(tmp_path)
+    assert values[("api_requests_total", ROUTE)] == 9
+    assert values[("api_request_latency_seconds_count", ROUTE)] == 3
+    assert values[("api_request_latency_seconds_bucket", tuple(sorted(ROUTE + (("le", "0.01"),))))] == 3
+
+
+def test_worker_archives_its_files_on_shutdown(tmp_path):
+    code = (
+        "import os; from fastapi.testclient import TestClient; import api.main\n"
+        "with TestClient(api.main.app) as client:\n"
+        "    client.get('/health')\n"
+        "print(os.getpid())"
+    )
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "MODEL_WARMUP": "0", "DRIFT_REPORT_INTERVAL": "0"}
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    pid = result.stdout.split()[-1]
+
+    assert not any(f"_{pid}." in name for name in db_files(tmp_path))
+    assert scrape(tmp_path)[("api_requests_total", (("endpoint", "/health"), ("method", "GET")))] == 1
+
+
+def test_reset_empties_the_directory(tmp_path):
+    run_worker(tmp_path, requests=1, loaded=1)
+
+    reset(str(tmp_path))
+
+    assert db_files(tmp_path) == []
+
+
+def test_cached_scrape_is_reused_within_its_ttl():
+    registry = CollectorRegistry()
+    counter = Counter("scrapes_test", "Test counter", registry=registry)
+    cached = CachedScrape(registry, ttl=60)
+
+    first = cached.get()
+    counter.inc()
+    assert cached.get() is first
+
+    cached.ttl = 0
+    assert cached.get() != first
@@ -0,0 +1,121 @@
+import json
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api import ingestion, reference_profiles
+from api.drift import DriftMonitor
+from api.reference_profiles import (
+    REFERENCE_COLUMNS,
+    ReferenceProfile,
+    build_profiles,
+    build_reference_frame,
+    load_profile,
+)
+
+
+# ---------------------------
+# Synthetic reference data
+# ---------------------------
+def reference(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Surface reelle bati": rng.integers(40, 150, n).astype(float),
+        "Nombre pieces principales": np.full(n, 4.0),
+        "Surface terrain": rng.integers(0, 500, n).astype(float),
+        "Nombre de lots": rng.integers(0, 3, n).astype(float),
+        "prix_m2": rng.normal(3500, 400, n),
+    })
+
+
+def dvf_export(n=400, seed=1):
+    """Raw DVF-like export, with rows the reference recipe must filter out."""
+    df = reference(n, seed)
+    df["Type local"] = np.where(np.arange(n) % 2, "Maison", "Appartement")
+    df.loc[1::10, "Nombre pieces principales"] = 3.0
+    df.loc[5, "prix_m2"] = 1e7  # outlier
+    df.loc[7, "Surface terrain"] = np.nan
+    df["Valeur fonciere"] = df["prix_m2"] * df["Surface reelle bati"]
+    df["Date mutation"] = "05/01/2024"
+    df["Nature mutation"] = "Vente"
+    df["Code postal"] = 33000
+    df["Commune"] = "BORDEAUX"
+    df["Code departement"] = "33"
+    df["Code commune"] = 63
+    df["Section"] = "AB"
+    df["Surface Carrez du 1er lot"] = ""
+    return df
+
+
+@pytest.fixture(autouse=True)
+def dvf_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(reference_profiles, "ingest", partial(ingestion.ingest, cache_dir=tmp_path / "dvf_cache"))
+
+
+def write_sources(tmp_path):
+    reference_dir, csv_dir = tmp_path / "reference_data", tmp_path / "csv_data"
+    reference_dir.mkdir()
+    csv_dir.mkdir()
+    reference().to_csv(reference_dir / "reference_data_appart_lille.csv", index=False)
+    dvf_export().to_csv(csv_dir / "bordeaux_2024.csv", index=False)
+    return reference_dir, csv_dir
+
+
+# ============================================================
+#                      TESTS
+# ============================================================
+
+def test_reference_frame_follows_the_training_recipe(tmp_path):
+    dvf_export().to_csv(tmp_path / "bordeaux_2024.csv", index=False)
+    frame = build_reference_frame(tmp_path / "bordeaux_2024.csv", "maison")
+
+    assert list(frame.columns) == REFERENCE_COLUMNS
+    assert (frame["Nombre pieces principales"] == 4).all()
+    assert frame["prix_m2"].max() < 1e7
+    assert not frame.isna().any().any()
+    # 160 4-room houses, minus an outlier and an incomplete row, then the 80% train split
+    assert len(frame) == 158 - int(np.ceil(0.2 * 158))
+
+
+def test_build_and_load_profiles(tmp_path):
+    reference_dir, csv_dir = write_sources(tmp_path)
+    keys = [("lille", "appartement"), ("bordeaux", "maison")]
+    index = build_profiles(tmp_path / "profiles", keys, reference_dir=reference_dir, csv_dir=csv_dir)
+
+    assert set(index["profiles"]) == {"lille/appartement", "bordeaux/maison"}
+    assert index["profiles"]["bordeaux/maison"]["source"] == "bordeaux_2024.csv"
+    assert json.loads((tmp_path / "profiles" / "index.json").read_text()) == index
+
+    profile = load_profile("lille", "appartement", tmp_path / "profiles")
+    assert isinstance(profile.counts, np.memmap)
+    assert profile.rows == 200
+    assert profile.counts.sum(axis=1).tolist() == [200] * len(REFERENCE_COLUMNS)
+
+    source = pd.read_csv(reference_dir / "reference_data_appart_lille.csv")
+    expected = ReferenceProfile.from_frame(source)
+    for loaded, computed in zip(profile.edges, expected.edges):
+        np.testing.assert_array_equal(loaded, computed)
+    np.testing.assert_array_equal(profile.quantiles, expected.quantiles)
+    pd.testing.assert_frame_equal(profile.sample_frame(), source[REFERENCE_COLUMNS])
+
+
+def test_monitor_on_loaded_profile_matches_raw_reference(tmp_path):
+    reference_dir, csv_dir = write_sources(tmp_path)
+    build_profiles(tmp_path / "profiles", [("lille", "appartement")], reference_dir=reference_dir, csv_dir=csv_dir)
+
+    current = reference(n=300, seed=5).to_dict(orient="records")
+    from_disk = DriftMonitor(load_profile("lille", "appartement", tmp_path / "profiles"))
+    source = pd.read_csv(reference_dir / "reference_data_appart_lille.csv")
+    in_memory = DriftMonitor(ReferenceProfile.from_frame(source))
+    from_disk.update(current)
+    in_memory.update(current)
+
+    assert from_disk.stats() == in_memory.stats()
+
+
+def test_profile_sample_is_bounded():
+    profile = ReferenceProfile.from_frame(reference(n=500), sample_size=100)
+    assert profile.rows == 500
+    assert len(profile.sample_frame()) == 100
@@ -36,6 +36,7 @@ def mock_make_prediction():
             "prix_m2_estime": 3500.50,
             "ville_modele": "lille",
             "model": "RandomForestRegressor",
+            "version_modele": "3f2a9c1e7b40",
         }
         yield mock
 
@@ -67,7 +68,8 @@ def test_predict_lille(client, mock_make_prediction):
     assert response.json() == {
         "prix_m2_estime": 3500.5,
         "ville_modele": "lille",
-        "model": "RandomForestRegressor"
+        "model": "RandomForestRegressor",
+        "version_modele": "3f2a9c1e7b40",
     }
     mock_make_prediction.assert_awaited_once()
 
@@ -111,3 +113,45 @@ def test_predict_generic(client, mock_make_prediction):
     data = response.json()
     assert "prix_m2_estime" in data
     mock_make_prediction.assert_awaited_once()
+
+
+# ---------------------------
+#        /predict/batch
+# ---------------------------
+def test_predict_batch(client):
+    payload = [
+        {
+            "ville": "lille",
+            "features": {
+                "surface_bati": 100,
+                "nombre_pieces": 5,
+                "type_local": "maison",
+                "surface_terrain": 200,
+                "nombre_lots": 1,
+            },
+        },
+        {
+            "ville": "bordeaux",
+            "features": {
+                "surface_bati": 45,
+                "nombre_pieces": 2,
+                "type_local": "Appartement",
+                "surface_terrain": 0,
+                "nombre_lots": 1,
+            },
+        },
+    ]
+
+    with patch("api.routes.make_batch_prediction", new_callable=AsyncMock) as mock:
+        mock.return_value = [
+            {"prix_m2_estime": 3500.5, "ville_modele": "Lille", "model": "XGBRegressor"},
+            {"prix_m2_estime": 4800.0, "ville_modele": "Bordeaux", "model": "XGBRegressor"},
+        ]
+        response = client.post("/predict/batch", json=payload)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["ville_modele"] for item in data] == ["Lille", "Bordeaux"]
+    mock.assert_awaited_once()
+    cityhouses = mock.await_args.args[0]
+    assert [item.ville for item in cityhouses] == ["lille", "bordeaux"]
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from api.services import _predict_batch, make_batch_prediction
+from conftest import FakeRegistry, cityhouse
+
+
+def make_request():
+    state = SimpleNamespace(registry=FakeRegistry())
+    return SimpleNamespace(app=SimpleNamespace(state=state))
+
+
+# ============================================================
+#                      TESTS
+# ============================================================
+
+def test_predict_batch_groups_by_city_and_type_and_keeps_order():
+    request = make_request()
+    items = [
+        cityhouse("lille", "maison", 100),
+        cityhouse("bordeaux", "appartement", 40),
+        cityhouse("lille", "maison", 120),
+        cityhouse("lille", "appartement", 60),
+    ]
+
+    predictions, house_dicts = _predict_batch(items, request)
+
+    assert [p.prix_m2_estime for p in predictions] == [101, 41, 121, 61]
+    assert [p.ville_modele for p in predictions] == ["Lille", "Bordeaux", "Lille", "Lille"]
+    assert {p.version_modele for p in predictions} == {"v-test"}
+    assert len(house_dicts) == 4
+
+    # One vectorized call per (city, type_local) group
+    models = request.app.state.registry.models
+    assert models[("lille", "maison")].calls == [(2, 4)]
+    assert models[("bordeaux", "appartement")].calls == [(1, 4)]
+    assert models[("lille", "appartement")].calls == [(1, 4)]
+    assert models[("bordeaux", "maison")].calls == []
+
+
+def test_predict_batch_matches_single_row_pipeline():
+    request = make_request()
+    items = [cityhouse("lille", "maison", s) for s in (50, 75)]
+
+    predictions, _ = _predict_batch(items, request)
+
+    expected = np.array([[50, 1, 0, 0], [75, 1, 0, 0]], dtype=float).sum(axis=1)
+    np.testing.assert_allclose([p.prix_m2_estime for p in predictions], expected)
+
+
+def test_cities_outside_the_catalog_are_rejected():
+    assert cityhouse("  Lille ", "maison", 50).ville == "lille"
+
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(make_batch_prediction([cityhouse("paris", "maison", 50)], make_request()))
+    assert rejected.value.status_code == 400
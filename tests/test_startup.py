@@ -0,0 +1,44 @@
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from api import startup
+from api.metrics import STARTUP_PHASE_SECONDS
+
+
+def test_app_import_does_not_load_heavy_libraries():
+    code = (
+        "import sys, api.main; "
+        "print(','.join(m for m in ('evidently', 'pandas', 'sklearn', 'xgboost', 'mlflow') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1:] in ([], [""])
+
+
+def test_phase_records_duration_and_gauge():
+    with startup.phase("test_phase"):
+        pass
+    with startup.phase("test_phase"):
+        pass
+
+    seconds = startup.phases()["test_phase"]
+    assert seconds >= 0
+    assert STARTUP_PHASE_SECONDS.labels(phase="test_phase")._value.get() == seconds
+    assert startup.summary("test_phase", "unknown_phase") == f"test_phase {seconds:.2f}s"
+
+
+def test_imports_phase_is_recorded():
+    import api.main  # noqa: F401
+
+    assert startup.phases()["imports"] > 0
+
+
+def test_health_answers_and_startup_phases_are_recorded(monkeypatch):
+    import api.main as api_main
+
+    monkeypatch.setattr(api_main, "MODEL_WARMUP", False)
+    with TestClient(api_main.app) as client:
+        assert client.get("/health").json() == {"status": "ok"}
+
+    assert {"registry", "subsystems"} <= set(startup.phases())
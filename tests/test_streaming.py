@@ -0,0 +1,196 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import streaming
+from api.admission import AdmissionController
+from api.routes import authenticate, router
+from api.services import _predict_batch
+from api.streaming import read_lines, stream_predictions
+from conftest import FakeRegistry, cityhouse
+
+
+def line(ville, type_local, surface):
+    return cityhouse(ville, type_local, surface).model_dump_json().encode()
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def blocks_of(body, size):
+    async def blocks():
+        for start in range(0, len(body), size):
+            yield body[start:start + size]
+    return blocks()
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[authenticate] = lambda: "mock_user"
+    app.state.registry = FakeRegistry()
+    yield app
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def client(app):
+    return TestClient(app)
+
+
+# ============================================================
+#                      LINES
+# ============================================================
+
+def test_lines_are_split_across_blocks():
+    body = b'{"a": 1}\n{"b": 2}\r\n\n{"c": 3}'
+
+    for size in (1, 3, len(body)):
+        lines = asyncio.run(collect(read_lines(blocks_of(body, size))))
+        assert lines == [b'{"a": 1}', b'{"b": 2}\r', b"", b'{"c": 3}']
+
+
+def test_oversized_line_is_dropped_without_buffering():
+    body = b"ok\n" + b"x" * 100 + b"\nok again\n" + b"y" * 100
+
+    lines = asyncio.run(collect(read_lines(blocks_of(body, 7), max_line_bytes=20)))
+
+    assert lines == [b"ok", None, b"ok again", None]
+
+
+def test_oversized_complete_line_within_a_block_is_dropped():
+    body = b"ok\n" + b"x" * 30 + b"\nok again\n"
+
+    for size in (len(body), 16):
+        lines = asyncio.run(collect(read_lines(blocks_of(body, size), max_line_bytes=20)))
+        assert lines == [b"ok", None, b"ok again"]
+
+
+# ============================================================
+#                      /predict/stream
+# ============================================================
+
+def test_stream_predicts_in_order_in_fixed_size_chunks(client, app, monkeypatch):
+    monkeypatch.setattr(streaming, "STREAM_CHUNK_ROWS", 2)
+    houses = [("lille", "maison", 100), ("bordeaux", "appartement", 40), ("lille", "maison", 120),
+              ("lille", "appartement", 60), ("lille", "maison", 80)]
+    body = b"\n".join(line(*house) for house in houses)  # no trailing newline
+
+    response = client.post("/predict/stream", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(row) for row in response.text.splitlines()]
+    expected, _ = _predict_batch([cityhouse(*house) for house in houses], SimpleNamespace(app=app))
+    assert rows == [prediction.model_dump() for prediction in expected]
+
+    # Chunks of at most STREAM_CHUNK_ROWS rows, one vectorized call per (city, type_local) group
+    calls = app.state.registry.models[("lille", "maison")].calls
+    assert calls[:3] == [(1, 4), (1, 4), (1, 4)]
+
+
+def test_invalid_lines_are_reported_in_place(client):
+    body = b"\n".join([
+        line("lille", "maison", 100),
+        b"{not json",
+        b"",
+        line("paris", "maison", 100),
+        b'{"ville": "lille", "features": {"surface_bati": -1}}',
+        line("bordeaux", "maison", 50),
+    ]) + b"\n"
+
+    response = client.post("/predict/stream", content=body)
+
+    rows = [json.loads(row) for row in response.text.splitlines()]
+    assert len(rows) == 5
+    assert rows[0]["prix_m2_estime"] == 101 and rows[4]["prix_m2_estime"] == 51
+    assert [row["ligne"] for row in rows[1:4]] == [2, 4, 5]
+    assert rows[2]["erreur"] == "Ville non prise en charge"
+    assert "features" in rows[3]["erreur"]
+
+
+def test_missing_model_and_failing_chunk_are_reported_without_cutting_the_stream(client, app, monkeypatch):
+    monkeypatch.setattr(streaming, "STREAM_CHUNK_ROWS", 2)
+    del app.state.registry.models[("bordeaux", "maison")]
+
+    def fail(X):
+        raise RuntimeError("model crashed")
+    app.state.registry.models[("lille", "appartement")].predict = fail
+
+    body = b"\n".join([
+        line("lille", "maison", 100),
+        line("bordeaux", "maison", 50),
+        line("lille", "appartement", 60),  # fails the whole second chunk
+        line("lille", "maison", 70),
+        line("bordeaux", "appartement", 40),
+    ])
+
+    response = client.post("/predict/stream", content=body)
+
+    assert response.status_code == 200
+    rows = [json.loads(row) for row in response.text.splitlines()]
+    assert rows[0]["prix_m2_estime"] == 101 and rows[4]["prix_m2_estime"] == 41
+    assert rows[1] == {"ligne": 2, "erreur": "Type de logement non supporté"}
+    assert rows[2:4] == [{"ligne": number, "erreur": "Échec de la prédiction"} for number in (3, 4)]
+
+
+def test_chunk_that_cannot_be_processed_becomes_error_rows(client, monkeypatch):
+    monkeypatch.setattr(streaming, "_score_chunk", lambda chunk, request: 1 / 0)
+
+    response = client.post("/predict/stream", content=b"\n\n".join(line("lille", "maison", s) for s in (50, 60)))
+
+    assert response.status_code == 200
+    assert [json.loads(row) for row in response.text.splitlines()] == [
+        {"ligne": 1, "erreur": "Échec de la prédiction"}, {"ligne": 3, "erreur": "Échec de la prédiction"},
+    ]
+
+
+def test_empty_stream(client):
+    response = client.post("/predict/stream", content=b"")
+
+    assert response.status_code == 200
+    assert response.text == ""
+
+
+def test_stream_takes_an_admission_slot_per_chunk(client, app, monkeypatch):
+    monkeypatch.setattr(streaming, "STREAM_CHUNK_ROWS", 1)
+    app.state.admission = AdmissionController(max_concurrency=1, max_queue=1)
+
+    response = client.post("/predict/stream", content=b"\n".join(line("lille", "maison", s) for s in (50, 60, 70)))
+
+    assert len(response.text.splitlines()) == 3
+    assert app.state.admission.in_flight == 0
+
+
+# ============================================================
+#                      BACKPRESSURE
+# ============================================================
+
+def test_body_is_read_only_as_results_are_consumed():
+    consumed = []
+
+    async def body():
+        for i in range(100):
+            consumed.append(i)
+            yield line("lille", "maison", 50 + i) + b"\n"
+
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(registry=FakeRegistry())), stream=body)
+
+    async def first_chunks():
+        output = stream_predictions(request, "mock_user", chunk_rows=10)
+        first = await output.__anext__()
+        read_before_first = len(consumed)
+        await output.aclose()
+        return first, read_before_first
+
+    first, read_before_first = asyncio.run(first_chunks())
+
+    assert len(first.splitlines()) == 10
+    # The first chunk is sent once the second is read: nothing more is buffered
+    assert read_before_first == 20
@@ -0,0 +1,150 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from api import training
+from api.models import TYPE_LOCAL_KEYS, ModelRegistry
+from api.reference_profiles import REFERENCE_COLUMNS
+from api.services import _predict_array
+from api.training import Candidate, evaluate, load_dataset, prepare_dataset, search, train
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+HEADER = [
+    "Date mutation", "Nature mutation", "Valeur fonciere", "Code postal", "Commune", "Code departement",
+    "Code commune", "Section", "Surface Carrez du 1er lot", "Nombre de lots", "Type local", "Surface reelle bati",
+    "Nombre pieces principales", "Surface terrain",
+]
+
+# Small grid: one candidate per family keeps the tests fast
+SEARCH_SPACE = {
+    "LinearRegression": {},
+    "DecisionTreeRegressor": {"max_depth": [5]},
+    "XGBRegressor": {"max_depth": [3], "learning_rate": [0.3]},
+}
+
+
+def dvf_export(commune="LILLE", n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for type_local, lots in (("Appartement", 1), ("Maison", 0)):
+        for i in range(n):
+            surface = rng.uniform(50, 120)
+            pieces = 3 if i % 5 == 0 else 4
+            valeur = surface * rng.normal(3500, 300)
+            rows.append(["01/03/2024", "Vente", f"{valeur:.0f}", "59000", commune, "59", "350", "AB", "",
+                         str(lots), type_local, f"{surface:.0f}", str(pieces), f"{rng.uniform(0, 300):.0f}"])
+    rows.append(["02/03/2024", "Vente", "9000000", "59000", commune, "59", "350", "AB", "", "0", "Maison", "80",
+                 "4", "100"])  # aberrant price per m²
+    rows.append(["02/03/2024", "Vente", "300000", "59000", commune, "59", "350", "AB", "", "0", "Maison", "80",
+                 "4", ""])  # incomplete row
+    return pd.DataFrame(rows, columns=HEADER)
+
+
+@pytest.fixture
+def export(tmp_path):
+    dvf_export().to_csv(tmp_path / "lille_2024.csv", index=False)
+    return str(tmp_path / "{city}_2024.csv")
+
+
+@pytest.fixture
+def dataset(export, tmp_path):
+    return prepare_dataset("lille", "maison", export, tmp_path / "cache")
+
+
+# ============================================================
+#                      PREPARATION
+# ============================================================
+
+def test_dataset_reproduces_the_notebook_training_set(tmp_path):
+    source = str(ROOT_DIR / "csv_data" / "{city}_2024.csv")
+    for type_local, suffix in (("appartement", "appart"), ("maison", "maison")):
+        data = load_dataset(prepare_dataset("lille", type_local, source, tmp_path).path)
+
+        expected = pd.read_csv(ROOT_DIR / "reference_data" / f"reference_data_{suffix}_lille.csv")[REFERENCE_COLUMNS]
+        np.testing.assert_allclose(data["X_train"], expected[REFERENCE_COLUMNS[:-1]].to_numpy())
+        np.testing.assert_allclose(data["y_train"], expected["prix_m2"].to_numpy())
+
+
+def test_dataset_filters_and_splits(dataset):
+    data = load_dataset(dataset.path)
+
+    # 48 4-room houses, minus the aberrant and incomplete rows, then the 80% train split
+    assert len(data["X_train"]) + len(data["X_test"]) == 48
+    assert len(data["X_test"]) == int(np.ceil(0.2 * 48))
+    assert (data["X_train"][:, 1] == 4).all()
+    assert data["y_train"].max() < 1e4
+    assert sorted(np.unique(data["fold"])) == list(range(training.TRAINING_FOLDS))
+    np.testing.assert_allclose(data["X"].mean(axis=0)[[0, 2]], 0, atol=1e-9)
+
+
+def test_prepared_dataset_is_cached(dataset, export, tmp_path):
+    with patch.object(training, "drop_outliers", side_effect=AssertionError("prepared again")):
+        assert prepare_dataset("lille", "maison", export, tmp_path / "cache") == dataset
+
+    other = prepare_dataset("lille", "maison", export, tmp_path / "cache", pieces=0)
+    assert other.path != dataset.path
+    assert len(load_dataset(other.path)["X_train"]) > len(load_dataset(dataset.path)["X_train"])
+
+
+def test_shared_export_is_filtered_by_commune(tmp_path):
+    pd.concat([dvf_export("LILLE"), dvf_export("ROUBAIX")]).to_csv(tmp_path / "nord.csv", index=False)
+
+    for city in ("lille", "roubaix"):
+        shared = load_dataset(prepare_dataset(city, "maison", str(tmp_path / "nord.csv"), tmp_path / "cache").path)
+        assert len(shared["X_train"]) + len(shared["X_test"]) == 48
+
+    with pytest.raises(ValueError):
+        prepare_dataset("tourcoing", "maison", str(tmp_path / "nord.csv"), tmp_path / "cache")
+
+
+# ============================================================
+#                      SEARCH
+# ============================================================
+
+def test_xgboost_stops_early(dataset):
+    score = evaluate(Candidate(dataset, "XGBRegressor", {"max_depth": 3, "learning_rate": 0.3}))
+
+    assert 0 < score.n_estimators < training.ESTIMATORS["XGBRegressor"][1]["n_estimators"]
+    assert score.mse > 0
+
+
+def test_process_pool_matches_in_process_search(dataset):
+    trained, scores = search([dataset], workers=0, search_space=SEARCH_SPACE)
+    pooled, pooled_scores = search([dataset], workers=2, search_space=SEARCH_SPACE)
+
+    assert len(scores) == 3
+    assert [s.mse for _, s in pooled_scores] == [s.mse for _, s in scores]
+    assert trained[dataset].candidate == min(scores, key=lambda item: item[1].mse)[0]
+    assert pooled[dataset].test_mse == trained[dataset].test_mse
+
+
+# ============================================================
+#                      BUNDLE
+# ============================================================
+
+def test_train_writes_the_bundle_the_api_loads(export, tmp_path):
+    catalog = tmp_path / "models" / "catalog.json"
+
+    bundles = train(
+        ["Lille"], tmp_path / "models", workers=0, source=export, cache_dir=tmp_path / "cache",
+        catalog_file=catalog, tracking_uri=(tmp_path / "mlruns").as_uri(), search_space=SEARCH_SPACE,
+    )
+
+    assert bundles == {"lille": tmp_path / "models" / "best_model_lille.pkl"}
+    bundle = joblib.load(bundles["lille"])
+    assert set(bundle) == {key for keys in TYPE_LOCAL_KEYS.values() for key in keys}
+
+    registry = ModelRegistry(catalog_file=str(catalog)).load()
+    assert registry.current().cities == {"lille"}
+    for type_local in TYPE_LOCAL_KEYS:
+        prices = _predict_array(registry.get("lille", type_local), np.array([[80.0, 4, 100, 0], [60.0, 4, 0, 1]]))
+        assert np.isfinite(prices).all()
+        assert 1000 < prices.mean() < 6000
+
+    # One run for the city, one per type_local, one per candidate
+    assert len(list((tmp_path / "mlruns").glob("*/*/meta.yaml"))) == 1 + 2 + 2 * 3